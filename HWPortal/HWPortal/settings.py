@@ -31,6 +31,137 @@ FAKE_API_SETTINGS = {
     "price_variation": 0.3,
 }
 
+# Nabídky z Heureky se stahují jen na pozadí (manage.py refresh_offers)
+HEUREKA_OFFER_CACHE_TIMEOUT = 60 * 60 * 24
+
+HEUREKA_REFRESH_SETTINGS = {
+    "batch_size": 100,
+    "concurrency": 4,
+    "rate_limit": 5,  # požadavků za sekundu
+    "stale_after": 60 * 60,  # sekundy
+    "activity_window_days": 7,
+}
+
+# Kliky na Heureku se zapisují dávkově z vlákna na pozadí (viewer.buffers)
+HEUREKA_CLICK_BUFFER = {
+    "max_size": 10000,
+    "batch_size": 500,
+    "flush_interval": 2.0,
+}
+
+# Surové kliky starší než N dní maže manage.py prune_heureka_clicks
+HEUREKA_CLICK_RETENTION_DAYS = 90
+
+# Detekce změn cen (manage.py detect_price_changes) - výchozí prahy,
+# jednotlivé komponenty je mohou přepsat v adminu (Stavy cen komponent)
+PRICE_CHANGE_SETTINGS = {
+    "threshold_percent": 3,  # minimální změna v procentech
+    "threshold_amount": 100,  # minimální změna v Kč
+    "chunk_size": 1000,  # aktivit na jeden bulk_create
+}
+
+# Rate limiting zapisovacích endpointů (viewer.ratelimit) - počítá se v cache.
+# Limity platí napříč procesy jen se sdílenou cache (Redis/Memcached, viz CACHES),
+# s lokální cache má každý proces vlastní počítadla.
+# key: "user_or_ip" (přihlášený uživatel podle ID, jinak IP) nebo "ip";
+# pravidla s "paths" aplikuje RateLimitMiddleware, ostatní dekorátor @ratelimit.
+# "vote" počítá všechny požadavky včetně změny hlasu (dříve 10 nových hlasů/h
+# dotazem do DB, změny hlasu bez limitu).
+RATE_LIMITS = {
+    "vote": {"rate": "30/h"},
+    "favorite": {"rate": "30/m", "methods": ["POST", "PUT", "DELETE"]},
+    "comparison": {"rate": "60/m"},
+    "heureka_click": {"rate": "300/m"},
+    "login": {"rate": "10/m", "key": "ip", "paths": ["/login/", "/admin/login/"]},
+}
+# Hlavička s IP klienta, kterou nastavuje reverzní proxy (např. "HTTP_X_REAL_IP").
+# Bez ní sdílí všichni za proxy jeden limit podle REMOTE_ADDR. Nastav jen pokud
+# proxy hlavičku vždy přepisuje, jinak si ji klient může podvrhnout.
+RATE_LIMIT_CLIENT_IP_HEADER = env("RATE_LIMIT_CLIENT_IP_HEADER", default=None)
+
+# Počítadla hlasů u recenzí: "sync" = UPDATE při každém hlasu,
+# "buffered" = delty v tabulce ReviewVoteDelta, zápis dávkově vláknem na pozadí
+# (populární recenze); zapisovat může kterýkoli proces, delty přežijí restart
+REVIEW_VOTE_COUNTERS = {
+    "mode": "sync",
+    "flush_interval": 3.0,  # sekundy mezi zápisy
+    "batch_size": 500,  # nezapsaných hlasů v jedné transakci
+}
+
+# Aktivity "nová recenze" pro sledující komponenty (FavoriteActivityService).
+# Komponenty s více sledujícími než popular_threshold se nerozesílají,
+# jejich nové recenze se doplní až při čtení aktivit.
+REVIEW_FANOUT = {
+    "popular_threshold": 5000,
+    "chunk_size": 1000,  # aktivit na jeden bulk_create
+    "read_window_days": 30,  # jak staré recenze se doplňují při čtení
+}
+REVIEW_FANOUT_QUEUE = {
+    "flush_interval": 1.0,
+}
+
+# Celé stránky pro nepřihlášené (bez session) z cache, viz viewer/pagecache.py.
+# Invaliduje se tagy (catalog, reviews, component:<typ>:<id>) ze signálů modelů;
+# hlasy a favorites_count se mění přes UPDATE, ty stránky doženou až po timeoutu.
+PAGE_CACHE = {
+    "timeout": 60 * 5,
+    "ignored_params": ["fbclid", "gclid"],  # + všechny utm_*
+}
+
+# Data domovské stránky jako jeden záznam v cache, obnovovaný vláknem na pozadí
+# každých refresh_interval sekund a hned po publikaci / smazání recenze
+HOME_SNAPSHOT = {
+    "refresh_interval": 60,
+}
+
+# Doporučení "uživatelé si oblíbili také" (python manage.py update_recommendations
+# z cronu, např. každou hodinu, jednou denně s --full)
+RECOMMENDATIONS = {
+    "top_k": 8,
+    # Minimální počet uživatelů, kteří si oblíbili obě komponenty
+    "min_common": 2,
+    # Uživatelé s více oblíbenými se do podobnosti nepočítají
+    "max_basket": 200,
+    # Počet komponent zpracovaných v jednom průchodu (strop paměti)
+    "chunk_size": 500,
+}
+
+# Trendy komponent (python manage.py update_trending z cronu, např. každou minutu).
+# Událost váží weight a její váha se každých half_life_hours půlí.
+TRENDING = {
+    "half_life_hours": 48,
+    "top_n": 10,
+    "weights": {"click": 1.0, "favorite": 5.0, "review": 8.0, "vote": 2.0},
+}
+
+# Denní souhrn aktivit e-mailem (python manage.py send_activity_digests)
+ACTIVITY_DIGEST = {
+    "chunk_size": 2000,  # řádků načtených z databáze najednou
+    "batch_size": 100,  # e-mailů na jedno odeslání přes otevřené spojení
+    "max_items": 20,  # aktivit vypsaných v jednom e-mailu
+    "base_url": env("SITE_URL", default="http://localhost:8000"),
+}
+
+# Výchozí je SMTP; lokálně lze e-maily ukládat do souborů (EMAIL_FILE_PATH)
+# přes EMAIL_BACKEND=django.core.mail.backends.filebased.EmailBackend v .env
+EMAIL_BACKEND = env(
+    "EMAIL_BACKEND", default="django.core.mail.backends.smtp.EmailBackend"
+)
+EMAIL_FILE_PATH = env("EMAIL_FILE_PATH", default=str(BASE_DIR / "sent_emails"))
+EMAIL_HOST = env("EMAIL_HOST", default="localhost")
+EMAIL_PORT = env.int("EMAIL_PORT", default=25)
+EMAIL_HOST_USER = env("EMAIL_HOST_USER", default="")
+EMAIL_HOST_PASSWORD = env("EMAIL_HOST_PASSWORD", default="")
+EMAIL_USE_TLS = env.bool("EMAIL_USE_TLS", default=False)
+DEFAULT_FROM_EMAIL = env(
+    "DEFAULT_FROM_EMAIL", default="Hardware Portal <noreply@hwportal.cz>"
+)
+
+# Recenze a oblíbené odkazují na komponentu dvojicí (component_type, component_id),
+# staré FK se zatím zapisují souběžně. Filtrování přes component_id zapnout až
+# po doběhnutí "python manage.py backfill_component_refs".
+COMPONENT_REF_READS = False
+
 # SECURITY WARNING: don't run with debug turned on in production!
 # FIX: Změněno na True pro development - static files potřebují DEBUG=True
 DEBUG = True
@@ -74,6 +205,8 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "viewer.middleware.ClearMessagesMiddleware",
+    "viewer.ratelimit.RateLimitMiddleware",
+    "viewer.pagecache.PageCacheMiddleware",
 ]
 
 MESSAGE_TAGS = {
@@ -99,6 +232,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "viewer.context_processors.unread_activities",
             ],
         },
     },
@@ -106,6 +240,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "HWPortal.wsgi.application"
 
+# Cache - CACHE_URL např. redis://localhost:6379/1 (vyžaduje balíček redis).
+# Rate limiting, page cache a snapshot domovské stránky sdílí procesy jen přes
+# sdílenou cache; výchozí lokální cache má každý proces vlastní.
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
 # Database
 DATABASES = {
     "default": {
@@ -47,5 +47,21 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
 ]
 
+# Testy vyprazdňují buffer kliků ručně, bez vlákna na pozadí
+HEUREKA_CLICK_BUFFER = {
+    "batch_size": 500,
+    "autostart": False,
+}
+
+# Rozesílání aktivit spouští testy ručně (flush), bez vlákna na pozadí
+REVIEW_FANOUT_QUEUE = {
+    "autostart": False,
+}
+
+# Snapshot domovské stránky bez vlákna na pozadí
+HOME_SNAPSHOT = {
+    "autostart": False,
+}
+
 # Pro Selenium testy
 STATICFILES_STORAGE = "django.contrib.staticfiles.storage.StaticFilesStorage"
@@ -0,0 +1,7 @@
+# test_settings_postgres.py
+# Testy proti PostgreSQL z proměnných DB_* (jako settings.py). Spustí i testy
+# souběžnosti, které SQLite přeskakuje (skipUnlessDBFeature).
+from .settings import DATABASES as POSTGRES_DATABASES
+from .test_settings import *
+
+DATABASES = POSTGRES_DATABASES
@@ -1,8 +1,14 @@
 from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.urls import path
 
-from .models import (BoardFormats, GraphicsCards, Motherboards,
+from .models import (BoardFormats, ComponentPriceState, GraphicsCards,
+                     HeurekaClick, HeurekaClickHourly, Motherboards,
                      PowerSupplyUnits, Processors, Ram, RamTypes, Reviews,
                      ReviewVotes, Sockets, Storage, StorageTypes)
+from .services import (ClickAnalyticsService, FavoriteActivityService,
+                       TrendingService)
+from .signals import invalidate_review_caches
 
 # Register your models here.
 
@@ -280,20 +286,103 @@ class ReviewVotesAdmin(admin.ModelAdmin):
     review_title.admin_order_field = "review__title"
 
 
+@admin.register(HeurekaClick)
+class HeurekaClickAdmin(admin.ModelAdmin):
+    list_display = ["component_name", "component_type", "user", "timestamp"]
+    list_filter = ["component_type"]
+    search_fields = ["component_name", "search_query"]
+    ordering = ["-timestamp"]
+    # Tabulka je velká - bez COUNT(*) přes celou tabulku
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(HeurekaClickHourly)
+class HeurekaClickHourlyAdmin(admin.ModelAdmin):
+    list_display = ["hour", "component_name", "component_type", "user_type", "clicks"]
+    list_filter = ["component_type", "user_type"]
+    search_fields = ["component_name"]
+    date_hierarchy = "hour"
+    ordering = ["-hour"]
+
+    DASHBOARD_PERIODS = [7, 30, 90]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path(
+                "dashboard/",
+                self.admin_site.admin_view(self.dashboard_view),
+                name="viewer_heurekaclickhourly_dashboard",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def dashboard_view(self, request):
+        """Přehled kliků počítaný pouze ze souhrnných tabulek"""
+        days = request.GET.get("days", "30")
+        if not days.isdigit() or int(days) not in self.DASHBOARD_PERIODS:
+            days = "30"
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Heureka kliky - přehled",
+            "periods": self.DASHBOARD_PERIODS,
+            "dashboard": ClickAnalyticsService.get_dashboard(days=int(days)),
+        }
+        return TemplateResponse(request, "admin/viewer/click_dashboard.html", context)
+
+
+@admin.register(ComponentPriceState)
+class ComponentPriceStateAdmin(admin.ModelAdmin):
+    list_display = [
+        "component_type",
+        "component_id",
+        "last_price",
+        "threshold_percent",
+        "threshold_amount",
+        "date_updated",
+    ]
+    list_editable = ["threshold_percent", "threshold_amount"]
+    list_filter = ["component_type"]
+    readonly_fields = ["last_price", "catalog_price", "date_updated"]
+    ordering = ["component_type", "component_id"]
+
+
 admin.site.site_header = "Hardware Portal Admin"
 admin.site.site_title = "Hardware Portal Admin"
 admin.site.index_title = "Správa Hardware Portal"
 
 
 def make_published(modeladmin, request, queryset):
+    reviews = list(queryset)
     queryset.update(is_published=True)
+    # queryset.update() neposílá signály
+    invalidate_review_caches(reviews)
+    for review in reviews:
+        if not review.is_published:
+            FavoriteActivityService.fan_out_later(review.pk)
+            TrendingService.add_review_later(review.pk)
 
 
 make_published.short_description = "Označit vybrané recenze jako publikované"
 
 
 def make_unpublished(modeladmin, request, queryset):
+    reviews = list(queryset)
     queryset.update(is_published=False)
+    invalidate_review_caches(reviews)
 
 
 make_unpublished.short_description = "Označit vybrané recenze jako nepublikované"
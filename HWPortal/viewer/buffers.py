@@ -0,0 +1,387 @@
+"""
+Write-behind buffers flushed by background threads.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+from typing import Any, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from .models import (HeurekaClick, Reviews, ReviewVoteDelta,
+                     wilson_lower_bound)
+from .services import (ComponentService, FavoriteActivityService,
+                       HomeSnapshotService)
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundFlusher:
+    """
+    Base class for buffers flushed by a daemon thread.
+    The thread flushes every `flush_interval` seconds, when woken up
+    by `wake_up()` and once more when the process exits.
+    """
+
+    def __init__(self, flush_interval: float = 2.0, autostart: bool = True):
+        self.flush_interval = flush_interval
+        self.autostart = autostart
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+    def flush(self) -> int:
+        """Write everything buffered so far, return number of written items."""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        raise NotImplementedError
+
+    def wake_up(self) -> None:
+        self._wakeup.set()
+
+    def ensure_started(self) -> None:
+        if not self.autostart or self._thread is not None:
+            return
+
+        with self._start_lock:
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.__class__.__name__, daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Stop the thread and flush what is left (called at shutdown)."""
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self._flush_safely()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._flush_safely()
+
+    def _flush_safely(self) -> None:
+        close_old_connections()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("%s flush failed", self.__class__.__name__)
+        finally:
+            close_old_connections()
+
+
+class HeurekaClickBuffer(BackgroundFlusher):
+    """
+    Write-behind buffer for Heureka click tracking.
+    Clicks are validated cheaply in the request, component names are
+    resolved and rows written with bulk_create during the flush.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        put_timeout: float = 0.05,
+        autostart: bool = True,
+    ):
+        super().__init__(flush_interval=flush_interval, autostart=autostart)
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_size)
+
+    def add(self, click: Dict[str, Any]) -> bool:
+        """
+        Queue one click. Returns False when the buffer stays full
+        for `put_timeout` seconds so the caller can push back.
+        """
+        self.ensure_started()
+
+        try:
+            self._queue.put(click, timeout=self.put_timeout)
+        except queue.Full:
+            self.wake_up()
+            return False
+
+        if self._queue.qsize() >= self.batch_size:
+            self.wake_up()
+        return True
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _flush(self) -> int:
+        written = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _write(batch: List[Dict[str, Any]]) -> int:
+        # Component names - one query per component type in the batch
+        models = ComponentService.get_type_models()
+        ids_by_type = {}
+        for click in batch:
+            ids_by_type.setdefault(click["component_type"], set()).add(
+                click["component_id"]
+            )
+
+        names = {}
+        for component_type, ids in ids_by_type.items():
+            for pk, name in (
+                models[component_type]
+                .objects.filter(pk__in=ids)
+                .values_list("pk", "name")
+            ):
+                names[(component_type, pk)] = name
+
+        user_ids = {click["user_id"] for click in batch if click["user_id"]}
+        existing_users = set(
+            User.objects.filter(pk__in=user_ids).values_list("pk", flat=True)
+        )
+
+        clicks = []
+        for click in batch:
+            name = names.get((click["component_type"], click["component_id"]))
+            if name is None:
+                # Unknown component - dropped instead of failing the request
+                continue
+            clicks.append(
+                HeurekaClick(
+                    component_type=click["component_type"],
+                    component_id=click["component_id"],
+                    component_name=name,
+                    search_query=click["search_query"],
+                    user_id=(
+                        click["user_id"]
+                        if click["user_id"] in existing_users
+                        else None
+                    ),
+                    session_key=click["session_key"],
+                    timestamp=click["timestamp"],
+                )
+            )
+
+        HeurekaClick.objects.bulk_create(clicks)
+        return len(clicks)
+
+
+class VoteCounterBuffer(BackgroundFlusher):
+    """
+    Write-behind counters for review votes.
+    Votes append their deltas to ReviewVoteDelta in their own transaction
+    (no contention on the review row). The flush claims pending rows, adds
+    them to Reviews in one batched UPDATE and deletes them in the same
+    transaction, so any process may flush, deltas survive restarts and a
+    delta is never applied twice.
+    """
+
+    def __init__(
+        self, flush_interval: float = 3.0, batch_size: int = 500, autostart: bool = True
+    ):
+        super().__init__(flush_interval=flush_interval, autostart=autostart)
+        self.batch_size = batch_size
+
+    @staticmethod
+    def get_pending(review_ids: Iterable[int]) -> Dict[int, Tuple[int, int]]:
+        """Pending (helpful, total) deltas per review, one query."""
+        return {
+            row["review_id"]: (row["helpful"], row["total"])
+            for row in ReviewVoteDelta.objects.filter(review_id__in=list(review_ids))
+            .values("review_id")
+            .annotate(helpful=Sum("helpful_delta"), total=Sum("total_delta"))
+            .order_by()
+        }
+
+    def _flush(self) -> int:
+        written = 0
+        while True:
+            with transaction.atomic():
+                # Rows claimed by a parallel flush are skipped, not waited for
+                claimed = list(
+                    ReviewVoteDelta.objects.select_for_update(skip_locked=True)
+                    .order_by("id")
+                    .values_list("id", "review_id", "helpful_delta", "total_delta")[
+                        : self.batch_size
+                    ]
+                )
+                deltas = {}
+                for _, review_id, helpful_delta, total_delta in claimed:
+                    helpful, total = deltas.get(review_id, (0, 0))
+                    deltas[review_id] = (helpful + helpful_delta, total + total_delta)
+
+                self._write(deltas)
+                ReviewVoteDelta.objects.filter(
+                    id__in=[row[0] for row in claimed]
+                ).delete()
+
+            written += len(deltas)
+            if len(claimed) < self.batch_size:
+                return written
+
+    @classmethod
+    def _write(cls, deltas: Dict[int, Tuple[int, int]]) -> None:
+        deltas = {pk: pending for pk, pending in deltas.items() if any(pending)}
+        if not deltas:
+            return
+
+        # One UPDATE for the whole batch
+        updates = {}
+        for index, field in enumerate(("helpful_votes", "total_votes")):
+            updates[field] = F(field) + Case(
+                *[
+                    When(pk=review_id, then=Value(pending[index]))
+                    for review_id, pending in deltas.items()
+                ],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        reviews = Reviews.objects.filter(pk__in=list(deltas))
+        reviews.update(**updates)
+
+        # Helpfulness scores from the new counters, in the same transaction
+        scored = [
+            Reviews(pk=pk, helpfulness_score=wilson_lower_bound(helpful, total))
+            for pk, helpful, total in reviews.values_list(
+                "pk", "helpful_votes", "total_votes"
+            )
+        ]
+        Reviews.objects.bulk_update(scored, ["helpfulness_score"])
+
+
+class ReviewFanoutQueue(BackgroundFlusher):
+    """
+    Background fan-out of new-review activities.
+    Publishing a review only queues its id, the thread writes the
+    activities (FavoriteActivityService.fan_out) outside the request.
+    """
+
+    def __init__(self, flush_interval: float = 1.0, autostart: bool = True):
+        super().__init__(flush_interval=flush_interval, autostart=autostart)
+        self._queue = queue.Queue()
+
+    def add(self, review_id: int) -> None:
+        self.ensure_started()
+        self._queue.put(review_id)
+        self.wake_up()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _flush(self) -> int:
+        written = 0
+        while True:
+            try:
+                review_id = self._queue.get_nowait()
+            except queue.Empty:
+                return written
+            try:
+                written += FavoriteActivityService.fan_out(review_id)
+            except Exception:
+                # One failed review must not block the rest of the queue
+                logger.exception("Fan-out of review %s failed", review_id)
+
+
+class HomeSnapshotRefresher(BackgroundFlusher):
+    """
+    Rebuilds the home page snapshot every `refresh_interval` seconds and
+    right after request_refresh() (published or deleted reviews).
+    """
+
+    def __init__(self, refresh_interval: float = 60, autostart: bool = True):
+        super().__init__(flush_interval=refresh_interval, autostart=autostart)
+        self._forced = threading.Event()
+
+    def request_refresh(self) -> None:
+        self.ensure_started()
+        self._forced.set()
+        self.wake_up()
+
+    def _flush(self) -> int:
+        force = self._forced.is_set()
+        self._forced.clear()
+        return int(HomeSnapshotService.refresh(force=force) is not None)
+
+
+_click_buffer = None
+_vote_counter_buffer = None
+_review_fanout_queue = None
+_home_snapshot_refresher = None
+_buffer_lock = threading.Lock()
+
+
+def get_click_buffer() -> HeurekaClickBuffer:
+    """Return the process-wide click buffer configured from settings."""
+    global _click_buffer
+
+    if _click_buffer is None:
+        with _buffer_lock:
+            if _click_buffer is None:
+                _click_buffer = HeurekaClickBuffer(
+                    **getattr(settings, "HEUREKA_CLICK_BUFFER", {})
+                )
+    return _click_buffer
+
+
+def get_vote_counter_buffer() -> VoteCounterBuffer:
+    """Return the process-wide vote counter buffer configured from settings."""
+    global _vote_counter_buffer
+
+    if _vote_counter_buffer is None:
+        with _buffer_lock:
+            if _vote_counter_buffer is None:
+                config = dict(getattr(settings, "REVIEW_VOTE_COUNTERS", {}))
+                config.pop("mode", None)
+                _vote_counter_buffer = VoteCounterBuffer(**config)
+    return _vote_counter_buffer
+
+
+def get_review_fanout_queue() -> ReviewFanoutQueue:
+    """Return the process-wide review fan-out queue configured from settings."""
+    global _review_fanout_queue
+
+    if _review_fanout_queue is None:
+        with _buffer_lock:
+            if _review_fanout_queue is None:
+                _review_fanout_queue = ReviewFanoutQueue(
+                    **getattr(settings, "REVIEW_FANOUT_QUEUE", {})
+                )
+    return _review_fanout_queue
+
+
+def get_home_snapshot_refresher() -> HomeSnapshotRefresher:
+    """Return the process-wide home snapshot refresher configured from settings."""
+    global _home_snapshot_refresher
+
+    if _home_snapshot_refresher is None:
+        with _buffer_lock:
+            if _home_snapshot_refresher is None:
+                _home_snapshot_refresher = HomeSnapshotRefresher(
+                    **HomeSnapshotService.get_config()
+                )
+    return _home_snapshot_refresher
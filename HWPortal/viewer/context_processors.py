@@ -0,0 +1,25 @@
+"""
+Template context processors of the viewer app.
+"""
+
+from django.contrib.auth import SESSION_KEY
+from django.utils.functional import SimpleLazyObject
+
+from .services import FavoriteActivityService
+
+
+def unread_activities(request):
+    """
+    Unread activity count for the navigation badge. Evaluated lazily,
+    only when a template uses it, and served from the cache - the user id
+    comes straight from the session, without loading the user.
+    """
+    session = getattr(request, "session", None)
+    user_id = session.get(SESSION_KEY) if session is not None else None
+    if not user_id:
+        return {}
+    return {
+        "unread_activities": SimpleLazyObject(
+            lambda: FavoriteActivityService.get_unread_count(int(user_id))
+        )
+    }
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from viewer.models import COMPONENT_TYPE_MODELS, Reviews, UserFavorites
+
+
+class Command(BaseCommand):
+    help = (
+        "Doplní component_id recenzím a oblíbeným komponentám ze starých FK "
+        "(po dávkách, bez dlouhých zámků)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Počet řádků v jednom UPDATE",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        for model in (Reviews, UserFavorites):
+            updated = 0
+            for component_type in COMPONENT_TYPE_MODELS:
+                pending = model.objects.filter(
+                    component_type=component_type,
+                    component_id__isnull=True,
+                    **{f"{component_type}__isnull": False},
+                )
+                while True:
+                    ids = list(
+                        pending.order_by("pk").values_list("pk", flat=True)[:batch_size]
+                    )
+                    if not ids:
+                        break
+                    updated += model.objects.filter(pk__in=ids).update(
+                        component_id=F(f"{component_type}_id")
+                    )
+
+            missing = model.objects.filter(component_id__isnull=True).count()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{model._meta.verbose_name_plural}: doplněno {updated}, "
+                    f"bez komponenty {missing}"
+                )
+            )
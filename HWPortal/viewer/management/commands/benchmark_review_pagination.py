@@ -0,0 +1,123 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from viewer.models import GraphicsCards, Reviews
+from viewer.pagination import KeysetPaginator
+from viewer.services import ReviewService
+
+BENCHMARK_NAME = "benchmark"
+
+
+class Command(BaseCommand):
+    help = (
+        "Porovná latenci stránkování recenzí (OFFSET vs. keyset) "
+        "na první a hluboké stránce"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reviews",
+            type=int,
+            default=1_000_000,
+            help="Počet recenzí v databázi (chybějící se vytvoří s --create)",
+        )
+        parser.add_argument(
+            "--create", action="store_true", help="Vytvoř chybějící testovací recenze"
+        )
+        parser.add_argument(
+            "--cleanup", action="store_true", help="Smaž testovací recenze a skonči"
+        )
+        parser.add_argument("--page", type=int, default=100, help="Hluboká stránka")
+        parser.add_argument("--per-page", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--sort", default="newest", choices=list(ReviewService.LISTING_SORTS)
+        )
+        parser.add_argument("--category", default="")
+
+    def handle(self, *args, **options):
+        if options["cleanup"]:
+            deleted, _ = Reviews.objects.filter(reviewer_name=BENCHMARK_NAME).delete()
+            self.stdout.write(self.style.SUCCESS(f"Smazáno {deleted} záznamů"))
+            return
+
+        missing = options["reviews"] - Reviews.objects.count()
+        if missing > 0:
+            if not options["create"]:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"V databázi chybí {missing} recenzí, "
+                        "spusť s --create nebo sniž --reviews"
+                    )
+                )
+            else:
+                self._create_reviews(missing)
+
+        reviews, ordering = ReviewService.get_listing(
+            options["category"], options["sort"]
+        )
+        per_page = options["per_page"]
+        page = options["page"]
+
+        # Kurzor hluboké stránky (poslední řádek předchozí stránky) - mimo měření
+        keyset = KeysetPaginator(reviews, ordering, per_page=per_page)
+        deep_cursor = None
+        if page > 1:
+            boundary = reviews.order_by(*ordering)[(page - 1) * per_page - 1]
+            deep_cursor = keyset.cursor_for(boundary)
+
+        offset = Paginator(reviews.order_by(*ordering), per_page)
+        results = [
+            ("OFFSET", 1, lambda: list(offset.page(1))),
+            ("OFFSET", page, lambda: list(offset.page(page))),
+            ("keyset", 1, lambda: list(keyset.page())),
+            ("keyset", page, lambda: list(keyset.page(deep_cursor))),
+        ]
+
+        self.stdout.write(
+            f"Řazení {options['sort']}, {per_page} na stránku, "
+            f"{options['repeat']} opakování (medián):"
+        )
+        for label, number, fetch in results:
+            timings = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                fetch()
+                timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(
+                f"  {label:<7} stránka {number:>5}: "
+                f"{statistics.median(timings):8.2f} ms"
+            )
+
+    def _create_reviews(self, count, batch_size=5000):
+        author, _ = User.objects.get_or_create(username=BENCHMARK_NAME)
+        component, _ = GraphicsCards.objects.get_or_create(
+            name="Benchmark GPU", defaults={"manufacturer": "Benchmark"}
+        )
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            Reviews.objects.bulk_create(
+                [
+                    Reviews(
+                        title="Benchmark",
+                        author=author,
+                        reviewer_name=BENCHMARK_NAME,
+                        content="",
+                        summary="",
+                        rating=random.randint(1, 5),
+                        component_type="graphics_card",
+                        graphics_card=component,
+                        component_id=component.pk,
+                        helpful_votes=random.randint(0, 50),
+                    )
+                    for _ in range(size)
+                ]
+            )
+            created += size
+            self.stdout.write(f"Vytvořeno {created}/{count} recenzí")
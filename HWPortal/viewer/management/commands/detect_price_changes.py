@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from viewer.services import PriceChangeService
+
+
+class Command(BaseCommand):
+    help = "Porovná nové ceny s poslední známou cenou a upozorní sledující"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Počet aktivit zapsaných jedním bulk_create",
+        )
+
+    def handle(self, *args, **options):
+        stats = PriceChangeService.detect(chunk_size=options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Zkontrolováno {stats['checked']} komponent: "
+                f"{stats['changes']} změn cen, {stats['suppressed']} pod prahem, "
+                f"{stats['activities']} aktivit pro sledující"
+            )
+        )
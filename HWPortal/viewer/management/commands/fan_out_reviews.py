@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from viewer.models import Reviews
+from viewer.services import FavoriteActivityService
+
+
+class Command(BaseCommand):
+    help = (
+        "Znovu rozešle aktivity nových recenzí sledujícím (např. po restartu, "
+        "kdy se ztratila fronta na pozadí). Už rozeslané recenze se přeskočí."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=24,
+            help="Recenze vytvořené za posledních N hodin",
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options["hours"])
+        review_ids = Reviews.objects.filter(
+            is_published=True, date_created__gte=since
+        ).values_list("id", flat=True)
+
+        reviews = created = 0
+        for review_id in review_ids.iterator():
+            created += FavoriteActivityService.fan_out(review_id)
+            reviews += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Zpracováno {reviews} recenzí, {created} nových aktivit")
+        )
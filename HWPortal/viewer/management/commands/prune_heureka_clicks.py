@@ -0,0 +1,36 @@
+import gzip
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from viewer.services import ClickAnalyticsService
+
+
+class Command(BaseCommand):
+    help = "Smaže (a volitelně archivuje) surové Heureka kliky starší než N dní"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "HEUREKA_CLICK_RETENTION_DAYS", 90),
+            help="Ponechat kliky za posledních N dní",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--archive",
+            help="Před smazáním zapiš kliky do souboru (JSON lines, gzip)",
+        )
+
+    def handle(self, *args, **options):
+        if options["archive"]:
+            with gzip.open(options["archive"], "at", encoding="utf-8") as archive:
+                deleted = ClickAnalyticsService.prune_raw_clicks(
+                    options["days"], options["batch_size"], archive=archive
+                )
+        else:
+            deleted = ClickAnalyticsService.prune_raw_clicks(
+                options["days"], options["batch_size"]
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Smazáno {deleted} kliků"))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from viewer.models import Reviews, wilson_lower_bound
+
+
+class Command(BaseCommand):
+    help = "Přepočítá Wilsonovo skóre užitečnosti u všech recenzí"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Počet recenzí v jednom bulk_update",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = 0
+        updated = 0
+
+        while True:
+            rows = list(
+                Reviews.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "helpful_votes", "total_votes")[:batch_size]
+            )
+            if not rows:
+                break
+
+            Reviews.objects.bulk_update(
+                [
+                    Reviews(id=pk, helpfulness_score=wilson_lower_bound(h, t))
+                    for pk, h, t in rows
+                ],
+                ["helpfulness_score"],
+            )
+            updated += len(rows)
+            last_id = rows[-1][0]
+
+        self.stdout.write(self.style.SUCCESS(f"Přepočítáno {updated} recenzí"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from viewer.services import ComponentService
+
+
+class Command(BaseCommand):
+    help = (
+        "Přepočítá favorites_count všech komponent z oblíbených "
+        "(po nasazení nebo hromadných změnách mimo signály)"
+    )
+
+    def handle(self, *args, **options):
+        updated = ComponentService.recount_favorites()
+        self.stdout.write(self.style.SUCCESS(f"Přepočítáno {updated} komponent"))
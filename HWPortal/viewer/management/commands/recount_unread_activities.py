@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from viewer.models import UnreadActivityCounter
+from viewer.services import FavoriteActivityService
+
+
+class Command(BaseCommand):
+    help = (
+        "Přepočítá počítadla nepřečtených aktivit z aktivit samotných "
+        "(pojistka proti změnám mimo signály, např. hromadnému mazání)"
+    )
+
+    def handle(self, *args, **options):
+        user_ids = UnreadActivityCounter.objects.values_list("user_id", flat=True)
+        counts = FavoriteActivityService.recount_unread(list(user_ids))
+        self.stdout.write(self.style.SUCCESS(f"Přepočítáno {len(counts)} počítadel"))
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from viewer.services import OfferRefreshScheduler
+
+
+class Command(BaseCommand):
+    help = "Obnoví cache nabídek z Heureky pro celý katalog (na pozadí)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Počet komponent v dávce")
+        parser.add_argument(
+            "--concurrency", type=int, help="Maximální počet souběžných požadavků"
+        )
+        parser.add_argument("--rate", type=float, help="Maximum požadavků za sekundu")
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            help="Přeskoč nabídky mladší než zadaný počet sekund",
+        )
+        parser.add_argument(
+            "--loop", action="store_true", help="Běž dokola jako worker"
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=300,
+            help="Pauza mezi průchody v režimu --loop (sekundy)",
+        )
+
+    def handle(self, *args, **options):
+        scheduler = OfferRefreshScheduler(
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            rate_limit=options["rate"],
+            stale_after=options["stale_after"],
+            progress_callback=self._report_progress,
+        )
+
+        while True:
+            metrics = scheduler.run_once()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Hotovo: {metrics['refreshed']} obnoveno, "
+                    f"{metrics['skipped']} přeskočeno, {metrics['errors']} chyb, "
+                    f"{metrics['snapshots']} cenových snímků za "
+                    f"{metrics['elapsed']:.1f} s"
+                )
+            )
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+    def _report_progress(self, metrics):
+        self.stdout.write(
+            f"[{metrics['processed']}/{metrics['total']}] "
+            f"obnoveno {metrics['refreshed']}, přeskočeno {metrics['skipped']}, "
+            f"chyb {metrics['errors']}, {metrics['throughput']:.1f} komponent/s"
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from viewer.services import ClickAnalyticsService
+
+
+class Command(BaseCommand):
+    help = "Inkrementálně přepočítá hodinové souhrny Heureka kliků"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Počet surových kliků zpracovaných v jedné transakci",
+        )
+
+    def handle(self, *args, **options):
+        stats = ClickAnalyticsService.rollup(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Zpracováno {stats['clicks']} kliků v {stats['batches']} dávkách"
+            )
+        )
@@ -0,0 +1,49 @@
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from viewer.services import ActivityDigestService
+
+
+class Command(BaseCommand):
+    help = (
+        "Pošle uživatelům denní e-mailový souhrn nepřečtených aktivit "
+        "oblíbených komponent (jeden e-mail na uživatele)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--memory", action="store_true", help="Vypiš i špičkovou spotřebu paměti"
+        )
+
+    def handle(self, *args, **options):
+        if options["memory"]:
+            tracemalloc.start()
+
+        stats = ActivityDigestService.send_digests(progress=self._progress)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Odesláno {stats['emails']} e-mailů ({stats['activities']} aktivit) "
+                f"za {stats['seconds']:.1f} s - "
+                f"{stats['activities_per_second']:.0f} aktivit/s, "
+                f"{stats['emails_per_second']:.0f} e-mailů/s"
+            )
+        )
+        if stats["failed"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{stats['failed']} e-mailů se nepodařilo odeslat, "
+                    "pošlou se při dalším spuštění"
+                )
+            )
+        if options["memory"]:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(f"Špička paměti: {peak / 1024 / 1024:.1f} MB")
+
+    def _progress(self, stats):
+        self.stdout.write(
+            f"{stats['users']} uživatelů, {stats['activities']} aktivit, "
+            f"{stats['activities_per_second']:.0f} aktivit/s"
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from viewer.services import RecommendationService
+
+
+class Command(BaseCommand):
+    help = (
+        "Přepočítá doporučení komponent podle společných oblíbených "
+        "(jen komponenty se změněnými oblíbenými, s --full všechny)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full", action="store_true", help="Přepočítej všechny komponenty"
+        )
+
+    def handle(self, *args, **options):
+        stats = RecommendationService.update(
+            full=options["full"],
+            progress=lambda stats: self.stdout.write(
+                f"Průchod {stats['chunks']}: {stats['baskets']} uživatelů"
+            ),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Přepočítáno {stats['components']} komponent "
+                f"v {stats['chunks']} průchodech"
+            )
+        )
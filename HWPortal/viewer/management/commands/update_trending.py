@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from viewer.services import TrendingService
+
+
+class Command(BaseCommand):
+    help = (
+        "Započítá nové události (kliky, oblíbené, recenze, hlasy) do trendového "
+        "skóre komponent a obnoví žebříčky v cache"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Počet událostí zpracovaných v jedné transakci",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Smaž skóre a započítej znovu všechny události",
+        )
+
+    def handle(self, *args, **options):
+        update = TrendingService.rebuild if options["rebuild"] else TrendingService.update
+        stats = update(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Započítáno {stats['events']} událostí v {stats['batches']} dávkách"
+            )
+        )
@@ -1,10 +1,16 @@
+import math
+
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.db.models import (CASCADE, SET_NULL, CharField, DateField,
-                              DateTimeField, DecimalField, ForeignKey,
-                              IntegerField, Model, TextField)
+                              DateTimeField, DecimalField, FloatField,
+                              ForeignKey, IntegerField, JSONField, Model,
+                              PositiveIntegerField, TextField)
 from django.db.models.fields import BooleanField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 
 class Sockets(Model):
@@ -79,6 +85,8 @@ class Processors(Model):
     clock = IntegerField(default=0)
     dateadded = DateField(auto_now=True)
     rating = IntegerField(default=0)
+    # Počet uživatelů s komponentou v oblíbených (udržují signály UserFavorites)
+    favorites_count = IntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name = "Procesor"
@@ -88,6 +96,8 @@ class Processors(Model):
             models.Index(fields=["manufacturer"]),
             models.Index(fields=["socket"]),
             models.Index(fields=["price"]),
+            # Žebříček podle oblíbenosti (home, řazení výpisu)
+            models.Index(fields=["favorites_count", "rating"]),
         ]
 
     def __repr__(self):
@@ -120,6 +130,8 @@ class Motherboards(Model):
     pciegen = IntegerField(default=0)
     dateadded = DateField(auto_now=True)
     rating = IntegerField(default=0)
+    # Počet uživatelů s komponentou v oblíbených (udržují signály UserFavorites)
+    favorites_count = IntegerField(default=0, editable=False)
     price = DecimalField(default=0, decimal_places=0, max_digits=10)
 
     class Meta:
@@ -130,6 +142,8 @@ class Motherboards(Model):
             models.Index(fields=["manufacturer"]),
             models.Index(fields=["socket"]),
             models.Index(fields=["format"]),
+            # Žebříček podle oblíbenosti (home, řazení výpisu)
+            models.Index(fields=["favorites_count", "rating"]),
         ]
 
     def __repr__(self):
@@ -157,6 +171,8 @@ class Ram(Model):
     clock = IntegerField(default=0)
     dateadded = DateField(auto_now=True)
     rating = IntegerField(default=0)
+    # Počet uživatelů s komponentou v oblíbených (udržují signály UserFavorites)
+    favorites_count = IntegerField(default=0, editable=False)
     price = DecimalField(default=0, decimal_places=0, max_digits=10)
 
     class Meta:
@@ -167,6 +183,8 @@ class Ram(Model):
             models.Index(fields=["manufacturer"]),
             models.Index(fields=["type"]),
             models.Index(fields=["capacity"]),
+            # Žebříček podle oblíbenosti (home, řazení výpisu)
+            models.Index(fields=["favorites_count", "rating"]),
         ]
 
     def __repr__(self):
@@ -191,6 +209,8 @@ class GraphicsCards(Model):
     tgp = IntegerField(default=0)
     dateadded = DateField(auto_now=True)
     rating = IntegerField(default=0)
+    # Počet uživatelů s komponentou v oblíbených (udržují signály UserFavorites)
+    favorites_count = IntegerField(default=0, editable=False)
     price = DecimalField(default=0, decimal_places=0, max_digits=10)
 
     class Meta:
@@ -201,6 +221,8 @@ class GraphicsCards(Model):
             models.Index(fields=["manufacturer"]),
             models.Index(fields=["vram"]),
             models.Index(fields=["price"]),
+            # Žebříček podle oblíbenosti (home, řazení výpisu)
+            models.Index(fields=["favorites_count", "rating"]),
         ]
 
     def __repr__(self):
@@ -224,6 +246,8 @@ class Storage(Model):
     type = ForeignKey(StorageTypes, on_delete=SET_NULL, null=True)
     dateadded = DateField(auto_now=True)
     rating = IntegerField(default=0)
+    # Počet uživatelů s komponentou v oblíbených (udržují signály UserFavorites)
+    favorites_count = IntegerField(default=0, editable=False)
     price = DecimalField(default=0, decimal_places=0, max_digits=10)
 
     class Meta:
@@ -234,6 +258,8 @@ class Storage(Model):
             models.Index(fields=["manufacturer"]),
             models.Index(fields=["type"]),
             models.Index(fields=["capacity"]),
+            # Žebříček podle oblíbenosti (home, řazení výpisu)
+            models.Index(fields=["favorites_count", "rating"]),
         ]
 
     def __repr__(self):
@@ -256,6 +282,8 @@ class PowerSupplyUnits(Model):
     maxpower = IntegerField(default=0)
     dateadded = DateField(auto_now=True)
     rating = IntegerField(default=0)
+    # Počet uživatelů s komponentou v oblíbených (udržují signály UserFavorites)
+    favorites_count = IntegerField(default=0, editable=False)
     price = DecimalField(default=0, decimal_places=0, max_digits=10)
 
     class Meta:
@@ -265,6 +293,8 @@ class PowerSupplyUnits(Model):
         indexes = [
             models.Index(fields=["manufacturer"]),
             models.Index(fields=["maxpower"]),
+            # Žebříček podle oblíbenosti (home, řazení výpisu)
+            models.Index(fields=["favorites_count", "rating"]),
         ]
 
     def __repr__(self):
@@ -280,6 +310,18 @@ class PowerSupplyUnits(Model):
         return self.__repr__()
 
 
+def wilson_lower_bound(positive, total, z=1.96):
+    """Dolní mez Wilsonova intervalu (95 %) podílu kladných hlasů"""
+    if total <= 0:
+        return 0.0
+    phat = positive / total
+    return (
+        phat
+        + z * z / (2 * total)
+        - z * math.sqrt((phat * (1 - phat) + z * z / (4 * total)) / total)
+    ) / (1 + z * z / total)
+
+
 COMPONENT_TYPES = (
     ("processor", "Procesor"),
     ("motherboard", "Základní deska"),
@@ -290,7 +332,111 @@ COMPONENT_TYPES = (
 )
 
 
-class Reviews(Model):
+# Typ komponenty -> model (názvy starých FK na Reviews a UserFavorites jsou stejné)
+COMPONENT_TYPE_MODELS = {
+    "processor": Processors,
+    "motherboard": Motherboards,
+    "ram": Ram,
+    "graphics_card": GraphicsCards,
+    "storage": Storage,
+    "power_supply": PowerSupplyUnits,
+}
+
+
+class ComponentRefMixin:
+    """
+    Odkaz na komponentu jako dvojice (component_type, component_id).
+
+    Přechod ze šesti nullable FK probíhá bez odstávky:
+    1. save() zapisuje obě podoby (dual write),
+    2. příkaz backfill_component_refs doplní component_id starým řádkům,
+    3. settings.COMPONENT_REF_READS = True přepne filtrování na dvojici,
+    4. poté lze FK sloupce odstranit.
+    Komponenty pro seznamy načítá ComponentService.load_components.
+    """
+
+    @staticmethod
+    def component_field(component_type):
+        """Sloupec s id komponenty, podle kterého se filtruje"""
+        if getattr(settings, "COMPONENT_REF_READS", False):
+            return "component_id"
+        return f"{component_type}_id"
+
+    @classmethod
+    def component_filter(cls, component_type, component_id):
+        """Filtr záznamů jedné komponenty"""
+        return {
+            "component_type": component_type,
+            cls.component_field(component_type): component_id,
+        }
+
+    def sync_component_ref(self):
+        """Dual write - doplní dvojici z FK, případně FK z dvojice"""
+        self.__dict__.pop("_component", None)
+        if self.component_type not in COMPONENT_TYPE_MODELS:
+            return
+        fk_id = getattr(self, f"{self.component_type}_id")
+        if fk_id is not None:
+            self.component_id = fk_id
+        elif self.component_id is not None:
+            setattr(self, f"{self.component_type}_id", self.component_id)
+
+    @staticmethod
+    def component_pk_expression(prefix=""):
+        """
+        component_pk jako výraz pro dotazy (prefix např. "review__") -
+        dvojice, u nedoplněných řádků FK
+        """
+        if getattr(settings, "COMPONENT_REF_READS", False):
+            return models.F(f"{prefix}component_id")
+        return Coalesce(
+            f"{prefix}component_id",
+            *(f"{prefix}{fk}_id" for fk in COMPONENT_TYPE_MODELS),
+            output_field=PositiveIntegerField(),
+        )
+
+    @staticmethod
+    def with_component_ref(update_fields):
+        """update_fields měnící komponentu doplní o component_id"""
+        if {"component_type", *COMPONENT_TYPE_MODELS} & set(update_fields):
+            return set(update_fields) | {"component_id"}
+        return update_fields
+
+    @property
+    def component_pk(self):
+        """Id komponenty - z dvojice, u nedoplněných řádků z FK"""
+        if self.component_id is not None:
+            return self.component_id
+        if self.component_type in COMPONENT_TYPE_MODELS:
+            return getattr(self, f"{self.component_type}_id")
+        return None
+
+    @property
+    def component(self):
+        """Vrátí komponentu, na kterou záznam odkazuje"""
+        if "_component" not in self.__dict__:
+            component = None
+            if self.component_type in COMPONENT_TYPE_MODELS:
+                if getattr(self, f"{self.component_type}_id") is not None:
+                    # Použije i komponentu načtenou přes select_related
+                    component = getattr(self, self.component_type)
+                elif self.component_id is not None:
+                    component = (
+                        COMPONENT_TYPE_MODELS[self.component_type]
+                        .objects.filter(pk=self.component_id)
+                        .first()
+                    )
+            self._component = component
+        return self._component
+
+    @property
+    def component_name(self):
+        """Vrátí název komponenty"""
+        component = self.component
+        return component.name if component else "Neznámá komponenta"
+
+
+class Reviews(ComponentRefMixin, Model):
     # Základní informace
     title = CharField(max_length=200, verbose_name="Název recenze")
     author = ForeignKey(User, on_delete=CASCADE, verbose_name="Autor")
@@ -317,12 +463,21 @@ class Reviews(Model):
     cons = TextField(
         verbose_name="Zápory", blank=True, help_text="Negativní stránky produktu"
     )
+    # Klady a zápory rozdělené po řádcích - plní se při uložení (save)
+    pros_items = JSONField(default=list, blank=True, editable=False)
+    cons_items = JSONField(default=list, blank=True, editable=False)
 
     component_type = CharField(
         max_length=20, choices=COMPONENT_TYPES, verbose_name="Typ komponenty"
     )
 
+    # Id komponenty daného typu (viz ComponentRefMixin)
+    component_id = PositiveIntegerField(
+        null=True, blank=True, editable=False, verbose_name="ID komponenty"
+    )
+
     # Foreign keys na jednotlivé komponenty (nullable, protože recenze může být jen pro jeden typ)
+    # Zapisují se souběžně s component_id, po přepnutí čtení půjdou pryč
     processor = ForeignKey(Processors, on_delete=CASCADE, null=True, blank=True)
     motherboard = ForeignKey(Motherboards, on_delete=CASCADE, null=True, blank=True)
     ram = ForeignKey(Ram, on_delete=CASCADE, null=True, blank=True)
@@ -340,15 +495,95 @@ class Reviews(Model):
     # Statistics
     helpful_votes = IntegerField(default=0, verbose_name="Užitečné hlasy")
     total_votes = IntegerField(default=0, verbose_name="Celkem hlasů")
+    # Wilsonovo skóre užitečnosti - přepočítává se spolu s počítadly hlasů
+    helpfulness_score = FloatField(
+        default=0, editable=False, verbose_name="Skóre užitečnosti"
+    )
 
     class Meta:
         ordering = ["-date_created"]
         verbose_name = "Recenze"
         verbose_name_plural = "Recenze"
+        indexes = [
+            # Výpis publikovaných recenzí - částečný index pro každé řazení,
+            # bez kategorie i s ní (keyset stránkování, ReviewService.LISTING_SORTS)
+            models.Index(
+                fields=["-date_created", "-id"],
+                condition=models.Q(is_published=True),
+                name="reviews_pub_date_idx",
+            ),
+            models.Index(
+                fields=["component_type", "-date_created", "-id"],
+                condition=models.Q(is_published=True),
+                name="reviews_pub_type_date_idx",
+            ),
+            models.Index(
+                fields=["-rating", "-helpfulness_score", "-id"],
+                condition=models.Q(is_published=True),
+                name="reviews_pub_rating_idx",
+            ),
+            models.Index(
+                fields=["component_type", "-rating", "-helpfulness_score", "-id"],
+                condition=models.Q(is_published=True),
+                name="reviews_pub_type_rating_idx",
+            ),
+            models.Index(
+                fields=["-helpfulness_score", "-id"],
+                condition=models.Q(is_published=True),
+                name="reviews_pub_helpful_idx",
+            ),
+            models.Index(
+                fields=["component_type", "-helpfulness_score", "-id"],
+                condition=models.Q(is_published=True),
+                name="reviews_pub_type_helpful_idx",
+            ),
+            # Moje recenze
+            models.Index(
+                fields=["author", "-date_created", "-id"], name="reviews_author_date_idx"
+            ),
+            # Recenze jedné komponenty
+            models.Index(
+                fields=["component_type", "component_id", "-date_created"],
+                name="reviews_component_date_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.reviewer_name} ({self.rating}/5)"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stav publikace při načtení - signál pozná, že recenze byla právě publikována
+        instance._was_published = dict(zip(field_names, values)).get("is_published")
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.sync_component_ref()
+        self.pros_items = self.split_lines(self.pros)
+        self.cons_items = self.split_lines(self.cons)
+        self.helpfulness_score = wilson_lower_bound(
+            self.helpful_votes, self.total_votes
+        )
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = self.with_component_ref(update_fields)
+            if {"pros", "cons"} & set(update_fields):
+                # date_updated mění klíč cache vykreslené karty recenze
+                update_fields = set(update_fields) | {
+                    "pros_items",
+                    "cons_items",
+                    "date_updated",
+                }
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def split_lines(text):
+        """Rozdělí text po řádcích, prázdné řádky vynechá"""
+        return [line.strip() for line in (text or "").split("\n") if line.strip()]
+
     def __repr__(self):
         return (
             f"Review(title={self.title}, "
@@ -359,27 +594,14 @@ class Reviews(Model):
         )
 
     @property
-    def component(self):
-        """Vrátí komponentu na kterou se recenze vztahuje"""
-        if self.component_type == "processor" and self.processor:
-            return self.processor
-        elif self.component_type == "motherboard" and self.motherboard:
-            return self.motherboard
-        elif self.component_type == "ram" and self.ram:
-            return self.ram
-        elif self.component_type == "graphics_card" and self.graphics_card:
-            return self.graphics_card
-        elif self.component_type == "storage" and self.storage:
-            return self.storage
-        elif self.component_type == "power_supply" and self.power_supply:
-            return self.power_supply
-        return None
+    def pros_list(self):
+        """Klady jako seznam (starší recenze bez uložených seznamů se rozdělí)"""
+        return self.pros_items or self.split_lines(self.pros)
 
     @property
-    def component_name(self):
-        """Vrátí název komponenty"""
-        component = self.component
-        return component.name if component else "Neznámá komponenta"
+    def cons_list(self):
+        """Zápory jako seznam"""
+        return self.cons_items or self.split_lines(self.cons)
 
     @property
     def stars_display(self):
@@ -410,13 +632,37 @@ class ReviewVotes(Model):
         return f"{self.user.username} - {self.review.title} ({'Užitečné' if self.is_helpful else 'Neužitečné'})"
 
 
-class UserFavorites(Model):
+class ReviewVoteDelta(Model):
+    """
+    Nezapsaná změna počítadel hlasů recenze (REVIEW_VOTE_COUNTERS "buffered").
+    Řádky se jen přidávají ve stejné transakci jako hlas, VoteCounterBuffer
+    je dávkově přičte k recenzím a smaže.
+    """
+
+    review = ForeignKey(Reviews, on_delete=CASCADE, related_name="+")
+    helpful_delta = models.SmallIntegerField(default=0)
+    total_delta = models.SmallIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Nezapsaný hlas"
+        verbose_name_plural = "Nezapsané hlasy"
+
+    def __str__(self):
+        return f"{self.review_id}: {self.helpful_delta:+d} / {self.total_delta:+d}"
+
+
+class UserFavorites(ComponentRefMixin, Model):
     user = ForeignKey(User, on_delete=CASCADE, verbose_name="Uživatel")
     component_type = CharField(
         max_length=20, choices=COMPONENT_TYPES, verbose_name="Typ komponenty"
     )
+    # Id komponenty daného typu (viz ComponentRefMixin)
+    component_id = PositiveIntegerField(
+        null=True, blank=True, editable=False, verbose_name="ID komponenty"
+    )
 
     # Foreign keys na jednotlivé komponenty (pouze jedna bude vyplněná)
+    # Zapisují se souběžně s component_id, po přepnutí čtení půjdou pryč
     processor = ForeignKey(Processors, on_delete=CASCADE, null=True, blank=True)
     motherboard = ForeignKey(Motherboards, on_delete=CASCADE, null=True, blank=True)
     ram = ForeignKey(Ram, on_delete=CASCADE, null=True, blank=True)
@@ -432,6 +678,9 @@ class UserFavorites(Model):
     # Nastavení sledování (pro budoucí notifikace)
     watch_reviews = BooleanField(default=True, verbose_name="Sledovat nové recenze")
     watch_price_changes = BooleanField(default=True, verbose_name="Sledovat změny cen")
+    # Recenze populárních komponent (aktivity skládané až při čtení) do tohoto
+    # času jsou přečtené - posouvá se při "Označit vše jako přečtené"
+    reviews_seen_until = DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
         unique_together = [
@@ -448,34 +697,27 @@ class UserFavorites(Model):
         indexes = [
             # Index pro rychlé vyhledávání oblíbených podle uživatele a typu
             models.Index(fields=["user", "component_type"]),
+            # Sledující jedné komponenty
+            models.Index(
+                fields=["component_type", "component_id"],
+                name="favorites_component_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "component_type", "component_id"],
+                name="unique_user_favorite_component",
+            ),
         ]
 
     def __str__(self):
-        component = self.component
-        return f"{self.user.username} - {component.name if component else 'Neznámá komponenta'}"
+        return f"{self.user.username} - {self.component_name}"
 
-    @property
-    def component(self):
-        """Vrátí komponentu podle typu"""
-        if self.component_type == "processor" and self.processor:
-            return self.processor
-        elif self.component_type == "motherboard" and self.motherboard:
-            return self.motherboard
-        elif self.component_type == "ram" and self.ram:
-            return self.ram
-        elif self.component_type == "graphics_card" and self.graphics_card:
-            return self.graphics_card
-        elif self.component_type == "storage" and self.storage:
-            return self.storage
-        elif self.component_type == "power_supply" and self.power_supply:
-            return self.power_supply
-        return None
-
-    @property
-    def component_name(self):
-        """Vrátí název komponenty"""
-        component = self.component
-        return component.name if component else "Neznámá komponenta"
+    def save(self, *args, **kwargs):
+        self.sync_component_ref()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = self.with_component_ref(kwargs["update_fields"])
+        super().save(*args, **kwargs)
 
     @property
     def component_manufacturer(self):
@@ -485,22 +727,24 @@ class UserFavorites(Model):
 
     @property
     def recent_reviews_count(self):
-        from datetime import datetime, timedelta
+        # Pro seznamy spočítá najednou ReviewService.load_recent_review_counts
+        if "_recent_reviews_count" in self.__dict__:
+            return self._recent_reviews_count
+
+        from datetime import timedelta
 
-        week_ago = datetime.now() - timedelta(days=7)
+        week_ago = timezone.now() - timedelta(days=7)
 
         component = self.component
         if not component:
             return 0
 
         # Počítej recenze pro tuto komponentu za poslední týden
-        filter_kwargs = {
-            self.component_type: component,
-            "date_created__gte": week_ago,
-            "is_published": True,
-        }
-
-        return Reviews.objects.filter(**filter_kwargs).count()
+        return Reviews.objects.filter(
+            **Reviews.component_filter(self.component_type, component.pk),
+            date_created__gte=week_ago,
+            is_published=True,
+        ).count()
 
     @property
     def has_recent_activity(self):
@@ -546,6 +790,14 @@ class FavoriteActivity(Model):
         ordering = ["-date_created"]
         verbose_name = "Aktivita oblíbené komponenty"
         verbose_name_plural = "Aktivity oblíbených komponent"
+        constraints = [
+            # Jedna aktivita recenze na oblíbenou i při souběžném rozeslání
+            models.UniqueConstraint(
+                fields=["favorite", "related_review", "activity_type"],
+                condition=models.Q(related_review__isnull=False),
+                name="unique_review_activity",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.favorite.user.username} - {self.title}"
@@ -555,6 +807,55 @@ class FavoriteActivity(Model):
         return self.favorite.component_name
 
 
+class UnreadActivityCounter(Model):
+    """
+    Počet nepřečtených aktivit uživatele (denormalizace pro odznak v navigaci).
+    Mění ho FavoriteActivityService, čte se přes cache.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name="unread_activity_counter",
+        verbose_name="Uživatel",
+    )
+    unread_count = IntegerField(default=0, verbose_name="Nepřečtené aktivity")
+
+    class Meta:
+        verbose_name = "Počet nepřečtených aktivit"
+        verbose_name_plural = "Počty nepřečtených aktivit"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count}"
+
+
+class ActivityDigest(Model):
+    """
+    Stav denního souhrnu aktivit uživatele - do souhrnu patří jen
+    nepřečtené aktivity s id větším než last_activity_id.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name="activity_digest",
+        verbose_name="Uživatel",
+    )
+    last_activity_id = models.BigIntegerField(
+        default=0, verbose_name="Poslední odeslaná aktivita"
+    )
+    date_sent = DateTimeField(null=True, blank=True, verbose_name="Datum odeslání")
+
+    class Meta:
+        verbose_name = "Souhrn aktivit"
+        verbose_name_plural = "Souhrny aktivit"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.last_activity_id}"
+
+
 class HeurekaClick(Model):
     component_type = CharField(max_length=20, choices=COMPONENT_TYPES)
     component_id = IntegerField()
@@ -562,7 +863,8 @@ class HeurekaClick(Model):
     search_query = CharField(max_length=500)
     user = ForeignKey(User, on_delete=SET_NULL, null=True, blank=True)
     session_key = CharField(max_length=40, blank=True)
-    timestamp = DateTimeField(auto_now_add=True)
+    # Čas kliknutí, ne zápisu - kliky se zapisují dávkově (viewer.buffers)
+    timestamp = DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         verbose_name = "Heureka klik"
@@ -576,3 +878,206 @@ class HeurekaClick(Model):
 
     def __str__(self):
         return f"{self.component_name} - {self.timestamp.strftime('%d.%m.%Y %H:%M')}"
+
+
+class PriceSnapshot(Model):
+    """Souhrn nabídek z Heureky v okamžiku obnovení cache"""
+
+    component_type = CharField(max_length=20, choices=COMPONENT_TYPES)
+    component_id = IntegerField()
+    min_price = DecimalField(decimal_places=0, max_digits=10)
+    avg_price = DecimalField(decimal_places=0, max_digits=10)
+    max_price = DecimalField(decimal_places=0, max_digits=10)
+    shop_count = IntegerField(default=0)
+    date_recorded = DateTimeField(auto_now_add=True, verbose_name="Datum záznamu")
+
+    class Meta:
+        verbose_name = "Cenový snímek"
+        verbose_name_plural = "Cenové snímky"
+        ordering = ["-date_recorded"]
+        indexes = [
+            models.Index(fields=["component_type", "component_id", "-date_recorded"]),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.component_type} #{self.component_id} - {self.min_price} Kč "
+            f"({self.date_recorded.strftime('%d.%m.%Y %H:%M')})"
+        )
+
+
+class HeurekaClickHourly(Model):
+    """Hodinový souhrn Heureka kliků (komponenta × typ uživatele)"""
+
+    USER_TYPES = (
+        ("registered", "Přihlášený"),
+        ("anonymous", "Anonymní"),
+    )
+
+    hour = DateTimeField(verbose_name="Hodina")
+    component_type = CharField(max_length=20, choices=COMPONENT_TYPES)
+    component_id = IntegerField()
+    component_name = CharField(max_length=200)
+    user_type = CharField(max_length=10, choices=USER_TYPES)
+    clicks = IntegerField(default=0, verbose_name="Kliky")
+
+    class Meta:
+        verbose_name = "Heureka kliky za hodinu"
+        verbose_name_plural = "Heureka kliky za hodinu"
+        ordering = ["-hour"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hour", "component_type", "component_id", "user_type"],
+                name="unique_click_rollup_hour",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["component_type", "component_id"]),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.component_name} - {self.hour.strftime('%d.%m.%Y %H:00')} "
+            f"({self.clicks})"
+        )
+
+
+class HeurekaQueryHourly(Model):
+    """Hodinový souhrn Heureka kliků podle hledaného dotazu"""
+
+    hour = DateTimeField(verbose_name="Hodina")
+    search_query = CharField(max_length=500)
+    clicks = IntegerField(default=0, verbose_name="Kliky")
+
+    class Meta:
+        verbose_name = "Heureka dotazy za hodinu"
+        verbose_name_plural = "Heureka dotazy za hodinu"
+        ordering = ["-hour"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hour", "search_query"], name="unique_query_rollup_hour"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.search_query} - {self.hour.strftime('%d.%m.%Y %H:00')}"
+
+
+class TrendingScore(Model):
+    """
+    Exponenciálně tlumená oblíbenost komponenty (TrendingService).
+    Skóre je vztažené k základnímu času, takže nové události se jen
+    přičítají a pořadí platí bez přepočtu starých hodnot.
+    """
+
+    component_type = CharField(max_length=20, choices=COMPONENT_TYPES)
+    component_id = PositiveIntegerField()
+    score = FloatField(default=0)
+
+    class Meta:
+        verbose_name = "Trendové skóre"
+        verbose_name_plural = "Trendová skóre"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["component_type", "component_id"],
+                name="unique_trending_component",
+            ),
+        ]
+        indexes = [
+            # Top N celkem a v kategorii
+            models.Index(fields=["-score"], name="trending_score_idx"),
+            models.Index(
+                fields=["component_type", "-score"], name="trending_type_score_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.component_type}:{self.component_id} ({self.score:.2f})"
+
+
+class ComponentRecommendations(Model):
+    """
+    Nejpodobnější komponenty podle společných oblíbených
+    ("uživatelé, kteří si oblíbili tuto komponentu, si oblíbili také…").
+    Počítá RecommendationService mimo požadavek, detail je čte jedním dotazem.
+    """
+
+    component_type = CharField(max_length=20, choices=COMPONENT_TYPES)
+    component_id = PositiveIntegerField()
+    # [{"type", "id", "name", "manufacturer", "score"}] seřazené podle score
+    neighbours = JSONField(default=list, editable=False)
+    # favorites_count, ze kterého byly sousedé spočítané - při změně se přepočítají
+    favorites_count = IntegerField(default=0, editable=False)
+    date_updated = DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Doporučení komponenty"
+        verbose_name_plural = "Doporučení komponent"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["component_type", "component_id"],
+                name="unique_recommendations_component",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.component_type}:{self.component_id} ({len(self.neighbours)})"
+
+
+class RollupCheckpoint(Model):
+    """Poslední zpracované ID surových dat pro inkrementální joby"""
+
+    name = CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    date_updated = DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Checkpoint souhrnů"
+        verbose_name_plural = "Checkpointy souhrnů"
+
+    def __str__(self):
+        return f"{self.name} ({self.last_id})"
+
+
+class ComponentPriceState(Model):
+    """Poslední známá cena komponenty pro detekci změn cen"""
+
+    component_type = CharField(max_length=20, choices=COMPONENT_TYPES)
+    component_id = IntegerField()
+    # Cena, o které byli sledující naposledy informováni
+    last_price = DecimalField(
+        decimal_places=0, max_digits=10, verbose_name="Poslední známá cena"
+    )
+    # Cena v katalogu při posledním průchodu (detekce úprav v adminu)
+    catalog_price = DecimalField(
+        decimal_places=0, max_digits=10, null=True, blank=True
+    )
+    # Prahy pro konkrétní komponentu, prázdné = PRICE_CHANGE_SETTINGS
+    threshold_percent = DecimalField(
+        decimal_places=1,
+        max_digits=4,
+        null=True,
+        blank=True,
+        verbose_name="Práh změny (%)",
+    )
+    threshold_amount = DecimalField(
+        decimal_places=0,
+        max_digits=10,
+        null=True,
+        blank=True,
+        verbose_name="Práh změny (Kč)",
+    )
+    date_updated = DateTimeField(auto_now=True, verbose_name="Datum aktualizace")
+
+    class Meta:
+        verbose_name = "Stav ceny komponenty"
+        verbose_name_plural = "Stavy cen komponent"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["component_type", "component_id"],
+                name="unique_component_price_state",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.component_type} #{self.component_id} - {self.last_price} Kč"
@@ -0,0 +1,190 @@
+"""
+Full-page cache for anonymous visitors.
+
+Views opt in with @page_cache(*tags), PageCacheMiddleware then serves
+their rendered HTML from the cache to visitors without a session or
+pending messages. Pages are keyed by host, path and normalized query
+string and invalidated by tags ("catalog", "reviews", "home",
+"component:<type>:<id>"): every tag has a version in the cache, a cached
+page remembers the versions it was rendered with and invalidate_tags()
+just bumps them, so one write drops all pages of a tag at once.
+
+CSRF tokens in cached HTML are replaced by a placeholder and filled in
+with a fresh token of the current visitor on every hit.
+"""
+
+import hashlib
+import re
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+PAGE_KEY = "pagecache:page:{digest}"
+TAG_KEY = "pagecache:tag:{tag}"
+
+DEFAULT_CONFIG = {
+    "enabled": True,
+    "timeout": 60 * 5,
+    # Query parameters that do not change the page (tracking)
+    "ignored_params": ["fbclid", "gclid"],
+}
+
+CSRF_INPUT = re.compile(rb'(name="csrfmiddlewaretoken" value=")[A-Za-z0-9]+(")')
+CSRF_PLACEHOLDER = b"__page_cache_csrf_token__"
+
+# Response headers added per request by other middleware
+SKIPPED_HEADERS = {"set-cookie", "content-length", "x-page-cache"}
+
+
+def get_config() -> Dict:
+    return {**DEFAULT_CONFIG, **getattr(settings, "PAGE_CACHE", {})}
+
+
+class PageCacheRule:
+    def __init__(self, tags: Iterable[str], on_hit: Optional[Callable] = None):
+        self.tags = tuple(tags)
+        self.on_hit = on_hit
+
+    def format_tags(self, view_kwargs: Dict) -> List[str]:
+        return [tag.format(**view_kwargs) for tag in self.tags]
+
+
+def page_cache(*tags: str, on_hit: Optional[Callable] = None):
+    """
+    Cache the view for anonymous visitors. Tags may use URL kwargs, e.g.
+    "component:{component_type}:{component_id}". `on_hit(request, **kwargs)`
+    runs on cache hits for side effects the skipped view would have had.
+    """
+
+    def decorator(view_func):
+        view_func.page_cache = PageCacheRule(tags, on_hit)
+        return view_func
+
+    return decorator
+
+
+def invalidate_tags(*tags: str) -> None:
+    """Drop all cached pages carrying any of the tags."""
+    version = time.time_ns()
+    cache.set_many({TAG_KEY.format(tag=tag): version for tag in tags}, None)
+
+
+def tag_versions(tags: Iterable[str]) -> Dict[str, int]:
+    keys = {TAG_KEY.format(tag=tag): tag for tag in tags}
+    versions = cache.get_many(list(keys))
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def page_key(request) -> str:
+    ignored = set(get_config()["ignored_params"])
+    params = sorted(
+        (name, value)
+        for name, values in request.GET.lists()
+        for value in values
+        if value != "" and name not in ignored and not name.startswith("utm_")
+    )
+    url = f"{request.get_host()}{request.path}?{urlencode(params)}"
+    return PAGE_KEY.format(digest=hashlib.md5(url.encode()).hexdigest())
+
+
+def is_anonymous_request(request) -> bool:
+    """
+    Without a session cookie the visitor cannot be logged in nor have
+    session state (comparison list) - checked without loading the session.
+    """
+    return (
+        request.method in ("GET", "HEAD")
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+class PageCacheMiddleware:
+    """Serve and store pages of views decorated with @page_cache."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        pending = getattr(request, "_page_cache", None)
+        if pending is not None and self._is_cacheable_response(request, response):
+            key, versions = pending
+            self._store(key, versions, response)
+            response["X-Page-Cache"] = "MISS"
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        rule = getattr(view_func, "page_cache", None)
+        if rule is None or not get_config()["enabled"]:
+            return None
+        if not is_anonymous_request(request):
+            return None
+
+        key = page_key(request)
+        versions = tag_versions(rule.format_tags(view_kwargs))
+        entry = cache.get(key)
+        if entry is not None and entry["versions"] == versions:
+            if rule.on_hit:
+                rule.on_hit(request, *view_args, **view_kwargs)
+            return self._build_response(request, entry)
+
+        request._page_cache = (key, versions)
+        return None
+
+    @staticmethod
+    def _is_cacheable_response(request, response) -> bool:
+        if response.status_code != 200 or response.streaming or response.cookies:
+            return False
+        # Session data or messages written by the view are saved by
+        # middleware that runs after this one
+        session = getattr(request, "session", None)
+        if session is not None and session.modified:
+            return False
+        storage = getattr(request, "_messages", None)
+        if storage is not None and storage.added_new:
+            return False
+        return "private" not in response.get("Cache-Control", "")
+
+    @staticmethod
+    def _store(key: str, versions: Dict[str, int], response) -> None:
+        cache.set(
+            key,
+            {
+                "versions": versions,
+                "status": response.status_code,
+                "headers": [
+                    (name, value)
+                    for name, value in response.items()
+                    if name.lower() not in SKIPPED_HEADERS
+                ],
+                "content": CSRF_INPUT.sub(
+                    rb"\1" + CSRF_PLACEHOLDER + rb"\2", response.content
+                ),
+            },
+            get_config()["timeout"],
+        )
+
+    @staticmethod
+    def _build_response(request, entry: Dict) -> HttpResponse:
+        content = entry["content"]
+        if CSRF_PLACEHOLDER in content:
+            # Also makes CsrfViewMiddleware set the visitor's csrftoken cookie
+            content = content.replace(CSRF_PLACEHOLDER, get_token(request).encode())
+
+        response = HttpResponse(content, status=entry["status"])
+        for name, value in entry["headers"]:
+            response[name] = value
+        response["X-Page-Cache"] = "HIT"
+        return response
@@ -0,0 +1,180 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of OFFSET the page starts right after the last row of the previous
+page (WHERE (a, b, id) < (x, y, z) ORDER BY a DESC, b DESC, id DESC), so
+every page costs the same index range scan no matter how deep it is.
+"""
+
+import base64
+import json
+from typing import Any, List, Optional, Sequence
+
+from django.db import connections
+from django.db.models import BooleanField, Q, QuerySet
+from django.db.models.expressions import RawSQL
+
+
+def _json_default(value):
+    # Full precision - DjangoJSONEncoder would cut microseconds off datetimes
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+class KeysetPage:
+    """One page of results with cursors to the neighbouring pages."""
+
+    def __init__(
+        self,
+        object_list: List[Any],
+        next_cursor: Optional[str],
+        previous_cursor: Optional[str],
+    ):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by the values of its ordering fields.
+    The ordering must be deterministic - the primary key is appended
+    when it is missing.
+    """
+
+    def __init__(self, queryset: QuerySet, ordering: Sequence[str], per_page: int = 10):
+        ordering = list(ordering)
+        if not any(f.lstrip("-") in ("pk", "id") for f in ordering):
+            ordering.append("-pk" if ordering[0].startswith("-") else "pk")
+
+        self.queryset = queryset
+        self.per_page = per_page
+        # [(field name, descending)]
+        self.ordering = [(f.lstrip("-"), f.startswith("-")) for f in ordering]
+        self.model = queryset.model
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        """Return the page after / before the cursor, invalid cursor = first page."""
+        position = self._decode(cursor)
+        backwards = position is not None and position["direction"] == "previous"
+
+        queryset = self.queryset.order_by(*self._order_by(reverse=backwards))
+        if position is not None:
+            queryset = queryset.filter(
+                self._seek_filter(position["values"], reverse=backwards)
+            )
+
+        rows = list(queryset[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage([], None, None)
+
+        if backwards:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        return KeysetPage(
+            rows,
+            self._encode(rows[-1], "next") if has_next else None,
+            self._encode(rows[0], "previous") if has_previous else None,
+        )
+
+    def cursor_for(self, obj: Any) -> str:
+        """Cursor of the page that starts right after `obj`."""
+        return self._encode(obj, "next")
+
+    def _order_by(self, reverse: bool = False) -> List[str]:
+        return [
+            f"-{name}" if descending != reverse else name
+            for name, descending in self.ordering
+        ]
+
+    def _seek_filter(self, values: List[Any], reverse: bool = False):
+        """
+        Rows strictly after the cursor in the ordering.
+        With one sort direction this is a row-value comparison
+        (a, b, id) < (x, y, z) the database can seek in the index. Mixed
+        directions are expanded as (a > x) OR (a = x AND b < y) OR ...
+        """
+        directions = {descending for _, descending in self.ordering}
+        if len(directions) == 1:
+            operator = "<" if directions.pop() != reverse else ">"
+            connection = connections[self.queryset.db]
+            columns, params = [], []
+            for (name, _), value in zip(self.ordering, values):
+                field = self._field(name)
+                columns.append(
+                    f"{connection.ops.quote_name(self.model._meta.db_table)}."
+                    f"{connection.ops.quote_name(field.column)}"
+                )
+                params.append(field.get_db_prep_value(value, connection))
+            placeholders = ", ".join(["%s"] * len(columns))
+            return RawSQL(
+                f"({', '.join(columns)}) {operator} ({placeholders})",
+                params,
+                output_field=BooleanField(),
+            )
+
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.ordering, values):
+            lookup = "lt" if descending != reverse else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _field(self, name: str):
+        opts = self.model._meta
+        return opts.pk if name == "pk" else opts.get_field(name)
+
+    def _encode(self, obj: Any, direction: str) -> str:
+        values = [getattr(obj, name) for name, _ in self.ordering]
+        payload = json.dumps(
+            {"d": direction, "v": values}, default=_json_default, separators=(",", ":")
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def _decode(self, cursor: Optional[str]) -> Optional[dict]:
+        if not cursor:
+            return None
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            direction, raw_values = payload["d"], payload["v"]
+            if direction not in ("next", "previous") or len(raw_values) != len(
+                self.ordering
+            ):
+                return None
+            values = [
+                self._field(name).to_python(value)
+                for (name, _), value in zip(self.ordering, raw_values)
+            ]
+        except Exception:
+            return None
+        return {"direction": direction, "values": values}
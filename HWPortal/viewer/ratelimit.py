@@ -0,0 +1,171 @@
+"""
+Cache-backed rate limiting for write endpoints.
+
+Limits are configured by name in settings.RATE_LIMITS and applied either
+to a view with the @ratelimit("name") decorator or to URL paths by
+RateLimitMiddleware (entries with "paths"). Counting uses a sliding
+window built from two fixed-window counters in the cache, so a check
+costs a couple of cache operations and no database queries.
+"""
+
+import math
+import time
+from functools import wraps
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+
+TOO_MANY_REQUESTS_MESSAGE = "Příliš mnoho požadavků. Zkuste to prosím později."
+
+
+def client_ip(request) -> str:
+    """
+    Client address. Behind a reverse proxy REMOTE_ADDR is the proxy itself,
+    settings.RATE_LIMIT_CLIENT_IP_HEADER (e.g. "HTTP_X_REAL_IP") names the
+    header the proxy sets - only configure it when the proxy overwrites it,
+    otherwise clients can spoof their bucket. For X-Forwarded-For the last
+    address (appended by the proxy) is used.
+    """
+    header = getattr(settings, "RATE_LIMIT_CLIENT_IP_HEADER", None)
+    if header and request.META.get(header):
+        return request.META[header].split(",")[-1].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def parse_rate(rate: str):
+    """Parse "10/m" into (10, 60)."""
+    count, _, unit = rate.partition("/")
+    return int(count), PERIODS[unit]
+
+
+class RateLimiter:
+    """
+    Sliding-window limiter for one named rule.
+    `key` is "user_or_ip" (logged-in user id from the session, IP address
+    otherwise) or "ip". Counters live in the default cache, the limits hold
+    across processes only when it is shared (Redis, Memcached).
+    """
+
+    KEY = "ratelimit:{name}:{ident}:{window}"
+
+    def __init__(
+        self,
+        name: str,
+        rate: str,
+        key: str = "user_or_ip",
+        methods: Iterable[str] = ("POST",),
+        paths: Iterable[str] = (),
+    ):
+        self.name = name
+        self.limit, self.period = parse_rate(rate)
+        self.key = key
+        self.methods = set(methods)
+        self.paths = tuple(paths)
+
+    @classmethod
+    def from_settings(cls, name: str) -> Optional["RateLimiter"]:
+        config = getattr(settings, "RATE_LIMITS", {}).get(name)
+        return cls(name, **config) if config else None
+
+    @classmethod
+    def all_from_settings(cls):
+        return [
+            cls(name, **config)
+            for name, config in getattr(settings, "RATE_LIMITS", {}).items()
+        ]
+
+    def identify(self, request) -> str:
+        if self.key == "user_or_ip":
+            # User id straight from the session, without loading the user
+            session = getattr(request, "session", None)
+            user_id = session.get(SESSION_KEY) if session is not None else None
+            if user_id:
+                return f"user:{user_id}"
+        return f"ip:{client_ip(request)}"
+
+    def hit(self, request) -> Optional[int]:
+        """
+        Count the request. Returns None when it is allowed, otherwise the
+        number of seconds the client should wait.
+        """
+        if request.method not in self.methods:
+            return None
+
+        now = time.time()
+        window = int(now // self.period)
+        ident = self.identify(request)
+        current_key = self.KEY.format(name=self.name, ident=ident, window=window)
+        previous_key = self.KEY.format(name=self.name, ident=ident, window=window - 1)
+
+        cache.add(current_key, 0, self.period * 2)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(current_key, 1, self.period * 2)
+            current = 1
+        previous = cache.get(previous_key, 0)
+
+        # Weight the previous window by how much of it still overlaps
+        elapsed = now - window * self.period
+        estimated = previous * (1 - elapsed / self.period) + current
+        if estimated <= self.limit:
+            return None
+        return max(1, math.ceil(self.period - elapsed))
+
+
+def too_many_requests(request, retry_after: int):
+    if (
+        request.content_type == "application/json"
+        or request.headers.get("x-requested-with") == "XMLHttpRequest"
+    ):
+        response = JsonResponse(
+            {"success": False, "error": TOO_MANY_REQUESTS_MESSAGE}, status=429
+        )
+    else:
+        response = HttpResponse(
+            TOO_MANY_REQUESTS_MESSAGE,
+            status=429,
+            content_type="text/plain; charset=utf-8",
+        )
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def ratelimit(name: str):
+    """Limit a view by the RATE_LIMITS rule of the given name."""
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            limiter = RateLimiter.from_settings(name)
+            if limiter is not None:
+                retry_after = limiter.hit(request)
+                if retry_after:
+                    return too_many_requests(request, retry_after)
+            return view_func(request, *args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+class RateLimitMiddleware:
+    """Apply RATE_LIMITS rules that define "paths" (e.g. login forms)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        for limiter in RateLimiter.all_from_settings():
+            if limiter.paths and request.path.startswith(limiter.paths):
+                retry_after = limiter.hit(request)
+                if retry_after:
+                    return too_many_requests(request, retry_after)
+
+        return self.get_response(request)
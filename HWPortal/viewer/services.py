@@ -3,14 +3,82 @@ Business logic services for the viewer app.
 Separates complex logic from views for better maintainability and testing.
 """
 
-from typing import Any, Dict, List, Tuple
-
+import hashlib
+import heapq
+import json
+import logging
+import math
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Avg, Count, Q, QuerySet
+from django.core.mail import EmailMessage
+from django.core.mail import get_connection as get_mail_connection
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (Avg, Case, Count, F, Max, OuterRef, Q, QuerySet,
+                              Subquery, Sum, Value, When)
+from django.db.models.functions import Coalesce, Greatest, TruncDate, TruncHour
+from django.template.loader import get_template, render_to_string
+from django.urls import reverse
 from django.utils import timezone
-
-from .models import (GraphicsCards, Motherboards, PowerSupplyUnits, Processors,
-                     Ram, Reviews, Storage)
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.safestring import mark_safe
+
+from .models import (ActivityDigest, ComponentPriceState,
+                     ComponentRecommendations, FavoriteActivity, GraphicsCards,
+                     HeurekaClick, HeurekaClickHourly, HeurekaQueryHourly,
+                     Motherboards, PowerSupplyUnits, PriceSnapshot, Processors,
+                     Ram, Reviews, ReviewVoteDelta, ReviewVotes,
+                     RollupCheckpoint, Storage, TrendingScore,
+                     UnreadActivityCounter, UserFavorites, wilson_lower_bound)
+from .pagecache import invalidate_tags
+
+logger = logging.getLogger(__name__)
+
+
+def supports_returning() -> bool:
+    """Whether the database accepts INSERT / UPDATE / DELETE ... RETURNING."""
+    return connection.vendor == "postgresql" or (
+        connection.vendor == "sqlite"
+        and connection.Database.sqlite_version_info >= (3, 35)
+    )
+
+
+def settled_max_id(name: str, queryset: QuerySet, settle_delay: timedelta) -> int:
+    """
+    Highest id an incremental job may fold in.
+
+    Ids are allocated on insert, not on commit, so a transaction that is
+    still open may later commit ids below the current maximum. The maximum
+    seen by a run (the "<name>:horizon" checkpoint) is therefore trusted
+    only by a later run, once settle_delay has passed - writers holding
+    lower ids have committed by then. Returns 0 while nothing is settled.
+    """
+    current = queryset.aggregate(max_id=Max("id"))["max_id"] or 0
+    horizon, created = RollupCheckpoint.objects.get_or_create(
+        name=f"{name}:horizon", defaults={"last_id": current}
+    )
+    if created or horizon.date_updated > timezone.now() - settle_delay:
+        return 0
+
+    settled_id = horizon.last_id
+    horizon.last_id = current
+    horizon.save(update_fields=["last_id", "date_updated"])
+    return settled_id
 
 
 class ComponentService:
@@ -143,6 +211,7 @@ class ComponentService:
             "price": component.price,
             "rating": component.rating,
             "reviews_count": getattr(component, "reviews_count", 0),
+            "favorites_count": component.favorites_count,
             "icon": category,
         }
 
@@ -186,6 +255,7 @@ class ComponentService:
             "price_asc": lambda x: x["price"] or 0,
             "price_desc": lambda x: -(x["price"] or 0),
             "rating": lambda x: -(x["rating"] or 0),
+            "popularity": lambda x: (-x["favorites_count"], -(x["rating"] or 0)),
             "name": lambda x: x["name"].lower(),
         }
 
@@ -215,6 +285,90 @@ class ComponentService:
 
         return sorted(manufacturers)
 
+    @classmethod
+    def get_type_models(cls) -> Dict[str, Any]:
+        """Map component types (e.g. "processor") to their models."""
+        return {
+            cls.COMPONENT_TYPE_MAPPING[category]: model
+            for category, model in cls.COMPONENT_MODELS.items()
+        }
+
+    @classmethod
+    def filter_existing(
+        cls, items: Iterable[Tuple[str, int]]
+    ) -> List[Tuple[str, int]]:
+        """Keep (type, id) pairs of existing components, one query per type."""
+        models = cls.get_type_models()
+        by_type = {}
+        for component_type, component_id in items:
+            if component_type in models:
+                by_type.setdefault(component_type, set()).add(component_id)
+        existing = {
+            (component_type, component_id)
+            for component_type, ids in by_type.items()
+            for component_id in models[component_type]
+            .objects.filter(pk__in=ids)
+            .order_by()
+            .values_list("pk", flat=True)
+        }
+        return [item for item in items if item in existing]
+
+    @classmethod
+    def load_components(cls, objects: Iterable[Any]) -> List[Any]:
+        """
+        Attach components to reviews / favorites of mixed types with at
+        most one query per component type (instead of a LEFT JOIN per type).
+        """
+        objects = list(objects)
+        ids_by_type = {}
+        for obj in objects:
+            if obj.component_pk is not None:
+                ids_by_type.setdefault(obj.component_type, set()).add(obj.component_pk)
+
+        models = cls.get_type_models()
+        components = {
+            component_type: models[component_type].objects.in_bulk(ids)
+            for component_type, ids in ids_by_type.items()
+            if component_type in models
+        }
+        for obj in objects:
+            obj._component = components.get(obj.component_type, {}).get(
+                obj.component_pk
+            )
+        return objects
+
+    @classmethod
+    def adjust_favorites_count(
+        cls, component_type: str, component_id: Optional[int], delta: int
+    ) -> None:
+        """Add `delta` to the denormalized favorites_count of one component."""
+        model = cls.get_type_models().get(component_type)
+        if model is None or component_id is None or not delta:
+            return
+        model.objects.filter(pk=component_id).update(
+            favorites_count=Greatest(F("favorites_count") + delta, 0)
+        )
+
+    @classmethod
+    def recount_favorites(cls) -> int:
+        """Recompute favorites_count of every component from UserFavorites."""
+        updated = 0
+        for component_type, model in cls.get_type_models().items():
+            field = UserFavorites.component_field(component_type)
+            counts = (
+                UserFavorites.objects.filter(
+                    component_type=component_type, **{field: OuterRef("pk")}
+                )
+                .order_by()
+                .values(field)
+                .annotate(count=Count("id"))
+                .values("count")
+            )
+            updated += model.objects.update(
+                favorites_count=Coalesce(Subquery(counts), 0)
+            )
+        return updated
+
     @classmethod
     def get_component_by_type_and_id(
         cls, component_type: str, component_id: int
@@ -373,17 +527,195 @@ class ComponentService:
 class ReviewService:
     """Service class for handling review-related business logic."""
 
+    # Sort options of the reviews listing - each has a matching index on Reviews
+    LISTING_SORTS = {
+        "newest": ["-date_created", "-id"],
+        "oldest": ["date_created", "id"],
+        "best": ["-rating", "-helpfulness_score", "-id"],
+        "worst": ["rating", "helpfulness_score", "id"],
+        "helpful": ["-helpfulness_score", "-id"],
+    }
+
+    @classmethod
+    def get_listing(
+        cls, category: str = "", sort_by: str = "newest"
+    ) -> Tuple[QuerySet, List[str]]:
+        """
+        Published reviews for the listing and their keyset ordering.
+        Components are not joined - load them with
+        ComponentService.load_components for the rows that need them.
+        """
+        reviews = Reviews.objects.filter(is_published=True).select_related("author")
+        if category:
+            reviews = reviews.filter(component_type=category)
+
+        ordering = cls.LISTING_SORTS.get(sort_by, cls.LISTING_SORTS["newest"])
+        return reviews, ordering
+
+    STATISTICS_CACHE_KEY = "reviews:statistics"
+    # Safety net for changes that bypass signals (queryset.update etc.)
+    STATISTICS_CACHE_TIMEOUT = 60 * 5
+    # Fields that change the site-wide statistics when saved
+    STATISTICS_FIELDS = {"is_published", "rating", "component_type"}
+
+    @classmethod
+    def get_site_statistics(cls) -> Dict[str, Any]:
+        """
+        Totals of published reviews for the reviews page header.
+        One GROUP BY component_type query, cached until a review is
+        created, deleted or (un)published.
+        """
+        stats = cache.get(cls.STATISTICS_CACHE_KEY)
+        if stats is not None:
+            return stats
+
+        rows = (
+            Reviews.objects.filter(is_published=True)
+            .values("component_type")
+            .annotate(total=Count("id"), rating_sum=Sum("rating"))
+            .order_by()
+        )
+
+        categories_count = {t: 0 for t in ComponentService.TYPE_DISPLAY_NAMES}
+        total = rating_sum = 0
+        for row in rows:
+            categories_count[row["component_type"]] = row["total"]
+            total += row["total"]
+            rating_sum += row["rating_sum"] or 0
+
+        stats = {
+            "total_reviews": total,
+            "avg_rating": rating_sum / total if total else 0,
+            "categories_count": categories_count,
+        }
+        cache.set(cls.STATISTICS_CACHE_KEY, stats, cls.STATISTICS_CACHE_TIMEOUT)
+        return stats
+
+    @classmethod
+    def invalidate_site_statistics(cls) -> None:
+        cache.delete(cls.STATISTICS_CACHE_KEY)
+
+    # Rendered review cards - bump the version when review_card.html changes
+    CARD_CACHE_KEY = "reviews:card:v1:{id}:{updated}:{helpful}:{total}:{component}"
+    CARD_CACHE_TIMEOUT = 60 * 60
+    # Changed with the component (its name is on the card)
+    CARD_COMPONENT_KEY = "reviews:card:component:{type}:{id}"
+
+    @classmethod
+    def render_cards(cls, reviews: Iterable[Reviews]) -> List[str]:
+        """
+        HTML cards of the reviews for the listing. Cards are cached per
+        review id, date_updated, vote counters (votes do not touch
+        date_updated) and component version, fetched with two cache
+        multi-gets.
+        """
+        reviews = list(reviews)
+        component_keys = [
+            cls.CARD_COMPONENT_KEY.format(
+                type=review.component_type, id=review.component_pk
+            )
+            for review in reviews
+        ]
+        versions = cache.get_many(component_keys)
+        keys = [
+            cls.CARD_CACHE_KEY.format(
+                id=review.pk,
+                updated=review.date_updated.timestamp(),
+                helpful=review.helpful_votes,
+                total=review.total_votes,
+                component=versions.get(component_key, 0),
+            )
+            for review, component_key in zip(reviews, component_keys)
+        ]
+        cached = cache.get_many(keys)
+
+        # Components only for the cards that have to be rendered
+        ComponentService.load_components(
+            review for key, review in zip(keys, reviews) if key not in cached
+        )
+
+        cards, missing = [], {}
+        for key, review in zip(keys, reviews):
+            card = cached.get(key)
+            if card is None:
+                card = render_to_string(
+                    "viewer/partials/review_card.html",
+                    {
+                        "review": review,
+                        "icon_class": ComponentService.TYPE_CSS_CLASSES.get(
+                            review.component_type, "bg-gray-100 text-gray-800"
+                        ),
+                        "type_display": ComponentService.TYPE_DISPLAY_NAMES.get(
+                            review.component_type, review.component_type
+                        ),
+                    },
+                )
+                missing[key] = card
+            cards.append(mark_safe(card))
+
+        if missing:
+            cache.set_many(missing, cls.CARD_CACHE_TIMEOUT)
+        return cards
+
+    @classmethod
+    def invalidate_component_cards(
+        cls, component_type: str, component_id: int
+    ) -> None:
+        # Expires with the cards: those keyed without a version predate it
+        cache.set(
+            cls.CARD_COMPONENT_KEY.format(type=component_type, id=component_id),
+            time.time_ns(),
+            cls.CARD_CACHE_TIMEOUT,
+        )
+
+    @classmethod
+    def load_recent_review_counts(
+        cls, favorites: Iterable[UserFavorites], days: int = 7
+    ) -> List[UserFavorites]:
+        """
+        Set recent_reviews_count on a list of favorites with one grouped
+        COUNT per component type instead of a query per favorite.
+        """
+        favorites = list(favorites)
+        since = timezone.now() - timedelta(days=days)
+
+        ids_by_type = {}
+        for favorite in favorites:
+            if favorite.component_pk is not None:
+                ids_by_type.setdefault(favorite.component_type, set()).add(
+                    favorite.component_pk
+                )
+
+        counts = {}
+        for component_type, ids in ids_by_type.items():
+            field = Reviews.component_field(component_type)
+            counts[component_type] = dict(
+                Reviews.objects.filter(
+                    component_type=component_type,
+                    is_published=True,
+                    date_created__gte=since,
+                    **{f"{field}__in": ids},
+                )
+                .values_list(field)
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+
+        for favorite in favorites:
+            favorite._recent_reviews_count = counts.get(
+                favorite.component_type, {}
+            ).get(favorite.component_pk, 0)
+        return favorites
+
     @classmethod
     def get_component_reviews(
         cls, component: Any, component_type: str, limit: int = 10
     ) -> QuerySet:
         """Get reviews for a specific component."""
-        reviews_field = ComponentService.REVIEWS_FIELD_MAPPING.get(component_type)
-
-        if not reviews_field:
+        if component_type not in ComponentService.REVIEWS_FIELD_MAPPING:
             return Reviews.objects.none()
 
-        reviews_filter = {reviews_field: component}
+        reviews_filter = Reviews.component_filter(component_type, component.pk)
 
         try:
             return (
@@ -399,16 +731,14 @@ class ReviewService:
         cls, component: Any, component_type: str
     ) -> Dict[str, Any]:
         """Get review statistics for a component."""
-        reviews_field = ComponentService.REVIEWS_FIELD_MAPPING.get(component_type)
-
-        if not reviews_field:
+        if component_type not in ComponentService.REVIEWS_FIELD_MAPPING:
             return {
                 "avg_rating": None,
                 "total_reviews": 0,
                 "rating_distribution": {},
             }
 
-        reviews_filter = {reviews_field: component}
+        reviews_filter = Reviews.component_filter(component_type, component.pk)
 
         try:
             reviews = Reviews.objects.filter(**reviews_filter, is_published=True)
@@ -436,6 +766,454 @@ class ReviewService:
             }
 
 
+class ReviewFeedService:
+    """
+    Atom and JSON feeds of the latest published reviews - site-wide, per
+    component type and per component.
+
+    Rendered feeds are cached under a version that is bumped whenever a
+    review is published, changed or deleted, so a poll between two
+    publishes is one cache read. The ETag and Last-Modified stored with
+    the body let views answer conditional requests with 304.
+    """
+
+    FORMATS = {
+        "atom": "application/atom+xml; charset=utf-8",
+        "json": "application/feed+json; charset=utf-8",
+    }
+    FEED_LIMIT = 20
+    # How long clients may reuse a feed before revalidating (seconds)
+    MAX_AGE = 60
+    VERSION_CACHE_KEY = "reviews:feed:version"
+    FEED_CACHE_KEY = "reviews:feed:{version}:{fmt}:{base}:{type}:{id}"
+    # Safety net for changes that bypass signals (queryset.update etc.)
+    FEED_CACHE_TIMEOUT = 60 * 60
+    # Saves touching only these fields do not change any feed
+    IGNORED_FIELDS = {"helpful_votes", "total_votes", "helpfulness_score"}
+
+    @classmethod
+    def get_feed(
+        cls,
+        fmt: str,
+        base_url: str,
+        component_type: str = "",
+        component_id: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Cached feed as {"body", "content_type", "etag", "last_modified"}.
+        Returns None for an unknown format, component type or component.
+        `base_url` (scheme and host) makes the links absolute.
+        """
+        if fmt not in cls.FORMATS:
+            return None
+        if component_type and component_type not in ComponentService.TYPE_DISPLAY_NAMES:
+            return None
+
+        version = cls._version()
+        key = cls.FEED_CACHE_KEY.format(
+            version=version,
+            fmt=fmt,
+            base=base_url,
+            type=component_type,
+            id=component_id or "",
+        )
+        feed = cache.get(key)
+        if feed is not None:
+            return feed
+
+        reviews, ordering = ReviewService.get_listing(component_type)
+        title = "Nejnovější recenze"
+        if component_id is not None:
+            model = ComponentService.get_type_models()[component_type]
+            component = model.objects.filter(pk=component_id).first()
+            if component is None:
+                return None
+            reviews = reviews.filter(
+                **Reviews.component_filter(component_type, component_id)
+            )
+            title = f"{title} - {component.name}"
+        elif component_type:
+            title = f"{title} - {ComponentService.TYPE_DISPLAY_NAMES[component_type]}"
+
+        # Same ordering as the "newest" listing -> served by its partial index
+        items = [
+            cls._build_item(review, base_url)
+            for review in ComponentService.load_components(
+                reviews.order_by(*ReviewService.LISTING_SORTS["newest"])[
+                    : cls.FEED_LIMIT
+                ]
+            )
+        ]
+
+        home_url = base_url + (
+            reverse("component_detail", args=[component_type, component_id])
+            if component_id is not None
+            else reverse("reviews")
+        )
+        feed_url = base_url + cls.feed_path(fmt, component_type, component_id)
+        if fmt == "atom":
+            body = cls._render_atom(title, home_url, feed_url, items)
+        else:
+            body = cls._render_json(title, home_url, feed_url, items)
+
+        feed = {
+            "body": body,
+            "content_type": cls.FORMATS[fmt],
+            "etag": hashlib.md5(body).hexdigest(),
+            # Unpublished / deleted reviews only bump the version, the items
+            # left in the feed may be older - If-Modified-Since must not match
+            "last_modified": max(
+                [item["updated"] for item in items]
+                + [datetime.fromtimestamp(version / 1e9, tz=dt_timezone.utc)]
+            ),
+        }
+        cache.set(key, feed, cls.FEED_CACHE_TIMEOUT)
+        return feed
+
+    @staticmethod
+    def feed_path(
+        fmt: str, component_type: str = "", component_id: Optional[int] = None
+    ) -> str:
+        if component_id is not None:
+            return reverse(
+                "component_reviews_feed", args=[component_type, component_id, fmt]
+            )
+        if component_type:
+            return reverse("reviews_type_feed", args=[component_type, fmt])
+        return reverse("reviews_feed", args=[fmt])
+
+    @classmethod
+    def invalidate_feeds(cls) -> None:
+        # A fresh version orphans every cached feed at once
+        cache.set(cls.VERSION_CACHE_KEY, time.time_ns(), None)
+
+    @classmethod
+    def _version(cls) -> int:
+        version = cache.get(cls.VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(cls.VERSION_CACHE_KEY, time.time_ns(), None)
+            version = cache.get(cls.VERSION_CACHE_KEY)
+        return version
+
+    @staticmethod
+    def _build_item(review: Reviews, base_url: str) -> Dict[str, Any]:
+        component = review.component
+        url = base_url + (
+            reverse("component_detail", args=[review.component_type, component.id])
+            if component
+            else reverse("reviews")
+        )
+        return {
+            "id": review.pk,
+            "url": f"{url}#review-{review.pk}",
+            "title": review.title,
+            "summary": review.summary,
+            "content": review.content,
+            "rating": review.rating,
+            "author": review.reviewer_name
+            or (review.author.username if review.author_id else ""),
+            "component_type": review.component_type,
+            "component_name": review.component_name,
+            "published": review.date_created,
+            "updated": review.date_updated,
+        }
+
+    @staticmethod
+    def _render_atom(
+        title: str, home_url: str, feed_url: str, items: List[Dict[str, Any]]
+    ) -> bytes:
+        feed = Atom1Feed(
+            title=title,
+            link=home_url,
+            description="",
+            feed_url=feed_url,
+            feed_guid=feed_url,
+            language="cs",
+        )
+        for item in items:
+            feed.add_item(
+                title=item["title"],
+                link=item["url"],
+                description=item["summary"] or item["content"],
+                unique_id=item["url"],
+                pubdate=item["published"],
+                updateddate=item["updated"],
+                author_name=item["author"] or None,
+                categories=[item["component_name"]],
+            )
+        return feed.writeString("utf-8").encode()
+
+    @staticmethod
+    def _render_json(
+        title: str, home_url: str, feed_url: str, items: List[Dict[str, Any]]
+    ) -> bytes:
+        data = {
+            "version": "https://jsonfeed.org/version/1.1",
+            "title": title,
+            "home_page_url": home_url,
+            "feed_url": feed_url,
+            "language": "cs",
+            "items": [
+                {
+                    "id": item["url"],
+                    "url": item["url"],
+                    "title": item["title"],
+                    "summary": item["summary"],
+                    "content_text": item["content"],
+                    "date_published": item["published"].isoformat(),
+                    "date_modified": item["updated"].isoformat(),
+                    "authors": [{"name": item["author"]}] if item["author"] else [],
+                    "tags": [item["component_name"]],
+                    "_review": {
+                        "id": item["id"],
+                        "rating": item["rating"],
+                        "component_type": item["component_type"],
+                    },
+                }
+                for item in items
+            ],
+        }
+        return json.dumps(data, ensure_ascii=False).encode()
+
+
+class VoteService:
+    """
+    Helpful / unhelpful votes on reviews.
+    ReviewVotes (unique per review and user) is the source of truth, the
+    counters on Reviews are adjusted with atomic increments in the same
+    transaction, so concurrent votes never lose updates.
+
+    With REVIEW_VOTE_COUNTERS["mode"] = "buffered" the counter deltas are
+    appended to ReviewVoteDelta and written in batches by VoteCounterBuffer,
+    reads merge the pending deltas (see merge_pending_counters).
+    """
+
+    @staticmethod
+    def is_buffered() -> bool:
+        return (
+            getattr(settings, "REVIEW_VOTE_COUNTERS", {}).get("mode") == "buffered"
+        )
+
+    @classmethod
+    def cast_vote(cls, review: Reviews, user: Any, is_helpful: bool) -> Dict[str, Any]:
+        """Add, change or toggle off the user's vote and return the new counters."""
+        is_helpful = bool(is_helpful)
+
+        with transaction.atomic():
+            vote = (
+                ReviewVotes.objects.select_for_update()
+                .filter(review=review, user=user)
+                .first()
+            )
+
+            if vote is None:
+                try:
+                    with transaction.atomic():
+                        ReviewVotes.objects.create(
+                            review=review, user=user, is_helpful=is_helpful
+                        )
+                except IntegrityError:
+                    # Parallel request of the same user won - treat as existing
+                    vote = ReviewVotes.objects.select_for_update().get(
+                        review=review, user=user
+                    )
+                else:
+                    action, user_vote = "added", is_helpful
+                    helpful_delta, total_delta = int(is_helpful), 1
+
+            if vote is not None:
+                if vote.is_helpful == is_helpful:
+                    # Same vote again - toggle it off
+                    vote.delete()
+                    action, user_vote = "removed", None
+                    helpful_delta, total_delta = -int(is_helpful), -1
+                else:
+                    vote.is_helpful = is_helpful
+                    vote.save(update_fields=["is_helpful"])
+                    action, user_vote = "changed", is_helpful
+                    helpful_delta, total_delta = (1 if is_helpful else -1), 0
+
+            transaction.on_commit(
+                lambda: cls.update_vote_map(user.pk, review.pk, user_vote)
+            )
+
+            if cls.is_buffered():
+                from .buffers import get_vote_counter_buffer
+
+                # Committed together with the vote, written to Reviews by the flush
+                ReviewVoteDelta.objects.create(
+                    review_id=review.pk,
+                    helpful_delta=helpful_delta,
+                    total_delta=total_delta,
+                )
+                get_vote_counter_buffer().ensure_started()
+            else:
+                helpful_votes, total_votes = cls._apply_delta(
+                    review.pk, helpful_delta, total_delta
+                )
+                # Row is locked by the UPDATE above, the score cannot go stale
+                Reviews.objects.filter(pk=review.pk).update(
+                    helpfulness_score=wilson_lower_bound(helpful_votes, total_votes)
+                )
+
+        if cls.is_buffered():
+            review = Reviews.objects.only("helpful_votes", "total_votes").get(
+                pk=review.pk
+            )
+            cls.merge_pending_counters([review])
+            helpful_votes, total_votes = review.helpful_votes, review.total_votes
+
+        return {
+            "action": action,
+            "helpful_votes": helpful_votes,
+            "unhelpful_votes": total_votes - helpful_votes,
+            "total_votes": total_votes,
+            "user_vote": user_vote,
+        }
+
+    # Packed map of one user's votes: sorted array of review_id << 1 | is_helpful
+    VOTE_MAP_CACHE_KEY = "votes:user:{user_id}"
+    VOTE_MAP_LOCK_KEY = "votes:user:{user_id}:lock"
+    # Bumped by every vote, a map is valid only with the current generation
+    VOTE_MAP_GENERATION_KEY = "votes:user:{user_id}:generation"
+    # Extended on every read, so only maps of inactive users expire
+    VOTE_MAP_TIMEOUT = 60 * 30
+    # Outlives the map it guards; a missing generation only forces a reload
+    VOTE_MAP_GENERATION_TIMEOUT = VOTE_MAP_TIMEOUT * 2
+
+    @classmethod
+    def get_user_votes(
+        cls, user_id: int, review_ids: Iterable[int]
+    ) -> Dict[int, bool]:
+        """
+        The user's votes on the given reviews ({review_id: is_helpful}).
+        Answered from the cached vote map, the database is only read once
+        per user to build it.
+        """
+        packed = cls._get_vote_map(user_id)
+        votes = {}
+        for review_id in review_ids:
+            index = bisect_left(packed, review_id << 1)
+            if index < len(packed) and packed[index] >> 1 == review_id:
+                votes[review_id] = bool(packed[index] & 1)
+        return votes
+
+    @classmethod
+    def update_vote_map(
+        cls, user_id: int, review_id: int, is_helpful: Optional[bool]
+    ) -> None:
+        """Apply one vote (None = removed) to the cached map in place."""
+        key = cls.VOTE_MAP_CACHE_KEY.format(user_id=user_id)
+        generation_key = cls.VOTE_MAP_GENERATION_KEY.format(user_id=user_id)
+        lock_key = cls.VOTE_MAP_LOCK_KEY.format(user_id=user_id)
+        # Bumped even without a cached map - a map being loaded right now
+        # may predate this vote and must not be trusted (see _get_vote_map)
+        generation = time.time_ns()
+        if not cache.add(lock_key, 1, 5):
+            # Concurrent update of the same map - rebuild it on the next read
+            cache.set(generation_key, generation, cls.VOTE_MAP_GENERATION_TIMEOUT)
+            return
+
+        try:
+            cached = cache.get_many([key, generation_key])
+            cache.set(generation_key, generation, cls.VOTE_MAP_GENERATION_TIMEOUT)
+            entry = cached.get(key)
+            if entry is None or entry[0] != cached.get(generation_key):
+                return
+
+            packed = array("Q")
+            packed.frombytes(entry[1])
+            index = bisect_left(packed, review_id << 1)
+            exists = index < len(packed) and packed[index] >> 1 == review_id
+            if is_helpful is None:
+                if exists:
+                    del packed[index]
+            else:
+                value = review_id << 1 | int(is_helpful)
+                if exists:
+                    packed[index] = value
+                else:
+                    packed.insert(index, value)
+            cache.set(key, (generation, packed.tobytes()), cls.VOTE_MAP_TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+
+    @classmethod
+    def _get_vote_map(cls, user_id: int) -> array:
+        key = cls.VOTE_MAP_CACHE_KEY.format(user_id=user_id)
+        generation_key = cls.VOTE_MAP_GENERATION_KEY.format(user_id=user_id)
+        cached = cache.get_many([key, generation_key])
+        generation = cached.get(generation_key)
+        entry = cached.get(key)
+        if entry is not None and entry[0] == generation:
+            cache.touch(key, cls.VOTE_MAP_TIMEOUT)
+            cache.touch(generation_key, cls.VOTE_MAP_GENERATION_TIMEOUT)
+            packed = array("Q")
+            packed.frombytes(entry[1])
+            return packed
+
+        packed = cls._query_vote_map(user_id)
+        # Stored with the generation read before the query: a vote applied
+        # meanwhile has bumped it, so the next read reloads instead
+        cache.set(key, (generation, packed.tobytes()), cls.VOTE_MAP_TIMEOUT)
+        return packed
+
+    @staticmethod
+    def _query_vote_map(user_id: int) -> array:
+        packed = array("Q")
+        packed.extend(
+            sorted(
+                review_id << 1 | int(is_helpful)
+                for review_id, is_helpful in ReviewVotes.objects.filter(
+                    user_id=user_id
+                ).values_list("review_id", "is_helpful")
+            )
+        )
+        return packed
+
+    @classmethod
+    def merge_pending_counters(cls, reviews: Iterable[Reviews]) -> None:
+        """Add not yet flushed vote deltas to the counters of loaded reviews."""
+        if not cls.is_buffered():
+            return
+
+        from .buffers import VoteCounterBuffer
+
+        reviews = list(reviews)
+        pending = VoteCounterBuffer.get_pending(review.pk for review in reviews)
+        for review in reviews:
+            helpful_delta, total_delta = pending.get(review.pk, (0, 0))
+            review.helpful_votes += helpful_delta
+            review.total_votes += total_delta
+
+    @staticmethod
+    def _apply_delta(review_id: int, helpful_delta: int, total_delta: int):
+        """
+        Increment the counters in the database and return their new values.
+        Uses a single UPDATE ... RETURNING where the backend supports it,
+        other fields (date_updated included) are left untouched.
+        """
+        if supports_returning():
+            table = connection.ops.quote_name(Reviews._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {table} "
+                    "SET helpful_votes = helpful_votes + %s, "
+                    "total_votes = total_votes + %s "
+                    "WHERE id = %s RETURNING helpful_votes, total_votes",
+                    [helpful_delta, total_delta, review_id],
+                )
+                return cursor.fetchone()
+
+        Reviews.objects.filter(pk=review_id).update(
+            helpful_votes=F("helpful_votes") + helpful_delta,
+            total_votes=F("total_votes") + total_delta,
+        )
+        return Reviews.objects.filter(pk=review_id).values_list(
+            "helpful_votes", "total_votes"
+        )[0]
+
+
 class SearchService:
     """Service class for handling search functionality."""
 
@@ -669,3 +1447,2421 @@ class BreadcrumbService:
             v: k for k, v in ComponentService.COMPONENT_TYPE_MAPPING.items()
         }
         return type_to_category.get(component_type, component_type)
+
+
+class HeurekaService:
+    """Adapter for the Heureka offers API (fake data in development)."""
+
+    FAKE_SHOPS = [
+        "Alza.cz",
+        "CZC.cz",
+        "Mall.cz",
+        "Electroworld.cz",
+        "Datart.cz",
+        "TSBohemia.cz",
+        "Smarty.cz",
+        "GIGACOMPUTER.cz",
+        "Počítače.cz",
+        "Mironet.cz",
+    ]
+
+    AVAILABILITY_OPTIONS = [
+        {"status": "skladem", "text": "Skladem", "delivery_days": 0},
+        {"status": "skladem", "text": "Skladem", "delivery_days": 1},
+        {"status": "dostupny", "text": "Do 2 dnů", "delivery_days": 2},
+        {"status": "dostupny", "text": "Do týdne", "delivery_days": 7},
+    ]
+
+    @classmethod
+    def api_status(cls) -> str:
+        """Return the status label shown next to offer data."""
+        return "fake" if getattr(settings, "USE_FAKE_HEUREKA_API", True) else "live"
+
+    @classmethod
+    def fetch_offers(cls, component: Any) -> List[Dict[str, Any]]:
+        """Fetch current offers for a component, cheapest first."""
+        if not getattr(settings, "USE_FAKE_HEUREKA_API", True):
+            raise RuntimeError("Heureka API is not configured")
+
+        # Simulate API delay
+        if getattr(settings, "FAKE_API_SETTINGS", {}).get("simulate_delays", True):
+            time.sleep(random.uniform(0.1, 0.5))
+
+        return cls.generate_fake_products(component)
+
+    @classmethod
+    def generate_fake_products(cls, component: Any) -> List[Dict[str, Any]]:
+        """Generate fake shop offers around the stored component price."""
+        fake_settings = getattr(settings, "FAKE_API_SETTINGS", {})
+        variation = fake_settings.get("price_variation", 0.3)
+
+        base_price = (
+            float(component.price)
+            if component.price > 0
+            else random.randint(1000, 50000)
+        )
+
+        products = []
+        num_products = random.randint(
+            fake_settings.get("min_products", 3), fake_settings.get("max_products", 8)
+        )
+
+        for i in range(num_products):
+            price = int(base_price * random.uniform(1 - variation, 1 + variation))
+
+            product_names = [
+                component.name,
+                f"{component.name} - BOX",
+                f"{component.name} (OEM)",
+                f"{component.manufacturer} {component.name}",
+                f"{component.name} + doprava zdarma",
+            ]
+
+            shop = random.choice(cls.FAKE_SHOPS)
+            shop_domain = shop.lower().replace(".cz", "")
+            delivery_price = random.choice([0, 99, 149, 199])
+
+            products.append(
+                {
+                    "id": f"fake_{i}_{component.id}",
+                    "name": random.choice(product_names),
+                    "price": price,
+                    "price_formatted": f"{price:,} Kč".replace(",", " "),
+                    "currency": "CZK",
+                    "shop_name": shop,
+                    "shop_url": f"https://www.{shop_domain}.cz",
+                    "product_url": f"https://www.{shop_domain}.cz/product/{component.id}",
+                    "availability": random.choice(cls.AVAILABILITY_OPTIONS),
+                    "shop_rating": round(random.uniform(4.0, 4.9), 1),
+                    "shop_reviews_count": random.randint(500, 15000),
+                    "delivery_price": delivery_price,
+                    "delivery_price_formatted": (
+                        f"{delivery_price} Kč" if delivery_price > 0 else "Zdarma"
+                    ),
+                    "is_marketplace": random.choice([True, False]),
+                    "last_update": timezone.now().strftime("%Y-%m-%d"),
+                }
+            )
+
+        products.sort(key=lambda x: x["price"])
+        return products
+
+
+class OfferCacheService:
+    """Cache of Heureka offers, filled only by the background refresh job."""
+
+    OFFERS_KEY = "heureka:offers:{component_type}:{component_id}"
+    SUMMARY_KEY = "heureka:summary:{component_type}:{component_id}"
+    VIEWS_KEY = "heureka:views:{component_type}:{component_id}"
+    REFRESH_QUEUE_KEY = "heureka:refresh_queue"
+    REFRESH_QUEUE_LIMIT = 10000
+    MAX_SUMMARY_ITEMS = 100
+
+    @classmethod
+    def offers_key(cls, component_type: str, component_id: int) -> str:
+        return cls.OFFERS_KEY.format(
+            component_type=component_type, component_id=component_id
+        )
+
+    @classmethod
+    def summary_key(cls, component_type: str, component_id: int) -> str:
+        return cls.SUMMARY_KEY.format(
+            component_type=component_type, component_id=component_id
+        )
+
+    @classmethod
+    def get_offers(cls, component_type: str, component_id: int) -> Optional[Dict]:
+        """Return the cached offer entry or None on a miss."""
+        return cache.get(cls.offers_key(component_type, component_id))
+
+    @classmethod
+    def get_many_offers(
+        cls, items: Iterable[Tuple[str, int]]
+    ) -> Dict[Tuple[str, int], Dict]:
+        """Return cached offer entries for several components in one cache call."""
+        keys = {cls.offers_key(t, i): (t, i) for t, i in items}
+        found = cache.get_many(list(keys))
+        return {keys[key]: entry for key, entry in found.items()}
+
+    @classmethod
+    def store_offers(
+        cls,
+        component_type: str,
+        component_id: int,
+        products: List[Dict[str, Any]],
+        search_query: str = "",
+    ) -> Dict[str, Any]:
+        """Store freshly fetched offers in the cache."""
+        entry = {
+            "products": products,
+            "search_query": search_query,
+            "api_status": HeurekaService.api_status(),
+            "fetched_at": timezone.now(),
+        }
+        # Listing pages read only the small summary, never the full offer list
+        cache.set_many(
+            {
+                cls.offers_key(component_type, component_id): entry,
+                cls.summary_key(component_type, component_id): cls.build_summary(
+                    products, entry["fetched_at"]
+                ),
+            },
+            getattr(settings, "HEUREKA_OFFER_CACHE_TIMEOUT", 60 * 60 * 24),
+        )
+        return entry
+
+    @staticmethod
+    def build_summary(products: List[Dict[str, Any]], fetched_at) -> Dict[str, Any]:
+        """Lowest offer, shop count and availability of an offer list."""
+        if not products:
+            return {
+                "lowest_price": None,
+                "shop_count": 0,
+                "in_stock": False,
+                "fetched_at": fetched_at.isoformat(),
+            }
+
+        lowest = min(products, key=lambda p: p["price"])
+        return {
+            "lowest_price": lowest["price"],
+            "lowest_price_formatted": lowest["price_formatted"],
+            "shop_name": lowest["shop_name"],
+            "availability": lowest["availability"]["text"],
+            "shop_count": len({p["shop_name"] for p in products}),
+            "in_stock": any(
+                p["availability"]["status"] == "skladem" for p in products
+            ),
+            "fetched_at": fetched_at.isoformat(),
+        }
+
+    @classmethod
+    def get_summaries(
+        cls, items: Iterable[Tuple[str, int]]
+    ) -> Dict[Tuple[str, int], Dict[str, Any]]:
+        """Return cached offer summaries with a single cache multi-get."""
+        keys = {cls.summary_key(t, i): (t, i) for t, i in items}
+        found = cache.get_many(list(keys))
+        return {keys[key]: summary for key, summary in found.items()}
+
+    @staticmethod
+    def build_snapshot(
+        component_type: str, component_id: int, products: List[Dict[str, Any]]
+    ) -> Optional[PriceSnapshot]:
+        """Build an unsaved price snapshot summarising the offers."""
+        prices = [p["price"] for p in products if p.get("price")]
+        if not prices:
+            return None
+
+        return PriceSnapshot(
+            component_type=component_type,
+            component_id=component_id,
+            min_price=min(prices),
+            avg_price=round(sum(prices) / len(prices)),
+            max_price=max(prices),
+            shop_count=len({p.get("shop_name") for p in products}),
+        )
+
+    @classmethod
+    def request_refresh(cls, items: Iterable[Tuple[str, int]]) -> None:
+        """
+        Queue components for the next refresh run.
+        The queue is best effort - the job walks the whole catalog anyway.
+        """
+        new_items = {f"{t}:{i}" for t, i in items}
+        if not new_items:
+            return
+
+        queued = cache.get(cls.REFRESH_QUEUE_KEY) or set()
+        if new_items <= queued or len(queued) >= cls.REFRESH_QUEUE_LIMIT:
+            return
+
+        cache.set(cls.REFRESH_QUEUE_KEY, queued | new_items, None)
+
+    @classmethod
+    def pop_refresh_requests(cls) -> List[Tuple[str, int]]:
+        """Take all queued refresh requests."""
+        queued = cache.get(cls.REFRESH_QUEUE_KEY) or set()
+        cache.delete(cls.REFRESH_QUEUE_KEY)
+
+        items = []
+        for item in sorted(queued):
+            component_type, _, component_id = item.rpartition(":")
+            if component_id.isdigit():
+                items.append((component_type, int(component_id)))
+        return items
+
+    @classmethod
+    def record_page_view(cls, component_type: str, component_id: int) -> None:
+        """Count a detail page view for refresh prioritisation."""
+        key = cls.VIEWS_KEY.format(
+            component_type=component_type, component_id=component_id
+        )
+        window = OfferRefreshScheduler.get_config()["activity_window_days"]
+        cache.add(key, 0, window * 24 * 60 * 60)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Key expired between add() and incr()
+            pass
+
+    @classmethod
+    def get_page_views(
+        cls, component_type: str, component_ids: Iterable[int]
+    ) -> Dict[int, int]:
+        """Return recent page views for components of one type."""
+        keys = {
+            cls.VIEWS_KEY.format(component_type=component_type, component_id=pk): pk
+            for pk in component_ids
+        }
+        return {keys[key]: count for key, count in cache.get_many(list(keys)).items()}
+
+
+class _OfferFetchThrottle:
+    """Thread-safe throttle spacing API calls to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class OfferRefreshScheduler:
+    """Refreshes cached offers for the whole catalog outside the request path."""
+
+    DEFAULT_CONFIG = {
+        "batch_size": 100,
+        "concurrency": 4,
+        "rate_limit": 5,
+        "stale_after": 60 * 60,
+        "activity_window_days": 7,
+    }
+
+    PRIORITY_WEIGHTS = {
+        "page_views": 1,
+        "clicks": 5,
+        "watchers": 10,
+    }
+
+    def __init__(
+        self,
+        batch_size: int = None,
+        concurrency: int = None,
+        rate_limit: float = None,
+        stale_after: int = None,
+        progress_callback: Callable[[Dict[str, Any]], None] = None,
+    ):
+        config = self.get_config()
+        self.batch_size = batch_size or config["batch_size"]
+        self.concurrency = concurrency or config["concurrency"]
+        self.rate_limit = config["rate_limit"] if rate_limit is None else rate_limit
+        self.stale_after = config["stale_after"] if stale_after is None else stale_after
+        self.activity_window = timedelta(days=config["activity_window_days"])
+        self.progress_callback = progress_callback
+        self._throttle = _OfferFetchThrottle(self.rate_limit)
+        self._forced = set()
+        self.metrics = {}
+
+    @classmethod
+    def get_config(cls) -> Dict[str, Any]:
+        return {
+            **cls.DEFAULT_CONFIG,
+            **getattr(settings, "HEUREKA_REFRESH_SETTINGS", {}),
+        }
+
+    def prioritized_components(self) -> List[Tuple[str, int]]:
+        """
+        Return (component_type, id) pairs for the whole catalog, most wanted first.
+        Explicitly queued components always go first.
+        """
+        since = timezone.now() - self.activity_window
+
+        clicks = {
+            (row["component_type"], row["component_id"]): row["count"]
+            for row in HeurekaClick.objects.filter(timestamp__gte=since)
+            .values("component_type", "component_id")
+            .annotate(count=Count("id"))
+        }
+
+        scored = []
+        for component_type, model in ComponentService.get_type_models().items():
+            watchers = dict(
+                UserFavorites.objects.filter(
+                    component_type=component_type, watch_price_changes=True
+                )
+                .values_list(UserFavorites.component_field(component_type))
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+
+            last_pk = 0
+            while True:
+                ids = list(
+                    model.objects.filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .values_list("pk", flat=True)[: self.batch_size]
+                )
+                if not ids:
+                    break
+                last_pk = ids[-1]
+
+                views = OfferCacheService.get_page_views(component_type, ids)
+                for pk in ids:
+                    score = (
+                        views.get(pk, 0) * self.PRIORITY_WEIGHTS["page_views"]
+                        + clicks.get((component_type, pk), 0)
+                        * self.PRIORITY_WEIGHTS["clicks"]
+                        + watchers.get(pk, 0) * self.PRIORITY_WEIGHTS["watchers"]
+                    )
+                    scored.append((score, component_type, pk))
+
+        scored.sort(key=lambda item: -item[0])
+
+        queued = OfferCacheService.pop_refresh_requests()
+        self._forced = set(queued)
+        ordered = list(queued)
+        ordered.extend(
+            (component_type, pk)
+            for _, component_type, pk in scored
+            if (component_type, pk) not in self._forced
+        )
+        return ordered
+
+    def run_once(self) -> Dict[str, Any]:
+        """Refresh offers for the whole catalog once and return metrics."""
+        started = time.monotonic()
+        components = self.prioritized_components()
+
+        self.metrics = {
+            "total": len(components),
+            "processed": 0,
+            "refreshed": 0,
+            "skipped": 0,
+            "errors": 0,
+            "snapshots": 0,
+            "elapsed": 0.0,
+            "throughput": 0.0,
+        }
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for offset in range(0, len(components), self.batch_size):
+                self._process_batch(
+                    executor, components[offset : offset + self.batch_size]
+                )
+
+                elapsed = time.monotonic() - started
+                self.metrics["elapsed"] = elapsed
+                self.metrics["throughput"] = (
+                    self.metrics["processed"] / elapsed if elapsed else 0.0
+                )
+                if self.progress_callback:
+                    self.progress_callback(dict(self.metrics))
+
+        self.metrics["elapsed"] = time.monotonic() - started
+        return self.metrics
+
+    def _process_batch(
+        self, executor: ThreadPoolExecutor, batch: List[Tuple[str, int]]
+    ) -> None:
+        cached = OfferCacheService.get_many_offers(batch)
+        fresh_since = timezone.now() - timedelta(seconds=self.stale_after)
+
+        to_fetch = []
+        for item in batch:
+            entry = cached.get(item)
+            if (
+                item not in self._forced
+                and entry
+                and entry["fetched_at"] >= fresh_since
+            ):
+                self.metrics["skipped"] += 1
+            else:
+                to_fetch.append(item)
+
+        components = self._load_components(to_fetch)
+
+        futures = {
+            executor.submit(self._fetch, component): item
+            for item, component in components.items()
+        }
+        # Components deleted since prioritisation
+        self.metrics["skipped"] += len(to_fetch) - len(components)
+
+        snapshots = []
+        for future in as_completed(futures):
+            component_type, component_id = futures[future]
+            component = components[(component_type, component_id)]
+            try:
+                products = future.result()
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.warning(
+                    "Offer refresh failed for %s #%s: %s",
+                    component_type,
+                    component_id,
+                    e,
+                )
+                continue
+
+            OfferCacheService.store_offers(
+                component_type,
+                component_id,
+                products,
+                search_query=f"{component.manufacturer} {component.name}",
+            )
+            snapshot = OfferCacheService.build_snapshot(
+                component_type, component_id, products
+            )
+            if snapshot:
+                snapshots.append(snapshot)
+            self.metrics["refreshed"] += 1
+
+        if snapshots:
+            PriceSnapshot.objects.bulk_create(snapshots)
+            self.metrics["snapshots"] += len(snapshots)
+
+        self.metrics["processed"] += len(batch)
+
+    @staticmethod
+    def _load_components(
+        items: List[Tuple[str, int]],
+    ) -> Dict[Tuple[str, int], Any]:
+        """Load components with one query per component type."""
+        ids_by_type = {}
+        for component_type, component_id in items:
+            ids_by_type.setdefault(component_type, []).append(component_id)
+
+        models = ComponentService.get_type_models()
+        loaded = {}
+        for component_type, ids in ids_by_type.items():
+            model = models.get(component_type)
+            if not model:
+                continue
+            objects = model.objects.only("id", "name", "manufacturer", "price")
+            for pk, component in objects.in_bulk(ids).items():
+                loaded[(component_type, pk)] = component
+        return loaded
+
+    def _fetch(self, component: Any) -> List[Dict[str, Any]]:
+        self._throttle.wait()
+        return HeurekaService.fetch_offers(component)
+
+
+class ClickAnalyticsService:
+    """Hourly rollups of Heureka clicks and retention of raw clicks."""
+
+    CHECKPOINT_NAME = "heureka_clicks"
+
+    # Raw clicks are written in batches, so fresh ids may still be
+    # committing out of order - see settled_max_id.
+    SETTLE_DELAY = timedelta(minutes=1)
+
+    @classmethod
+    def rollup(cls, batch_size: int = 10000) -> Dict[str, int]:
+        """Fold raw clicks newer than the checkpoint into the rollup tables."""
+        checkpoint, _ = RollupCheckpoint.objects.get_or_create(
+            name=cls.CHECKPOINT_NAME
+        )
+        upper_id = settled_max_id(
+            cls.CHECKPOINT_NAME, HeurekaClick.objects.all(), cls.SETTLE_DELAY
+        )
+
+        stats = {"clicks": 0, "batches": 0}
+        last_id = checkpoint.last_id
+
+        while last_id < upper_id:
+            batch_upper = min(last_id + batch_size, upper_id)
+            with transaction.atomic():
+                # Lock the checkpoint so parallel runs cannot count twice
+                checkpoint = RollupCheckpoint.objects.select_for_update().get(
+                    pk=checkpoint.pk
+                )
+                if checkpoint.last_id != last_id:
+                    break
+
+                clicks = HeurekaClick.objects.filter(
+                    id__gt=last_id, id__lte=batch_upper
+                )
+                stats["clicks"] += cls._rollup_components(clicks)
+                cls._rollup_queries(clicks)
+
+                checkpoint.last_id = batch_upper
+                checkpoint.save(update_fields=["last_id", "date_updated"])
+
+            last_id = batch_upper
+            stats["batches"] += 1
+
+        return stats
+
+    @staticmethod
+    def _rollup_components(clicks: QuerySet) -> int:
+        rows = (
+            clicks.annotate(
+                hour=TruncHour("timestamp"),
+                user_type=Case(
+                    When(user__isnull=True, then=Value("anonymous")),
+                    default=Value("registered"),
+                ),
+            )
+            .values("hour", "component_type", "component_id", "user_type")
+            .annotate(clicks=Count("id"), component_name=Max("component_name"))
+        )
+        rows = list(rows)
+        if not rows:
+            return 0
+
+        existing = {
+            (r.hour, r.component_type, r.component_id, r.user_type): r
+            for r in HeurekaClickHourly.objects.filter(
+                hour__gte=min(row["hour"] for row in rows),
+                hour__lte=max(row["hour"] for row in rows),
+            )
+        }
+
+        to_create, to_update = [], []
+        for row in rows:
+            key = (
+                row["hour"],
+                row["component_type"],
+                row["component_id"],
+                row["user_type"],
+            )
+            rollup = existing.get(key)
+            if rollup:
+                rollup.clicks += row["clicks"]
+                rollup.component_name = row["component_name"]
+                to_update.append(rollup)
+            else:
+                to_create.append(HeurekaClickHourly(**row))
+
+        HeurekaClickHourly.objects.bulk_update(
+            to_update, ["clicks", "component_name"], batch_size=500
+        )
+        HeurekaClickHourly.objects.bulk_create(to_create, batch_size=500)
+        return sum(row["clicks"] for row in rows)
+
+    @staticmethod
+    def _rollup_queries(clicks: QuerySet) -> None:
+        rows = list(
+            clicks.annotate(hour=TruncHour("timestamp"))
+            .values("hour", "search_query")
+            .annotate(clicks=Count("id"))
+        )
+        if not rows:
+            return
+
+        existing = {
+            (r.hour, r.search_query): r
+            for r in HeurekaQueryHourly.objects.filter(
+                hour__gte=min(row["hour"] for row in rows),
+                hour__lte=max(row["hour"] for row in rows),
+                search_query__in={row["search_query"] for row in rows},
+            )
+        }
+
+        to_create, to_update = [], []
+        for row in rows:
+            rollup = existing.get((row["hour"], row["search_query"]))
+            if rollup:
+                rollup.clicks += row["clicks"]
+                to_update.append(rollup)
+            else:
+                to_create.append(HeurekaQueryHourly(**row))
+
+        HeurekaQueryHourly.objects.bulk_update(to_update, ["clicks"], batch_size=500)
+        HeurekaQueryHourly.objects.bulk_create(to_create, batch_size=500)
+
+    @classmethod
+    def prune_raw_clicks(
+        cls,
+        days: int = None,
+        batch_size: int = 5000,
+        archive: Optional[Any] = None,
+    ) -> int:
+        """
+        Delete raw clicks older than `days` in batches.
+        Only clicks already folded into the rollups are removed; with
+        `archive` (a text file object) they are written out as JSON lines first.
+        """
+        if days is None:
+            days = getattr(settings, "HEUREKA_CLICK_RETENTION_DAYS", 90)
+
+        checkpoint = RollupCheckpoint.objects.filter(name=cls.CHECKPOINT_NAME).first()
+        if not checkpoint:
+            return 0
+
+        old_clicks = HeurekaClick.objects.filter(
+            timestamp__lt=timezone.now() - timedelta(days=days),
+            id__lte=checkpoint.last_id,
+        ).order_by("id")
+
+        deleted = 0
+        while True:
+            batch = list(
+                old_clicks.values(
+                    "id",
+                    "component_type",
+                    "component_id",
+                    "component_name",
+                    "search_query",
+                    "user_id",
+                    "session_key",
+                    "timestamp",
+                )[:batch_size]
+            )
+            if not batch:
+                return deleted
+
+            if archive is not None:
+                for row in batch:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+
+            HeurekaClick.objects.filter(id__in=[row["id"] for row in batch]).delete()
+            deleted += len(batch)
+
+    @staticmethod
+    def get_dashboard(days: int = 30, limit: int = 10) -> Dict[str, Any]:
+        """Dashboard data read only from the rollup tables."""
+        since = timezone.now() - timedelta(days=days)
+        hourly = HeurekaClickHourly.objects.filter(hour__gte=since)
+
+        totals = hourly.aggregate(
+            total=Sum("clicks"),
+            registered=Sum("clicks", filter=Q(user_type="registered")),
+        )
+        total = totals["total"] or 0
+        registered = totals["registered"] or 0
+
+        top_components = list(
+            hourly.values("component_type", "component_id")
+            .annotate(total=Sum("clicks"), component_name=Max("component_name"))
+            .order_by("-total")[:limit]
+        )
+        for row in top_components:
+            row["type_display"] = ComponentService.TYPE_DISPLAY_NAMES.get(
+                row["component_type"], row["component_type"]
+            )
+
+        daily_trend = list(
+            hourly.annotate(day=TruncDate("hour"))
+            .values("day")
+            .annotate(
+                total=Sum("clicks"),
+                registered=Sum("clicks", filter=Q(user_type="registered")),
+            )
+            .order_by("day")
+        )
+        max_daily = max((row["total"] for row in daily_trend), default=0)
+        for row in daily_trend:
+            row["registered"] = row["registered"] or 0
+            row["anonymous"] = row["total"] - row["registered"]
+            row["percent"] = round(row["total"] / max_daily * 100) if max_daily else 0
+
+        by_type = list(
+            hourly.values("component_type")
+            .annotate(total=Sum("clicks"))
+            .order_by("-total")
+        )
+        for row in by_type:
+            row["type_display"] = ComponentService.TYPE_DISPLAY_NAMES.get(
+                row["component_type"], row["component_type"]
+            )
+
+        top_queries = list(
+            HeurekaQueryHourly.objects.filter(hour__gte=since)
+            .values("search_query")
+            .annotate(total=Sum("clicks"))
+            .order_by("-total")[:limit]
+        )
+
+        return {
+            "days": days,
+            "total_clicks": total,
+            "registered_clicks": registered,
+            "anonymous_clicks": total - registered,
+            "top_components": top_components,
+            "daily_trend": daily_trend,
+            "by_type": by_type,
+            "top_queries": top_queries,
+        }
+
+
+class PriceChangeService:
+    """
+    Detects price changes and notifies users watching the component.
+    New prices come from price snapshots (refresh_offers) and from catalog
+    price edits; both are compared against the last price watchers saw.
+    """
+
+    CHECKPOINT_NAME = "price_snapshots"
+
+    DEFAULT_CONFIG = {
+        "threshold_percent": 3,
+        "threshold_amount": 100,
+        "chunk_size": 1000,
+    }
+
+    @classmethod
+    def get_config(cls) -> Dict[str, Any]:
+        return {**cls.DEFAULT_CONFIG, **getattr(settings, "PRICE_CHANGE_SETTINGS", {})}
+
+    @classmethod
+    def detect(cls, chunk_size: Optional[int] = None) -> Dict[str, int]:
+        """Compare new prices with the last known ones and fan out activities."""
+        config = cls.get_config()
+        chunk_size = chunk_size or config["chunk_size"]
+        stats = {"checked": 0, "changes": 0, "suppressed": 0, "activities": 0}
+
+        with transaction.atomic():
+            # Lock the checkpoint so parallel runs cannot notify twice
+            checkpoint, _ = RollupCheckpoint.objects.select_for_update().get_or_create(
+                name=cls.CHECKPOINT_NAME
+            )
+            observed, upper_id = cls._snapshot_prices(checkpoint.last_id)
+            catalog = cls._catalog_prices()
+            keys = set(observed) | set(catalog)
+            states = cls._load_states(keys)
+
+            changes = {}
+            to_create, to_update = [], []
+            for key in keys:
+                stats["checked"] += 1
+                state = states.get(key)
+                catalog_price = catalog.get(key)
+                new_price = observed.get(key)
+
+                if state is None:
+                    # First time we see the component - just remember the price
+                    baseline = new_price if new_price is not None else catalog_price
+                    if baseline is not None:
+                        to_create.append(
+                            ComponentPriceState(
+                                component_type=key[0],
+                                component_id=key[1],
+                                last_price=baseline,
+                                catalog_price=catalog_price,
+                            )
+                        )
+                    continue
+
+                dirty = False
+                if catalog_price is not None and catalog_price != state.catalog_price:
+                    # Price edited in the admin since the last run
+                    if new_price is None:
+                        new_price = catalog_price
+                    state.catalog_price = catalog_price
+                    dirty = True
+
+                if new_price is not None and new_price != state.last_price:
+                    if cls._is_significant(state, new_price, config):
+                        changes.setdefault(key[0], {})[key[1]] = (
+                            state.last_price,
+                            new_price,
+                        )
+                        state.last_price = new_price
+                        dirty = True
+                        stats["changes"] += 1
+                    else:
+                        # Small changes accumulate until they cross the threshold
+                        stats["suppressed"] += 1
+
+                if dirty:
+                    to_update.append(state)
+
+            ComponentPriceState.objects.bulk_create(to_create, batch_size=500)
+            ComponentPriceState.objects.bulk_update(
+                to_update, ["last_price", "catalog_price"], batch_size=500
+            )
+
+            for component_type, prices in changes.items():
+                stats["activities"] += cls._notify_watchers(
+                    component_type, prices, chunk_size
+                )
+
+            if upper_id > checkpoint.last_id:
+                checkpoint.last_id = upper_id
+                checkpoint.save(update_fields=["last_id", "date_updated"])
+
+        return stats
+
+    @staticmethod
+    def _snapshot_prices(last_id: int) -> Tuple[Dict[Tuple[str, int], Any], int]:
+        """Latest minimum price per component from snapshots after the checkpoint."""
+        prices = {}
+        upper_id = last_id
+        snapshots = (
+            PriceSnapshot.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "component_type", "component_id", "min_price")
+        )
+        for pk, component_type, component_id, min_price in snapshots.iterator():
+            prices[(component_type, component_id)] = min_price
+            upper_id = pk
+        return prices, upper_id
+
+    @staticmethod
+    def _catalog_prices() -> Dict[Tuple[str, int], Any]:
+        prices = {}
+        for component_type, model in ComponentService.get_type_models().items():
+            for pk, price in model.objects.filter(price__gt=0).values_list(
+                "pk", "price"
+            ):
+                prices[(component_type, pk)] = price
+        return prices
+
+    @staticmethod
+    def _load_states(
+        keys: Iterable[Tuple[str, int]],
+    ) -> Dict[Tuple[str, int], ComponentPriceState]:
+        ids_by_type = {}
+        for component_type, component_id in keys:
+            ids_by_type.setdefault(component_type, []).append(component_id)
+
+        states = {}
+        for component_type, ids in ids_by_type.items():
+            for start in range(0, len(ids), 500):
+                for state in ComponentPriceState.objects.filter(
+                    component_type=component_type,
+                    component_id__in=ids[start : start + 500],
+                ):
+                    states[(state.component_type, state.component_id)] = state
+        return states
+
+    @staticmethod
+    def _is_significant(state: ComponentPriceState, new_price, config) -> bool:
+        old_price = state.last_price
+        if not old_price:
+            return True
+
+        percent = (
+            state.threshold_percent
+            if state.threshold_percent is not None
+            else config["threshold_percent"]
+        )
+        amount = (
+            state.threshold_amount
+            if state.threshold_amount is not None
+            else config["threshold_amount"]
+        )
+        diff = abs(new_price - old_price)
+        return diff >= amount and diff * 100 / old_price >= percent
+
+    @staticmethod
+    def _format_price(value) -> str:
+        return f"{int(value):,} Kč".replace(",", " ")
+
+    @classmethod
+    def _notify_watchers(
+        cls, component_type: str, prices: Dict[int, Tuple[Any, Any]], chunk_size: int
+    ) -> int:
+        """Create price_change activities for all watchers, in chunks."""
+        created = 0
+        buffer = []
+        users = []
+        component_ids = list(prices)
+        model = ComponentService.get_type_models()[component_type]
+        field = UserFavorites.component_field(component_type)
+
+        for start in range(0, len(component_ids), 500):
+            chunk = component_ids[start : start + 500]
+            names = dict(model.objects.filter(pk__in=chunk).values_list("pk", "name"))
+            # One query per component type (and id chunk) for all watchers
+            favorites = (
+                UserFavorites.objects.filter(
+                    component_type=component_type,
+                    watch_price_changes=True,
+                    **{f"{field}__in": chunk},
+                )
+                .values_list("id", field, "user_id")
+                .iterator(chunk_size=chunk_size)
+            )
+
+            messages = {}
+            for favorite_id, component_id, user_id in favorites:
+                users.append(user_id)
+                if component_id not in messages:
+                    messages[component_id] = cls._build_message(
+                        names[component_id], *prices[component_id]
+                    )
+                buffer.append(
+                    FavoriteActivity(
+                        favorite_id=favorite_id,
+                        activity_type="price_change",
+                        **messages[component_id],
+                    )
+                )
+                if len(buffer) >= chunk_size:
+                    FavoriteActivity.objects.bulk_create(buffer)
+                    created += len(buffer)
+                    buffer = []
+
+        if buffer:
+            FavoriteActivity.objects.bulk_create(buffer)
+            created += len(buffer)
+        FavoriteActivityService.increment_unread(users)
+        return created
+
+    @classmethod
+    def _build_message(cls, name: str, old_price, new_price) -> Dict[str, str]:
+        change = (new_price - old_price) * 100 / old_price if old_price else 0
+        direction = "klesla" if new_price < old_price else "vzrostla"
+        title = f"{name}: cena {direction} na {cls._format_price(new_price)}"
+        return {
+            "title": title[:200],
+            "description": (
+                f"Cena se změnila z {cls._format_price(old_price)} na "
+                f"{cls._format_price(new_price)} ({change:+.1f} %)."
+            ),
+            "old_value": cls._format_price(old_price),
+            "new_value": cls._format_price(new_price),
+        }
+
+
+class FavoriteService:
+    """
+    Idempotent set / unset of a favorite component.
+
+    Each call is one INSERT ... ON CONFLICT DO NOTHING or DELETE ...
+    RETURNING guarded by the unique constraints of UserFavorites, instead
+    of check-then-write - repeated or parallel requests cannot create
+    duplicates or fail with IntegrityError. The component is not loaded,
+    a missing one is rejected by the foreign key (IntegrityError).
+    Counters normally kept by the UserFavorites signals are updated here,
+    the raw statements do not send them.
+    """
+
+    @classmethod
+    def set_favorite(
+        cls, user_id: int, component_type: str, component_id: int
+    ) -> bool:
+        """
+        Add the component to favorites. False when it already was one,
+        DoesNotExist of the component model when there is no such component.
+        """
+        model = ComponentService.get_type_models().get(component_type)
+        if model is None:
+            raise ValueError(f"Invalid component type: {component_type}")
+
+        favorite = UserFavorites(
+            user_id=user_id,
+            component_type=component_type,
+            **{f"{component_type}_id": component_id},
+        )
+        favorite.sync_component_ref()
+
+        # No savepoint - nothing is caught here, an error rolls back the caller
+        with transaction.atomic(savepoint=False):
+            if supports_returning():
+                created = cls._insert_ignoring_conflict(favorite, model)
+                # Nothing inserted - an existing favorite or a missing component
+                exists = created or model.objects.filter(pk=component_id).exists()
+            else:
+                exists = model.objects.filter(pk=component_id).exists()
+                created = False
+                if exists:
+                    try:
+                        with transaction.atomic():
+                            UserFavorites.objects.bulk_create([favorite])
+                        created = True
+                    except IntegrityError:
+                        pass
+
+            if created:
+                ComponentService.adjust_favorites_count(component_type, component_id, 1)
+        # Raised outside the block, which would mark the caller's transaction broken
+        if not exists:
+            raise model.DoesNotExist
+        return created
+
+    @classmethod
+    def unset_favorite(
+        cls, user_id: int, component_type: str, component_id: int
+    ) -> bool:
+        """Remove the component from favorites. False when it was not one."""
+        if component_type not in ComponentService.get_type_models():
+            raise ValueError(f"Invalid component type: {component_type}")
+
+        if not supports_returning():
+            # Signals of the ORM delete update the counters
+            deleted, _ = UserFavorites.objects.filter(
+                user_id=user_id,
+                **UserFavorites.component_filter(component_type, component_id),
+            ).delete()
+            return bool(deleted)
+
+        ops = connection.ops
+        column = UserFavorites._meta.get_field(
+            UserFavorites.component_field(component_type)
+        ).column
+        with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {ops.quote_name(UserFavorites._meta.db_table)} "
+                f"WHERE user_id = %s AND component_type = %s "
+                f"AND {ops.quote_name(column)} = %s RETURNING id",
+                [user_id, component_type, component_id],
+            )
+            favorite_ids = [row[0] for row in cursor.fetchall()]
+            if not favorite_ids:
+                return False
+
+            # ON DELETE CASCADE is emulated by Django, remove the activities too
+            placeholders = ", ".join(["%s"] * len(favorite_ids))
+            cursor.execute(
+                f"DELETE FROM {ops.quote_name(FavoriteActivity._meta.db_table)} "
+                f"WHERE favorite_id IN ({placeholders}) RETURNING is_read",
+                favorite_ids,
+            )
+            unread = sum(1 for (is_read,) in cursor.fetchall() if not is_read)
+
+            FavoriteActivityService.decrement_unread(user_id, unread)
+            ComponentService.adjust_favorites_count(
+                component_type, component_id, -len(favorite_ids)
+            )
+        return True
+
+    @staticmethod
+    def _insert_ignoring_conflict(favorite: UserFavorites, model) -> bool:
+        """
+        INSERT ... SELECT guarded by the component's existence, so a missing
+        component inserts nothing instead of failing the deferred FK at commit.
+        """
+        fields = [
+            field
+            for field in UserFavorites._meta.concrete_fields
+            if not field.primary_key
+        ]
+        params = [
+            field.get_db_prep_save(field.pre_save(favorite, True), connection)
+            for field in fields
+        ]
+        ops = connection.ops
+        columns = ", ".join(ops.quote_name(field.column) for field in fields)
+        placeholders = ", ".join(["%s"] * len(fields))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {ops.quote_name(UserFavorites._meta.db_table)} "
+                f"({columns}) SELECT {placeholders} WHERE EXISTS ("
+                f"SELECT 1 FROM {ops.quote_name(model._meta.db_table)} "
+                f"WHERE {ops.quote_name(model._meta.pk.column)} = %s) "
+                "ON CONFLICT DO NOTHING RETURNING id",
+                params + [favorite.component_pk],
+            )
+            return cursor.fetchone() is not None
+
+
+class FavoriteActivityService:
+    """
+    New-review activities for users watching a component.
+
+    Publishing a review only queues it (fan_out_later). ReviewFanoutQueue
+    then writes one FavoriteActivity per watcher in a background thread
+    (fan-out on write, chunked bulk_create). Components with more than
+    REVIEW_FANOUT["popular_threshold"] watchers are skipped there - their
+    new reviews are merged into the activity list when a watcher reads it
+    (fan-out on read), so a publish never writes 100k rows.
+    """
+
+    DEFAULT_CONFIG = {
+        "popular_threshold": 5000,
+        "chunk_size": 1000,
+        "read_window_days": 30,
+    }
+
+    POPULAR_CACHE_KEY = "activities:popular:{type}:{id}"
+    POPULAR_CACHE_TIMEOUT = 60 * 10
+
+    # Unread counter of the navigation badge - UnreadActivityCounter in the cache
+    UNREAD_CACHE_KEY = "activities:unread:{user_id}"
+    UNREAD_CACHE_TIMEOUT = 60 * 60
+
+    @classmethod
+    def get_config(cls) -> Dict[str, Any]:
+        return {**cls.DEFAULT_CONFIG, **getattr(settings, "REVIEW_FANOUT", {})}
+
+    @staticmethod
+    def fan_out_later(review_id: int) -> None:
+        """Queue the fan-out of a published review once the transaction commits."""
+        from .buffers import get_review_fanout_queue
+
+        transaction.on_commit(lambda: get_review_fanout_queue().add(review_id))
+
+    @classmethod
+    def fan_out(cls, review_id: int) -> int:
+        """Create new_review activities for all watchers, return their number."""
+        config = cls.get_config()
+        with transaction.atomic():
+            # The queue and fan_out_reviews may process the same review at
+            # once - the row lock makes the second one see the activities
+            review = (
+                Reviews.objects.select_for_update()
+                .filter(pk=review_id, is_published=True)
+                .first()
+            )
+            return cls._fan_out(review, config)
+
+    @classmethod
+    def _fan_out(cls, review: Optional[Reviews], config: Dict[str, Any]) -> int:
+        if review is None or review.component_pk is None:
+            return 0
+        if FavoriteActivity.objects.filter(
+            related_review=review, activity_type="new_review"
+        ).exists():
+            # Already fanned out (re-published or re-run)
+            return 0
+
+        # One indexed query, cut off right above the threshold
+        watchers = list(
+            UserFavorites.objects.filter(
+                **UserFavorites.component_filter(
+                    review.component_type, review.component_pk
+                ),
+                watch_reviews=True,
+            ).values_list("id", "user_id")[: config["popular_threshold"] + 1]
+        )
+        if len(watchers) > config["popular_threshold"]:
+            cache.set(
+                cls.POPULAR_CACHE_KEY.format(
+                    type=review.component_type, id=review.component_pk
+                ),
+                True,
+                cls.POPULAR_CACHE_TIMEOUT,
+            )
+            return 0
+
+        message = cls._build_message(review, review.component_name)
+        activities = [
+            FavoriteActivity(
+                favorite_id=favorite_id,
+                activity_type="new_review",
+                related_review=review,
+                **message,
+            )
+            for favorite_id, user_id in watchers
+            if user_id != review.author_id
+        ]
+        # Activities and their counter increments commit together (see recount_unread)
+        FavoriteActivity.objects.bulk_create(activities, batch_size=config["chunk_size"])
+        cls.increment_unread(
+            user_id for _, user_id in watchers if user_id != review.author_id
+        )
+        return len(activities)
+
+    @classmethod
+    def get_unread_count(cls, user_id: int) -> int:
+        """
+        Number of unread activities. Served from the cache - the database
+        is read only on a miss (and the counter row seeded on first use).
+        """
+        key = cls.UNREAD_CACHE_KEY.format(user_id=user_id)
+        count = cache.get(key)
+        if count is not None:
+            return count
+
+        count = cls._stored_unread(user_id)
+        if count is None:
+            count = cls.recount_unread([user_id])[user_id]
+        cache.set(key, count, cls.UNREAD_CACHE_TIMEOUT)
+        # A writer committing since the read found no entry to adjust -
+        # drop the stored value if the column moved meanwhile
+        if cls._stored_unread(user_id) != count:
+            cache.delete(key)
+        return count
+
+    @staticmethod
+    def _stored_unread(user_id: int) -> Optional[int]:
+        return (
+            UnreadActivityCounter.objects.filter(user_id=user_id)
+            .values_list("unread_count", flat=True)
+            .first()
+        )
+
+    @classmethod
+    def recount_unread(cls, user_ids: Iterable[int]) -> Dict[int, int]:
+        """
+        Recompute the users' counters from their unread activities.
+
+        The counter row is created (and committed) first and locked while
+        counting. Writers add activities and increment the row in one
+        transaction, so every increment either committed before the count
+        (and is included in it) or waits for the lock and lands on top.
+        """
+        counts = {}
+        for user_id in user_ids:
+            UnreadActivityCounter.objects.get_or_create(user_id=user_id)
+            with transaction.atomic():
+                counter = UnreadActivityCounter.objects.select_for_update().get(
+                    user_id=user_id
+                )
+                counter.unread_count = FavoriteActivity.objects.filter(
+                    favorite__user_id=user_id, is_read=False
+                ).count()
+                counter.save(update_fields=["unread_count"])
+            # The next read loads the fresh column
+            cache.delete(cls.UNREAD_CACHE_KEY.format(user_id=user_id))
+            counts[user_id] = counter.unread_count
+        return counts
+
+    @classmethod
+    def increment_unread(cls, user_ids: Iterable[int]) -> None:
+        """Add one unread activity per occurrence of the user id."""
+        by_amount = {}
+        for user_id, amount in Counter(user_ids).items():
+            by_amount.setdefault(amount, []).append(user_id)
+
+        for amount, users in by_amount.items():
+            for start in range(0, len(users), 500):
+                # Users without a row are seeded from their activities on first read
+                UnreadActivityCounter.objects.filter(
+                    user_id__in=users[start : start + 500]
+                ).update(unread_count=F("unread_count") + amount)
+            cls._adjust_cached_later(users, amount)
+
+    @classmethod
+    def decrement_unread(cls, user_id: int, amount: int) -> None:
+        cls.decrement_unread_many({user_id: amount})
+
+    @classmethod
+    def decrement_unread_many(cls, amounts: Dict[int, int]) -> None:
+        """Subtract unread activities, amounts keyed by user id."""
+        by_amount = {}
+        for user_id, amount in amounts.items():
+            if amount > 0:
+                by_amount.setdefault(amount, []).append(user_id)
+
+        for amount, users in by_amount.items():
+            for start in range(0, len(users), 500):
+                UnreadActivityCounter.objects.filter(
+                    user_id__in=users[start : start + 500]
+                ).update(unread_count=Greatest(F("unread_count") - amount, 0))
+            cls._adjust_cached_later(users, -amount)
+
+    @classmethod
+    def _adjust_cached_later(cls, user_ids: List[int], delta: int) -> None:
+        """
+        Apply the delta to the cached counts once the counter rows commit,
+        so a reader loading the column meanwhile is caught by its re-check.
+        """
+
+        def adjust():
+            for user_id in user_ids:
+                key = cls.UNREAD_CACHE_KEY.format(user_id=user_id)
+                try:
+                    if cache.incr(key, delta) < 0:
+                        cache.set(key, 0, cls.UNREAD_CACHE_TIMEOUT)
+                except ValueError:
+                    # Not cached - next read loads the column
+                    pass
+
+        transaction.on_commit(adjust)
+
+    @classmethod
+    def forget_review_activities(cls, review_id: int) -> None:
+        """Discount unread activities about a review that is being deleted."""
+        unread = (
+            FavoriteActivity.objects.filter(related_review_id=review_id, is_read=False)
+            .order_by()
+            .values_list("favorite__user_id")
+            .annotate(count=Count("id"))
+        )
+        cls.decrement_unread_many(dict(unread))
+
+    @classmethod
+    def mark_read(
+        cls, user_id: int, activity_ids: Optional[Iterable[int]] = None
+    ) -> int:
+        """Mark the user's activities (all or the given ones) as read."""
+        activities = FavoriteActivity.objects.filter(
+            favorite__user_id=user_id, is_read=False
+        )
+        if activity_ids is not None:
+            activities = activities.filter(id__in=list(activity_ids))
+        else:
+            # Activities built on read have no row - remember what was seen
+            UserFavorites.objects.filter(user_id=user_id, watch_reviews=True).update(
+                reviews_seen_until=timezone.now()
+            )
+        marked = activities.update(is_read=True)
+        cls.decrement_unread(user_id, marked)
+        return marked
+
+    @classmethod
+    def get_recent_activities(
+        cls,
+        user: Any,
+        limit: int = 20,
+        favorites: Optional[Iterable[UserFavorites]] = None,
+    ) -> List[FavoriteActivity]:
+        """
+        Newest activities of the user's favorites - stored ones merged with
+        new reviews of popular components (not saved, built on read).
+        """
+        stored = list(
+            FavoriteActivity.objects.filter(favorite__user=user)
+            .select_related("favorite", "related_review")
+            .order_by("-date_created")[:limit]
+        )
+
+        if favorites is None:
+            favorites = UserFavorites.objects.filter(user=user)
+        watched = [favorite for favorite in favorites if favorite.watch_reviews]
+        popular = cls._popular_components(
+            {(f.component_type, f.component_pk) for f in watched if f.component_pk}
+        )
+        popular_favorites = [
+            f for f in watched if (f.component_type, f.component_pk) in popular
+        ]
+        if not popular_favorites:
+            return stored
+
+        seen = {(a.favorite_id, a.related_review_id) for a in stored}
+        on_read = [
+            activity
+            for activity in cls._new_review_activities(user, popular_favorites, limit)
+            if (activity.favorite_id, activity.related_review_id) not in seen
+        ]
+        activities = sorted(
+            stored + on_read, key=lambda activity: activity.date_created, reverse=True
+        )
+        return activities[:limit]
+
+    @classmethod
+    def _popular_components(cls, keys: set) -> set:
+        """Components with more watchers than the fan-out threshold."""
+        if not keys:
+            return set()
+
+        threshold = cls.get_config()["popular_threshold"]
+        cache_keys = {
+            cls.POPULAR_CACHE_KEY.format(type=component_type, id=component_id): (
+                component_type,
+                component_id,
+            )
+            for component_type, component_id in keys
+        }
+        cached = cache.get_many(list(cache_keys))
+        popular = {cache_keys[key] for key, value in cached.items() if value}
+
+        missing = {}
+        for key, (component_type, component_id) in cache_keys.items():
+            if key not in cached:
+                missing.setdefault(component_type, set()).add(component_id)
+
+        to_cache = {}
+        for component_type, ids in missing.items():
+            field = UserFavorites.component_field(component_type)
+            counts = dict(
+                UserFavorites.objects.filter(
+                    component_type=component_type,
+                    watch_reviews=True,
+                    **{f"{field}__in": ids},
+                )
+                .values_list(field)
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+            for component_id in ids:
+                is_popular = counts.get(component_id, 0) > threshold
+                to_cache[
+                    cls.POPULAR_CACHE_KEY.format(type=component_type, id=component_id)
+                ] = is_popular
+                if is_popular:
+                    popular.add((component_type, component_id))
+
+        cache.set_many(to_cache, cls.POPULAR_CACHE_TIMEOUT)
+        return popular
+
+    @classmethod
+    def _new_review_activities(
+        cls, user: Any, favorites: List[UserFavorites], limit: int
+    ) -> List[FavoriteActivity]:
+        """
+        Unsaved new_review activities for reviews published since the
+        favorite, read up to the favorite's reviews_seen_until.
+        """
+        ComponentService.load_components(favorites)
+        since = timezone.now() - timedelta(days=cls.get_config()["read_window_days"])
+
+        by_component = {}
+        for favorite in favorites:
+            by_component.setdefault(
+                (favorite.component_type, favorite.component_pk), []
+            ).append(favorite)
+
+        ids_by_type = {}
+        for component_type, component_id in by_component:
+            ids_by_type.setdefault(component_type, set()).add(component_id)
+
+        activities = []
+        for component_type, ids in ids_by_type.items():
+            field = Reviews.component_field(component_type)
+            reviews = (
+                Reviews.objects.filter(
+                    component_type=component_type,
+                    is_published=True,
+                    date_created__gte=since,
+                    **{f"{field}__in": ids},
+                )
+                .exclude(author=user)
+                .order_by("-date_created")[:limit]
+            )
+            for review in reviews:
+                for favorite in by_component.get(
+                    (component_type, review.component_pk), []
+                ):
+                    if review.date_created < favorite.date_added:
+                        continue
+                    seen_until = favorite.reviews_seen_until
+                    activities.append(
+                        FavoriteActivity(
+                            favorite=favorite,
+                            activity_type="new_review",
+                            related_review=review,
+                            date_created=review.date_created,
+                            is_read=seen_until is not None
+                            and review.date_created <= seen_until,
+                            **cls._build_message(review, favorite.component_name),
+                        )
+                    )
+        return activities
+
+    @staticmethod
+    def _build_message(review: Reviews, component_name: str) -> Dict[str, str]:
+        return {
+            "title": f"Nová recenze: {component_name}"[:200],
+            "description": (
+                f"{review.title} - {review.reviewer_name} ({review.rating}/5)"
+            ),
+            "new_value": str(review.rating),
+        }
+
+
+class ActivityDigestService:
+    """
+    Daily e-mail digest of unread favorite activities.
+
+    Pending activities are streamed ordered by user (iterator(), so memory
+    does not grow with the backlog), every user gets one message rendered
+    from a template compiled once per run, and messages go out in batches
+    over a single backend connection. ActivityDigest remembers the last
+    activity sent to each user, so a rerun only picks up newer ones.
+    """
+
+    DEFAULT_CONFIG = {
+        "chunk_size": 2000,  # rows fetched from the database at once
+        "batch_size": 100,  # messages per send_messages() call
+        "max_items": 20,  # activities listed in one e-mail
+        "base_url": "http://localhost:8000",
+    }
+
+    TEMPLATE = "viewer/emails/activity_digest.txt"
+    SUBJECT = "Souhrn aktivit oblíbených komponent ({count})"
+
+    @classmethod
+    def get_config(cls) -> Dict[str, Any]:
+        return {**cls.DEFAULT_CONFIG, **getattr(settings, "ACTIVITY_DIGEST", {})}
+
+    @classmethod
+    def pending_activities(cls, cutoff: int, chunk_size: int):
+        """Unread, not yet digested activities up to `cutoff`, grouped by user."""
+        return (
+            FavoriteActivity.objects.filter(
+                is_read=False, id__lte=cutoff, favorite__user__is_active=True
+            )
+            .exclude(favorite__user__email="")
+            .annotate(
+                user_id=F("favorite__user_id"),
+                digested=Coalesce(
+                    F("favorite__user__activity_digest__last_activity_id"), Value(0)
+                ),
+            )
+            .filter(id__gt=F("digested"))
+            .order_by("user_id", "id")
+            .values(
+                "id",
+                "user_id",
+                "activity_type",
+                "title",
+                "description",
+                "date_created",
+                email=F("favorite__user__email"),
+                username=F("favorite__user__username"),
+            )
+            .iterator(chunk_size=chunk_size)
+        )
+
+    @classmethod
+    def send_digests(
+        cls,
+        mail_connection: Any = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Send one digest per user with pending activities.
+        Returns counts and throughput; `progress` is called after each batch.
+        """
+        config = cls.get_config()
+        stats = {"users": 0, "emails": 0, "activities": 0, "failed": 0}
+        started = time.perf_counter()
+
+        cutoff = FavoriteActivity.objects.aggregate(Max("id"))["id__max"]
+        if cutoff is None:
+            return cls._with_rates(stats, started)
+
+        template = get_template(cls.TEMPLATE)
+        mail_connection = mail_connection or get_mail_connection()
+        url = config["base_url"].rstrip("/") + reverse("my_favorites")
+        now = timezone.now()
+
+        messages, states = [], []
+        with mail_connection:
+            rows = cls.pending_activities(cutoff, config["chunk_size"])
+            for user_id, user_rows in groupby(rows, key=itemgetter("user_id")):
+                items, count, last_id = [], 0, 0
+                for row in user_rows:
+                    count += 1
+                    last_id = row["id"]
+                    if len(items) < config["max_items"]:
+                        items.append(row)
+
+                messages.append(
+                    cls._build_email(template, items, count, url, mail_connection)
+                )
+                states.append(
+                    ActivityDigest(user_id=user_id, last_activity_id=last_id, date_sent=now)
+                )
+                stats["users"] += 1
+                stats["activities"] += count
+
+                if len(messages) >= config["batch_size"]:
+                    cls._send_batch(mail_connection, messages, states, stats)
+                    messages, states = [], []
+                    if progress:
+                        progress(cls._with_rates(dict(stats), started))
+
+            if messages:
+                cls._send_batch(mail_connection, messages, states, stats)
+
+        return cls._with_rates(stats, started)
+
+    @classmethod
+    def _build_email(
+        cls, template: Any, items: List[Dict], count: int, url: str, mail_connection: Any
+    ) -> EmailMessage:
+        first = items[0]
+        body = template.render(
+            {
+                "username": first["username"],
+                "activities": items,
+                "count": count,
+                "hidden_count": count - len(items),
+                "url": url,
+            }
+        )
+        return EmailMessage(
+            subject=cls.SUBJECT.format(count=count),
+            body=body,
+            to=[first["email"]],
+            connection=mail_connection,
+        )
+
+    @staticmethod
+    def _send_batch(
+        mail_connection: Any,
+        messages: List[EmailMessage],
+        states: List[ActivityDigest],
+        stats: Dict[str, Any],
+    ) -> None:
+        try:
+            sent = mail_connection.send_messages(messages) or 0
+        except Exception:
+            # The batch is retried by the next run
+            logger.exception("Sending %s activity digests failed", len(messages))
+            stats["failed"] += len(messages)
+            return
+
+        stats["emails"] += sent
+        ActivityDigest.objects.bulk_create(
+            states,
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["last_activity_id", "date_sent"],
+        )
+
+    @staticmethod
+    def _with_rates(stats: Dict[str, Any], started: float) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - started
+        stats["seconds"] = elapsed
+        stats["activities_per_second"] = stats["activities"] / elapsed if elapsed else 0
+        stats["emails_per_second"] = stats["emails"] / elapsed if elapsed else 0
+        return stats
+
+
+class HomeSnapshotService:
+    """
+    Everything the home page shows, precomputed as one cache entry.
+
+    HomeSnapshotRefresher rebuilds the snapshot in a background thread every
+    HOME_SNAPSHOT["refresh_interval"] seconds (one process per interval
+    thanks to a cache lock) and right away after invalidate(). The view
+    only reads the entry; a missing one is built synchronously.
+    """
+
+    DEFAULT_CONFIG = {
+        "refresh_interval": 60,
+        "autostart": True,
+    }
+
+    CACHE_KEY = "home:snapshot"
+    REFRESH_LOCK_KEY = "home:snapshot:lock"
+
+    # (component type, icon, icon class, order when nobody has it in favorites)
+    TOP_COMPONENTS = (
+        ("processor", "cpu", "bg-blue-100 text-blue-600", ["-rating", "-benchresult"]),
+        ("graphics_card", "monitor", "bg-green-100 text-green-600", ["-rating", "-vram"]),
+        ("motherboard", "circuit-board", "bg-purple-100 text-purple-600", ["-rating"]),
+        ("ram", "memory-stick", "bg-orange-100 text-orange-600", ["-rating", "-clock"]),
+    )
+
+    @classmethod
+    def get_config(cls) -> Dict[str, Any]:
+        return {**cls.DEFAULT_CONFIG, **getattr(settings, "HOME_SNAPSHOT", {})}
+
+    @classmethod
+    def get(cls) -> Dict[str, Any]:
+        """Snapshot for the home page template context."""
+        from .buffers import get_home_snapshot_refresher
+
+        get_home_snapshot_refresher().ensure_started()
+        snapshot = cache.get(cls.CACHE_KEY)
+        if snapshot is None:
+            # The page being rendered shows this snapshot - keep it cacheable
+            snapshot = cls.refresh(invalidate_pages=False)
+        return snapshot
+
+    @classmethod
+    def refresh(
+        cls, force: bool = True, invalidate_pages: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Build and store the snapshot. Without `force` it is skipped when
+        another process refreshed it within the interval.
+        """
+        interval = cls.get_config()["refresh_interval"]
+        if not force and not cache.add(cls.REFRESH_LOCK_KEY, 1, interval):
+            return None
+
+        snapshot = cls.build()
+        # Outlives a few intervals so a stalled refresher does not empty the page
+        cache.set(cls.CACHE_KEY, snapshot, interval * 5)
+        if invalidate_pages:
+            # Pages rendered from the previous snapshot (viewer.pagecache)
+            invalidate_tags("home")
+        return snapshot
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Refresh as soon as possible (in the background when running)."""
+        from .buffers import get_home_snapshot_refresher
+
+        refresher = get_home_snapshot_refresher()
+        if refresher.autostart:
+            refresher.request_refresh()
+        else:
+            cache.delete(cls.CACHE_KEY)
+            invalidate_tags("home")
+
+    @classmethod
+    def build(cls) -> Dict[str, Any]:
+        models = ComponentService.get_type_models()
+        counts = {
+            component_type: model.objects.count()
+            for component_type, model in models.items()
+        }
+
+        top_components = []
+        for component_type, icon, icon_class, fallback_order in cls.TOP_COMPONENTS:
+            model = models[component_type]
+            component = (
+                model.objects.filter(favorites_count__gt=0)
+                .order_by("-favorites_count", "-rating")
+                .first()
+            ) or model.objects.filter(rating__gt=0).order_by(*fallback_order).first()
+            if component:
+                top_components.append(
+                    {
+                        "name": component.name,
+                        "manufacturer": component.manufacturer,
+                        "price": component.price,
+                        "type": component_type,
+                        "id": component.id,
+                        "icon_class": icon_class,
+                        "icon": icon,
+                        "favorites_count": component.favorites_count,
+                    }
+                )
+
+        latest_reviews = [
+            {
+                "component_type": review.component_type,
+                "component_name": review.component_name,
+                "rating": review.rating,
+                "reviewer_name": review.reviewer_name,
+                "summary": review.summary,
+                "date_created": review.date_created,
+            }
+            for review in ComponentService.load_components(
+                Reviews.objects.filter(is_published=True).order_by("-date_created")[:3]
+            )
+        ]
+
+        return {
+            "latest_reviews": latest_reviews,
+            "top_components": top_components,
+            "trending": TrendingService.get_trending(limit=5),
+            "stats": {
+                "total_components": sum(counts.values()),
+                "total_reviews": Reviews.objects.filter(is_published=True).count(),
+                "processors_count": counts["processor"],
+                "gpus_count": counts["graphics_card"],
+                "motherboards_count": counts["motherboard"],
+                "ram_count": counts["ram"],
+                "total_favorites": UserFavorites.objects.count(),
+            },
+        }
+
+
+class TrendingService:
+    """
+    Trending components - popularity with exponential time decay.
+
+    Every event (Heureka click, new favorite, published review, helpful
+    vote) adds weight * 2 ** ((t - base) / half_life) to the component's
+    TrendingScore. Scores relative to a common base time keep their order
+    as time passes, so events are folded in incrementally (per-source id
+    checkpoints, batches) and old scores are never decayed row by row -
+    only rebased once the exponent grows large. Reviews may be published
+    long after they were created, so they are counted on publication
+    (add_review_later) instead of by id. Scores are only ever changed by
+    score = score + delta. After each update the top lists are stored in
+    the cache, reading them is a single cache get.
+    """
+
+    DEFAULT_CONFIG = {
+        "half_life_hours": 48,
+        "top_n": 10,
+        "weights": {"click": 1.0, "favorite": 5.0, "review": 8.0, "vote": 2.0},
+    }
+
+    TOP_CACHE_KEY = "trending:top"
+    BASE_CHECKPOINT = "trending_base"
+    # One update / rebuild at a time (PostgreSQL advisory lock, cache elsewhere)
+    RUN_LOCK_ID = 0x7472656E64
+    RUN_LOCK_KEY = "trending:run-lock"
+    RUN_LOCK_TIMEOUT = 60 * 60
+    # Rebase when the multiplier of new events exceeds 2 ** REBASE_HALF_LIVES
+    REBASE_HALF_LIVES = 64
+    # Rows decayed below this are dropped on rebase
+    MIN_SCORE = 1e-3
+
+    # Batched writers (clicks) may commit ids out of order
+    SETTLE_DELAY = timedelta(minutes=1)
+
+    @classmethod
+    def get_config(cls) -> Dict[str, Any]:
+        config = {**cls.DEFAULT_CONFIG, **getattr(settings, "TRENDING", {})}
+        config["weights"] = {
+            **cls.DEFAULT_CONFIG["weights"],
+            **config.get("weights", {}),
+        }
+        return config
+
+    @staticmethod
+    def _sources() -> Dict[str, QuerySet]:
+        """Event source -> queryset of (id, type, component id, time)."""
+        return {
+            "click": HeurekaClick.objects.values_list(
+                "id", "component_type", "component_id", "timestamp"
+            ),
+            # Rows not yet backfilled (backfill_component_refs) fall back to the FK
+            "favorite": UserFavorites.objects.annotate(
+                ref=UserFavorites.component_pk_expression()
+            ).values_list("id", "component_type", "ref", "date_added"),
+            "vote": ReviewVotes.objects.filter(is_helpful=True)
+            .annotate(ref=Reviews.component_pk_expression("review__"))
+            .values_list("id", "review__component_type", "ref", "date_voted"),
+        }
+
+    @classmethod
+    @contextmanager
+    def _run_lock(cls):
+        """Yield whether this process may run an update."""
+        if connection.vendor == "postgresql":
+            # Session level - held across the batch transactions
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", [cls.RUN_LOCK_ID])
+                acquired = cursor.fetchone()[0]
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT pg_advisory_unlock(%s)", [cls.RUN_LOCK_ID])
+            return
+
+        acquired = cache.add(cls.RUN_LOCK_KEY, 1, cls.RUN_LOCK_TIMEOUT)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                cache.delete(cls.RUN_LOCK_KEY)
+
+    @classmethod
+    def update(cls, batch_size: int = 5000) -> Dict[str, int]:
+        """Fold events newer than the checkpoints into the scores."""
+        with cls._run_lock() as acquired:
+            if not acquired:
+                logger.info("Trending update already running, skipped")
+                return {"events": 0, "batches": 0}
+            return cls._update(batch_size)
+
+    @classmethod
+    def _update(
+        cls, batch_size: int, upper_ids: Optional[Dict[str, int]] = None
+    ) -> Dict[str, int]:
+        config = cls.get_config()
+        half_life = config["half_life_hours"] * 3600
+        base = cls._rebase_if_needed(half_life)
+
+        stats = {"events": 0, "batches": 0}
+        for name, events in cls._sources().items():
+            weight = config["weights"][name]
+            checkpoint, _ = RollupCheckpoint.objects.get_or_create(
+                name=f"trending_{name}"
+            )
+            if upper_ids is not None:
+                upper_id = upper_ids.get(name, 0)
+            else:
+                upper_id = settled_max_id(f"trending_{name}", events, cls.SETTLE_DELAY)
+            last_id = checkpoint.last_id
+
+            while last_id < upper_id:
+                batch_upper = min(last_id + batch_size, upper_id)
+                with transaction.atomic():
+                    # Lock the checkpoint so parallel runs cannot count twice
+                    checkpoint = RollupCheckpoint.objects.select_for_update().get(
+                        pk=checkpoint.pk
+                    )
+                    if checkpoint.last_id != last_id:
+                        break
+
+                    deltas = {}
+                    for _, component_type, component_id, when in events.filter(
+                        id__gt=last_id, id__lte=batch_upper
+                    ).order_by():
+                        if component_id is None:
+                            continue
+                        key = (component_type, component_id)
+                        deltas[key] = deltas.get(key, 0.0) + weight * 2 ** (
+                            (when.timestamp() - base) / half_life
+                        )
+                        stats["events"] += 1
+                    cls._add_scores(deltas)
+
+                    checkpoint.last_id = batch_upper
+                    checkpoint.save(update_fields=["last_id", "date_updated"])
+
+                last_id = batch_upper
+                stats["batches"] += 1
+
+        cls.refresh_top()
+        return stats
+
+    @classmethod
+    def rebuild(cls, batch_size: int = 5000) -> Dict[str, int]:
+        """Drop all scores and fold every event in again."""
+        with cls._run_lock() as acquired:
+            if not acquired:
+                logger.info("Trending update already running, skipped")
+                return {"events": 0, "batches": 0}
+
+            config = cls.get_config()
+            half_life = config["half_life_hours"] * 3600
+            weight = config["weights"]["review"]
+            reviews = (
+                Reviews.objects.filter(is_published=True)
+                .annotate(ref=Reviews.component_pk_expression())
+                .values_list("component_type", "ref", "date_created")
+                .order_by()
+            )
+            with transaction.atomic():
+                # Reviews published meanwhile wait for the base row lock
+                cls._lock_base()
+                TrendingScore.objects.all().delete()
+                checkpoints = RollupCheckpoint.objects.filter(
+                    name__in=[f"trending_{name}" for name in cls._sources()]
+                )
+                # Replay up to the ids already known to be settled
+                upper_ids = {
+                    name.removeprefix("trending_"): last_id
+                    for name, last_id in checkpoints.values_list("name", "last_id")
+                }
+                checkpoints.update(last_id=0)
+                base = int(timezone.now().timestamp())
+                cls._set_base(base)
+
+                # Published reviews with their creation time - the publication
+                # time is not stored
+                deltas = {}
+                count = 0
+                for component_type, component_id, created in reviews.iterator(
+                    chunk_size=batch_size
+                ):
+                    if component_id is None:
+                        continue
+                    key = (component_type, component_id)
+                    deltas[key] = deltas.get(key, 0.0) + weight * 2 ** (
+                        (created.timestamp() - base) / half_life
+                    )
+                    count += 1
+                cls._add_scores(deltas)
+
+            stats = cls._update(batch_size, upper_ids)
+        stats["events"] += count
+        return stats
+
+    @staticmethod
+    def add_review_later(review_id: int) -> None:
+        """Count a newly published review once the transaction commits."""
+        transaction.on_commit(lambda: TrendingService.add_review(review_id))
+
+    @classmethod
+    def add_review(cls, review_id: int) -> None:
+        review = Reviews.objects.filter(pk=review_id, is_published=True).first()
+        if review is None or review.component_pk is None:
+            return
+        config = cls.get_config()
+        half_life = config["half_life_hours"] * 3600
+        with transaction.atomic():
+            # Waits for a running rebase, so the delta matches the stored base
+            base = cls._lock_base()
+            delta = config["weights"]["review"] * 2 ** (
+                (timezone.now().timestamp() - base) / half_life
+            )
+            cls._add_scores({(review.component_type, review.component_pk): delta})
+
+    @staticmethod
+    def _add_scores(deltas: Dict[Tuple[str, int], float]) -> None:
+        """score = score + delta per component, missing rows are created."""
+        rows = [
+            (component_type, component_id, delta)
+            for (component_type, component_id), delta in deltas.items()
+        ]
+        if not connection.features.supports_update_conflicts_with_target:
+            for component_type, component_id, delta in rows:
+                updated = TrendingScore.objects.filter(
+                    component_type=component_type, component_id=component_id
+                ).update(score=F("score") + delta)
+                if not updated:
+                    TrendingScore.objects.create(
+                        component_type=component_type,
+                        component_id=component_id,
+                        score=delta,
+                    )
+            return
+
+        ops = connection.ops
+        table = ops.quote_name(TrendingScore._meta.db_table)
+        column = ops.quote_name(TrendingScore._meta.get_field("score").column)
+        columns = ", ".join(
+            ops.quote_name(TrendingScore._meta.get_field(name).column)
+            for name in ("component_type", "component_id", "score")
+        )
+        with connection.cursor() as cursor:
+            # 3 parameters per row, below SQLite's 999 variable limit
+            for start in range(0, len(rows), 300):
+                chunk = rows[start : start + 300]
+                cursor.execute(
+                    f"INSERT INTO {table} ({columns}) VALUES "
+                    + ", ".join(["(%s, %s, %s)"] * len(chunk))
+                    + f" ON CONFLICT ({columns.rsplit(', ', 1)[0]}) DO UPDATE "
+                    f"SET {column} = {table}.{column} + EXCLUDED.{column}",
+                    [value for row in chunk for value in row],
+                )
+
+    @classmethod
+    def _base(cls) -> float:
+        checkpoint, _ = RollupCheckpoint.objects.get_or_create(
+            name=cls.BASE_CHECKPOINT,
+            defaults={"last_id": int(timezone.now().timestamp())},
+        )
+        return float(checkpoint.last_id)
+
+    @classmethod
+    def _lock_base(cls) -> float:
+        """Base time, its row locked until the end of the transaction."""
+        cls._base()
+        return float(
+            RollupCheckpoint.objects.select_for_update()
+            .get(name=cls.BASE_CHECKPOINT)
+            .last_id
+        )
+
+    @classmethod
+    def _set_base(cls, base: float) -> None:
+        RollupCheckpoint.objects.update_or_create(
+            name=cls.BASE_CHECKPOINT, defaults={"last_id": int(base)}
+        )
+
+    @classmethod
+    def _rebase_if_needed(cls, half_life: float) -> float:
+        """Move the base time to now before the multipliers overflow floats."""
+        base = cls._base()
+        now = timezone.now().timestamp()
+        if (now - base) / half_life < cls.REBASE_HALF_LIVES:
+            return base
+
+        with transaction.atomic():
+            base = cls._lock_base()
+            factor = 2 ** (-(int(now) - base) / half_life)
+            TrendingScore.objects.update(score=F("score") * factor)
+            TrendingScore.objects.filter(score__lt=cls.MIN_SCORE).delete()
+            cls._set_base(now)
+        return float(int(now))
+
+    @classmethod
+    def refresh_top(cls) -> Dict[str, Any]:
+        """Store the top lists (overall and per type) in the cache."""
+        config = cls.get_config()
+        top_n = config["top_n"]
+        base = cls._base()
+        # Scores decayed to now, for display
+        decay = 2 ** (
+            -(timezone.now().timestamp() - base) / (config["half_life_hours"] * 3600)
+        )
+
+        models = ComponentService.get_type_models()
+        rows = {
+            component_type: list(
+                TrendingScore.objects.filter(component_type=component_type).order_by(
+                    "-score"
+                )[:top_n]
+            )
+            for component_type in models
+        }
+        components = {
+            component_type: models[component_type].objects.in_bulk(
+                [row.component_id for row in type_rows]
+            )
+            for component_type, type_rows in rows.items()
+            if type_rows
+        }
+
+        def entry(row):
+            component = components.get(row.component_type, {}).get(row.component_id)
+            if component is None:
+                return None
+            return {
+                "type": row.component_type,
+                "id": row.component_id,
+                "name": component.name,
+                "manufacturer": component.manufacturer,
+                "score": round(row.score * decay, 2),
+                "_rank": row.score,
+            }
+
+        by_type = {
+            component_type: [e for e in map(entry, type_rows) if e]
+            for component_type, type_rows in rows.items()
+        }
+        # The overall top N is within the union of the per-type top N
+        overall = sorted(
+            (e for entries in by_type.values() for e in entries),
+            key=lambda e: e["_rank"],
+            reverse=True,
+        )[:top_n]
+        for entries in by_type.values():
+            for e in entries:
+                e.pop("_rank", None)
+
+        top = {"overall": overall, "by_type": by_type}
+        cache.set(cls.TOP_CACHE_KEY, top, None)
+        return top
+
+    @classmethod
+    def get_trending(
+        cls, component_type: Optional[str] = None, limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Top trending components overall or of one type (cache read)."""
+        top = cache.get(cls.TOP_CACHE_KEY)
+        if top is None:
+            top = cls.refresh_top()
+        if component_type:
+            return top["by_type"].get(component_type, [])[:limit]
+        return top["overall"][:limit]
+
+
+class RecommendationService:
+    """
+    "Users who favorited this also favorited..." - item-item cosine
+    similarity over the binary user x component favorites matrix.
+
+    The co-occurrence rows (A^T A) are built offline, one chunk of target
+    components at a time: favorites of the users who favorited a target
+    are streamed ordered by user and every basket adds one to
+    co[target][other], so memory is bounded by the rows of one chunk, not
+    the whole matrix. Similarity is co / sqrt(n_target * n_other) with n
+    taken from the maintained favorites_count. The top K neighbours are
+    stored per component with the count they were computed from; the
+    incremental run recomputes only components whose count changed and
+    the components favorited together with them.
+    """
+
+    DEFAULT_CONFIG = {
+        "top_k": 8,
+        # Pairs favorited together by fewer users are noise
+        "min_common": 2,
+        # Larger baskets (collectors, bots) add a quadratic number of pairs
+        # with almost no signal and are skipped
+        "max_basket": 200,
+        # Target components per pass over the favorites
+        "chunk_size": 500,
+    }
+
+    @classmethod
+    def get_config(cls) -> Dict[str, Any]:
+        return {**cls.DEFAULT_CONFIG, **getattr(settings, "RECOMMENDATIONS", {})}
+
+    @staticmethod
+    def get_recommendations(
+        component_type: str, component_id: int, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Precomputed neighbours of the component (one indexed lookup)."""
+        neighbours = (
+            ComponentRecommendations.objects.filter(
+                component_type=component_type, component_id=component_id
+            )
+            .values_list("neighbours", flat=True)
+            .first()
+        )
+        return (neighbours or [])[:limit]
+
+    @classmethod
+    def update(
+        cls, full: bool = False, progress: Optional[Callable] = None
+    ) -> Dict[str, int]:
+        """
+        Recompute neighbours of components whose favorites changed since
+        the last run (all components with full=True).
+        """
+        config = cls.get_config()
+        counts = cls._favorites_counts()
+        stored = {
+            (component_type, component_id): (count, neighbours)
+            for component_type, component_id, count, neighbours in (
+                ComponentRecommendations.objects.values_list(
+                    "component_type", "component_id", "favorites_count", "neighbours"
+                )
+            )
+        }
+
+        if full:
+            targets = set(counts) | set(stored)
+        else:
+            dirty = {
+                key
+                for key in set(counts) | set(stored)
+                if counts.get(key, 0) != stored.get(key, (0, []))[0]
+            }
+            targets = cls._affected(dirty, stored)
+
+        stats = {"components": len(targets), "chunks": 0, "baskets": 0}
+        ordered = sorted(targets)
+        for start in range(0, len(ordered), config["chunk_size"]):
+            chunk = ordered[start : start + config["chunk_size"]]
+            rows, baskets = cls._cooccurrences(chunk, config["max_basket"])
+            cls._save(chunk, rows, counts, config)
+            stats["chunks"] += 1
+            stats["baskets"] += baskets
+            if progress:
+                progress(stats)
+        return stats
+
+    @staticmethod
+    def _favorites_counts() -> Dict[Tuple[str, int], int]:
+        return {
+            (component_type, component_id): count
+            for component_type, model in ComponentService.get_type_models().items()
+            for component_id, count in model.objects.filter(
+                favorites_count__gt=0
+            ).values_list("id", "favorites_count")
+        }
+
+    @staticmethod
+    def _components_filter(
+        keys: Iterable[Tuple[str, int]], favorites: bool = True
+    ) -> Q:
+        """Rows of the components - favorites through component_field()."""
+        by_type = {}
+        for component_type, component_id in keys:
+            by_type.setdefault(component_type, []).append(component_id)
+        condition = Q(pk__in=[])
+        for component_type, ids in by_type.items():
+            field = (
+                UserFavorites.component_field(component_type)
+                if favorites
+                else "component_id"
+            )
+            condition |= Q(component_type=component_type, **{f"{field}__in": ids})
+        return condition
+
+    @classmethod
+    def _affected(cls, dirty, stored) -> set:
+        """Dirty components and every component whose row mentions them."""
+        if not dirty:
+            return set()
+        affected = set(dirty)
+        # Old neighbours (a removed favorite may have dropped the pair)
+        for key in dirty:
+            for neighbour in stored.get(key, (0, []))[1]:
+                affected.add((neighbour["type"], neighbour["id"]))
+        # Current co-favorites
+        users = UserFavorites.objects.filter(
+            cls._components_filter(dirty)
+        ).values("user_id")
+        affected.update(
+            UserFavorites.objects.filter(user_id__in=users)
+            .annotate(ref=UserFavorites.component_pk_expression())
+            .filter(ref__isnull=False)
+            .order_by()
+            .values_list("component_type", "ref")
+            .distinct()
+        )
+        return affected
+
+    @classmethod
+    def _cooccurrences(
+        cls, chunk: List[Tuple[str, int]], max_basket: int
+    ) -> Tuple[Dict[Tuple[str, int], Counter], int]:
+        """Co-occurrence counts of the chunk's components with all others."""
+        rows = {key: Counter() for key in chunk}
+        users = UserFavorites.objects.filter(cls._components_filter(chunk)).values(
+            "user_id"
+        )
+        favorites = (
+            UserFavorites.objects.filter(user_id__in=users)
+            .annotate(ref=UserFavorites.component_pk_expression())
+            .filter(ref__isnull=False)
+            .order_by("user_id")
+            .values_list("user_id", "component_type", "ref")
+        )
+
+        baskets = 0
+        for _, user_favorites in groupby(
+            favorites.iterator(chunk_size=2000), key=itemgetter(0)
+        ):
+            basket = [
+                (component_type, component_id)
+                for _, component_type, component_id in user_favorites
+            ]
+            if len(basket) > max_basket:
+                continue
+            baskets += 1
+            for target in basket:
+                row = rows.get(target)
+                if row is None:
+                    continue
+                for other in basket:
+                    if other != target:
+                        row[other] += 1
+        return rows, baskets
+
+    @classmethod
+    def _save(cls, chunk, rows, counts, config) -> None:
+        top = {}
+        for target in chunk:
+            target_count = counts.get(target, 0)
+            candidates = [
+                (
+                    together
+                    / math.sqrt(
+                        max(target_count, together)
+                        * max(counts.get(other, 0), together)
+                    ),
+                    together,
+                    other,
+                )
+                for other, together in rows[target].items()
+                if together >= config["min_common"]
+            ]
+            top[target] = heapq.nlargest(config["top_k"], candidates)
+
+        models = ComponentService.get_type_models()
+        wanted = {}
+        for neighbours in top.values():
+            for _, _, (component_type, component_id) in neighbours:
+                wanted.setdefault(component_type, set()).add(component_id)
+        components = {
+            component_type: models[component_type]
+            .objects.only("name", "manufacturer")
+            .in_bulk(ids)
+            for component_type, ids in wanted.items()
+        }
+
+        records, empty = [], []
+        for target, neighbours in top.items():
+            if not counts.get(target) and not neighbours:
+                empty.append(target)
+                continue
+            entries = []
+            for score, _, (component_type, component_id) in neighbours:
+                component = components[component_type].get(component_id)
+                if component is None:
+                    continue
+                entries.append(
+                    {
+                        "type": component_type,
+                        "id": component_id,
+                        "name": component.name,
+                        "manufacturer": component.manufacturer,
+                        "score": round(score, 4),
+                    }
+                )
+            records.append(
+                ComponentRecommendations(
+                    component_type=target[0],
+                    component_id=target[1],
+                    neighbours=entries,
+                    favorites_count=counts.get(target, 0),
+                )
+            )
+
+        with transaction.atomic():
+            if empty:
+                ComponentRecommendations.objects.filter(
+                    cls._components_filter(empty, favorites=False)
+                ).delete()
+            ComponentRecommendations.objects.bulk_create(
+                records,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=["component_type", "component_id"],
+                update_fields=["neighbours", "favorites_count", "date_updated"],
+            )
+
+        invalidate_tags(
+            *(
+                f"component:{component_type}:{component_id}"
+                for component_type, component_id in chunk
+            )
+        )
@@ -0,0 +1,104 @@
+"""
+Model signal handlers keeping cached aggregates in sync.
+Connected in ViewerConfig.ready().
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import (COMPONENT_TYPE_MODELS, FavoriteActivity, Reviews,
+                     UserFavorites)
+from .pagecache import invalidate_tags
+from .services import (ComponentService, FavoriteActivityService,
+                       HomeSnapshotService, ReviewFeedService, ReviewService,
+                       TrendingService)
+
+
+@receiver(post_save, sender=Reviews)
+def review_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Saves touching only e.g. helpful votes change neither statistics nor feeds
+    fields = set(update_fields or ())
+    invalidate_review_caches(
+        [instance],
+        statistics=not fields or bool(ReviewService.STATISTICS_FIELDS & fields),
+        pages=not fields or bool(fields - ReviewFeedService.IGNORED_FIELDS),
+    )
+
+    # Nově publikovaná recenze -> aktivity pro sledující (na pozadí)
+    was_published = getattr(instance, "_was_published", None)
+    if instance.is_published and (created or was_published is False):
+        FavoriteActivityService.fan_out_later(instance.pk)
+        TrendingService.add_review_later(instance.pk)
+    instance._was_published = instance.is_published
+
+
+@receiver(pre_delete, sender=Reviews)
+def review_deleting(sender, instance, **kwargs):
+    # Nepřečtené aktivity o recenzi zmizí spolu s ní (CASCADE)
+    FavoriteActivityService.forget_review_activities(instance.pk)
+
+
+@receiver(post_delete, sender=Reviews)
+def review_deleted(sender, instance, **kwargs):
+    invalidate_review_caches([instance])
+
+
+def invalidate_review_caches(reviews, statistics=True, pages=True):
+    """
+    Zahodí statistiky, domovskou stránku, feedy a stránky v page cache
+    (viewer.pagecache) dotčené recenzemi. Až po commitu - dřívější
+    invalidaci by souběžný požadavek znovu naplnil starými daty.
+    """
+    if not statistics and not pages:
+        return
+    component_tags = {
+        f"component:{review.component_type}:{review.component_pk}"
+        for review in reviews
+    }
+
+    def invalidate():
+        if statistics:
+            ReviewService.invalidate_site_statistics()
+            HomeSnapshotService.invalidate()
+        if pages:
+            ReviewFeedService.invalidate_feeds()
+            invalidate_tags("reviews", *component_tags)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(pre_delete, sender=UserFavorites)
+def favorite_deleting(sender, instance, **kwargs):
+    # Nepřečtené aktivity zmizí spolu s oblíbenou komponentou (CASCADE)
+    unread = FavoriteActivity.objects.filter(favorite=instance, is_read=False).count()
+    FavoriteActivityService.decrement_unread(instance.user_id, unread)
+
+
+@receiver(post_save, sender=UserFavorites)
+def favorite_saved(sender, instance, created, **kwargs):
+    if created:
+        ComponentService.adjust_favorites_count(
+            instance.component_type, instance.component_pk, 1
+        )
+
+
+@receiver(post_delete, sender=UserFavorites)
+def favorite_deleted(sender, instance, **kwargs):
+    ComponentService.adjust_favorites_count(
+        instance.component_type, instance.component_pk, -1
+    )
+
+
+def component_changed(sender, instance, **kwargs):
+    component_type = COMPONENT_TYPES_BY_MODEL[sender]
+    invalidate_tags("catalog", f"component:{component_type}:{instance.pk}")
+    ReviewService.invalidate_component_cards(component_type, instance.pk)
+
+
+COMPONENT_TYPES_BY_MODEL = {
+    model: component_type for component_type, model in COMPONENT_TYPE_MODELS.items()
+}
+for component_model in COMPONENT_TYPE_MODELS.values():
+    post_save.connect(component_changed, sender=component_model)
+    post_delete.connect(component_changed, sender=component_model)
@@ -1,14 +1,17 @@
+import io
 from decimal import Decimal
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.db import IntegrityError
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from .models import (BoardFormats, GraphicsCards, HeurekaClick, Motherboards,
                      PowerSupplyUnits, Processors, Ram, RamTypes, Reviews,
                      ReviewVotes, Sockets, Storage, StorageTypes,
                      UserFavorites)
+from .services import ComponentService, ReviewService
 
 
 class SocketsModelTest(TestCase):
@@ -462,6 +465,125 @@ class UserFavoritesModelTest(TestCase):
         # Test component_manufacturer property
         self.assertEqual(favorite.component_manufacturer, "Test")
 
+    def test_favorites_count_follows_favorites(self):
+        """favorites_count komponenty se mění s přidáním a odebráním oblíbené"""
+        other = User.objects.create_user(username="other", password="pass123")
+        favorite = UserFavorites.objects.create(
+            user=self.user, component_type="processor", processor=self.processor
+        )
+        UserFavorites.objects.create(
+            user=other, component_type="processor", processor=self.processor
+        )
+        self.processor.refresh_from_db()
+        self.assertEqual(self.processor.favorites_count, 2)
+
+        favorite.delete()
+        self.processor.refresh_from_db()
+        self.assertEqual(self.processor.favorites_count, 1)
+
+        Processors.objects.update(favorites_count=0)
+        call_command("recount_favorites", stdout=io.StringIO())
+        self.processor.refresh_from_db()
+        self.assertEqual(self.processor.favorites_count, 1)
+
+
+class ComponentRefTest(TestCase):
+    """Testy pro odkaz na komponentu dvojicí (component_type, component_id)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="refuser", password="pass123")
+        socket = Sockets.objects.create(type="AM5")
+        self.processor = Processors.objects.create(
+            name="Ref CPU", manufacturer="AMD", socket=socket, price=8000
+        )
+        self.gpu = GraphicsCards.objects.create(
+            name="Ref GPU", manufacturer="AMD", price=14000
+        )
+
+    def _review(self, **component):
+        return Reviews.objects.create(
+            title="Recenze",
+            author=self.user,
+            reviewer_name="Tester",
+            content="Obsah",
+            summary="Shrnutí",
+            rating=4,
+            **component,
+        )
+
+    def test_dual_write(self):
+        """Uložení doplní dvojici z FK i FK z dvojice"""
+        review = self._review(component_type="processor", processor=self.processor)
+        self.assertEqual(review.component_id, self.processor.pk)
+
+        favorite = UserFavorites.objects.create(
+            user=self.user, component_type="graphics_card", component_id=self.gpu.pk
+        )
+        favorite.refresh_from_db()
+        self.assertEqual(favorite.graphics_card_id, self.gpu.pk)
+
+        # Změna komponenty přes update_fields přepíše i component_id
+        other = Processors.objects.create(
+            name="Other CPU", manufacturer="Intel", socket=self.processor.socket
+        )
+        review.processor = other
+        review.save(update_fields=["processor"])
+        review.refresh_from_db()
+        self.assertEqual(review.component_id, other.pk)
+
+        with self.assertRaises(IntegrityError):
+            UserFavorites.objects.create(
+                user=self.user, component_type="graphics_card", graphics_card=self.gpu
+            )
+
+    def test_backfill_command(self):
+        """Příkaz doplní component_id starým řádkům"""
+        review = self._review(component_type="processor", processor=self.processor)
+        favorite = UserFavorites.objects.create(
+            user=self.user, component_type="graphics_card", graphics_card=self.gpu
+        )
+        Reviews.objects.update(component_id=None)
+        UserFavorites.objects.update(component_id=None)
+
+        call_command("backfill_component_refs", "--batch-size", "1", stdout=io.StringIO())
+
+        review.refresh_from_db()
+        favorite.refresh_from_db()
+        self.assertEqual(review.component_id, self.processor.pk)
+        self.assertEqual(favorite.component_id, self.gpu.pk)
+
+    def test_load_components_one_query_per_type(self):
+        """Smíšený seznam načte komponenty jedním dotazem na typ"""
+        for _ in range(3):
+            self._review(component_type="processor", processor=self.processor)
+            self._review(component_type="graphics_card", graphics_card=self.gpu)
+        # Nedoplněný řádek - id komponenty se vezme z FK
+        Reviews.objects.filter(component_type="processor").update(component_id=None)
+
+        reviews = list(Reviews.objects.all())
+        with self.assertNumQueries(2):
+            ComponentService.load_components(reviews)
+        with self.assertNumQueries(0):
+            names = {review.component_name for review in reviews}
+        self.assertEqual(names, {"Ref CPU", "Ref GPU"})
+
+    @override_settings(COMPONENT_REF_READS=True)
+    def test_reads_by_component_ref(self):
+        """Po přepnutí se filtruje podle dvojice (component_type, component_id)"""
+        review = self._review(component_type="processor", processor=self.processor)
+        self._review(component_type="graphics_card", graphics_card=self.gpu)
+
+        self.assertEqual(
+            Reviews.component_filter("processor", self.processor.pk),
+            {"component_type": "processor", "component_id": self.processor.pk},
+        )
+        self.assertEqual(
+            list(ReviewService.get_component_reviews(self.processor, "processor")),
+            [review],
+        )
+        stats = ReviewService.get_review_statistics(self.gpu, "graphics_card")
+        self.assertEqual(stats["total_reviews"], 1)
+
 
 class HeurekaClickModelTest(TestCase):
     """Testy pro model HeurekaClick"""
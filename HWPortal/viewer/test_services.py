@@ -0,0 +1,1396 @@
+import io
+import json
+import os
+import random
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import (TestCase, TransactionTestCase, override_settings,
+                         skipUnlessDBFeature)
+from django.utils import timezone
+
+from .buffers import (HeurekaClickBuffer, VoteCounterBuffer,
+                      get_review_fanout_queue)
+from .models import (COMPONENT_TYPE_MODELS, ActivityDigest,
+                     ComponentPriceState, FavoriteActivity, GraphicsCards,
+                     HeurekaClick, HeurekaClickHourly, HeurekaQueryHourly,
+                     PriceSnapshot, Processors, Reviews, ReviewVotes,
+                     RollupCheckpoint, Sockets, TrendingScore,
+                     UnreadActivityCounter, UserFavorites, wilson_lower_bound)
+from .services import (ActivityDigestService, ClickAnalyticsService,
+                       FavoriteActivityService, FavoriteService,
+                       OfferCacheService, OfferRefreshScheduler,
+                       PriceChangeService, RecommendationService,
+                       TrendingService, VoteService)
+
+NO_DELAY_FAKE_API = {
+    "simulate_delays": False,
+    "min_products": 3,
+    "max_products": 8,
+    "price_variation": 0.3,
+}
+
+
+@override_settings(FAKE_API_SETTINGS=NO_DELAY_FAKE_API)
+class OfferRefreshSchedulerTest(TestCase):
+    """Testy pro obnovu cache nabídek na pozadí"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="watcher", password="pass123")
+        self.socket = Sockets.objects.create(type="AM4")
+        self.cpu_quiet = Processors.objects.create(
+            name="Quiet CPU", manufacturer="AMD", socket=self.socket, price=5000
+        )
+        self.cpu_popular = Processors.objects.create(
+            name="Popular CPU", manufacturer="AMD", socket=self.socket, price=9000
+        )
+        self.gpu = GraphicsCards.objects.create(
+            name="Test GPU", manufacturer="NVIDIA", price=15000
+        )
+
+    def test_popular_components_go_first(self):
+        """Komponenty s kliky a sledujícími se obnovují jako první"""
+        HeurekaClick.objects.create(
+            component_type="processor",
+            component_id=self.cpu_popular.id,
+            component_name=self.cpu_popular.name,
+            search_query="Popular CPU",
+        )
+        UserFavorites.objects.create(
+            user=self.user, component_type="graphics_card", graphics_card=self.gpu
+        )
+
+        order = OfferRefreshScheduler().prioritized_components()
+
+        self.assertEqual(order[0], ("graphics_card", self.gpu.id))
+        self.assertEqual(order[1], ("processor", self.cpu_popular.id))
+        self.assertEqual(len(order), 3)
+
+    def test_queued_components_go_first(self):
+        """Komponenty zařazené po cache miss mají přednost"""
+        OfferCacheService.request_refresh([("processor", self.cpu_quiet.id)])
+
+        order = OfferRefreshScheduler().prioritized_components()
+
+        self.assertEqual(order[0], ("processor", self.cpu_quiet.id))
+
+    def test_run_once_fills_cache_and_price_history(self):
+        """Průchod katalogem naplní cache a uloží cenové snímky"""
+        metrics = OfferRefreshScheduler(batch_size=2, rate_limit=0).run_once()
+
+        self.assertEqual(metrics["total"], 3)
+        self.assertEqual(metrics["refreshed"], 3)
+        self.assertEqual(metrics["errors"], 0)
+        self.assertEqual(PriceSnapshot.objects.count(), 3)
+
+        entry = OfferCacheService.get_offers("processor", self.cpu_quiet.id)
+        self.assertTrue(entry["products"])
+        snapshot = PriceSnapshot.objects.get(
+            component_type="processor", component_id=self.cpu_quiet.id
+        )
+        self.assertEqual(snapshot.min_price, entry["products"][0]["price"])
+
+    def test_fresh_entries_are_skipped(self):
+        """Čerstvé nabídky se znovu nestahují"""
+        OfferRefreshScheduler(rate_limit=0).run_once()
+        metrics = OfferRefreshScheduler(rate_limit=0).run_once()
+
+        self.assertEqual(metrics["refreshed"], 0)
+        self.assertEqual(metrics["skipped"], 3)
+
+    def test_heureka_view_never_fetches_inline(self):
+        """Endpoint při cache miss jen zařadí komponentu do fronty"""
+        url = f"/heureka-data/processor/{self.cpu_quiet.id}/"
+
+        data = self.client.get(url).json()
+        self.assertTrue(data["pending"])
+        self.assertEqual(
+            OfferCacheService.pop_refresh_requests(),
+            [("processor", self.cpu_quiet.id)],
+        )
+
+        OfferRefreshScheduler(rate_limit=0).run_once()
+        data = self.client.get(url).json()
+        self.assertNotIn("pending", data)
+        self.assertEqual(data["total_found"], len(data["products"]))
+
+    def test_summaries_endpoint_uses_cache_only(self):
+        """Hromadný endpoint vrací souhrny z cache a chybějící zařadí"""
+        OfferRefreshScheduler(rate_limit=0).run_once()
+        cache.delete(OfferCacheService.summary_key("graphics_card", self.gpu.id))
+
+        items = f"processor:{self.cpu_quiet.id},graphics_card:{self.gpu.id},ram:x"
+        # Jen ověření existence chybějících (jeden dotaz na typ), nabídky z cache
+        with self.assertNumQueries(1):
+            data = self.client.get(f"/heureka-data/summaries/?items={items}").json()
+
+        summary = data["results"][f"processor:{self.cpu_quiet.id}"]
+        entry = OfferCacheService.get_offers("processor", self.cpu_quiet.id)
+        self.assertEqual(summary["lowest_price"], entry["products"][0]["price"])
+        self.assertGreater(summary["shop_count"], 0)
+        self.assertEqual(data["pending"], [f"graphics_card:{self.gpu.id}"])
+        self.assertEqual(
+            OfferCacheService.pop_refresh_requests(), [("graphics_card", self.gpu.id)]
+        )
+
+    def test_summaries_endpoint_limits_batch_size(self):
+        """Více než 100 komponent najednou je odmítnuto"""
+        items = ",".join(f"processor:{i}" for i in range(1, 102))
+
+        response = self.client.get(f"/heureka-data/summaries/?items={items}")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_components_are_not_queued(self):
+        """Neexistující komponenta vrátí 404 a nedostane se do fronty"""
+        missing_id = self.cpu_popular.id + 1000
+
+        response = self.client.get(f"/heureka-data/processor/{missing_id}/")
+        self.client.get(
+            f"/heureka-data/summaries/?items=processor:{missing_id},"
+            f"processor:{self.cpu_quiet.id}"
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(
+            OfferCacheService.pop_refresh_requests(),
+            [("processor", self.cpu_quiet.id)],
+        )
+
+
+class HeurekaClickBufferTest(TestCase):
+    """Testy pro dávkový zápis Heureka kliků"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="clicker", password="pass123")
+        self.gpu = GraphicsCards.objects.create(
+            name="Buffered GPU", manufacturer="AMD", price=12000
+        )
+        self.buffer = HeurekaClickBuffer(batch_size=50, autostart=False)
+
+    def _track(self, payload):
+        with mock.patch("viewer.views.get_click_buffer", return_value=self.buffer):
+            return self.client.post(
+                "/track-heureka-click/",
+                data=json.dumps(payload),
+                content_type="application/json",
+            )
+
+    def test_clicks_are_written_in_one_batch(self):
+        """Kliky se zapíšou až při flush, jedním bulk_create"""
+        self.client.force_login(self.user)
+        for _ in range(120):
+            response = self._track(
+                {
+                    "component_type": "graphics_card",
+                    "component_id": self.gpu.id,
+                    "search_query": "AMD Buffered GPU",
+                }
+            )
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(HeurekaClick.objects.count(), 0)
+        self.assertEqual(self.buffer.flush(), 120)
+
+        click = HeurekaClick.objects.first()
+        self.assertEqual(HeurekaClick.objects.count(), 120)
+        self.assertEqual(click.component_name, "Buffered GPU")
+        self.assertEqual(click.user, self.user)
+
+    def test_invalid_and_unknown_clicks(self):
+        """Nevalidní data se odmítnou, neexistující komponenty se zahodí"""
+        response = self._track({"component_type": "toaster", "component_id": 1})
+        self.assertEqual(response.status_code, 400)
+
+        response = self._track({"component_type": "ram", "component_id": 999})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_click_time_is_kept(self):
+        """Zapsaný čas odpovídá kliknutí, ne flush"""
+        clicked_at = timezone.now() - timedelta(minutes=5)
+        self.buffer.add(
+            {
+                "component_type": "graphics_card",
+                "component_id": self.gpu.id,
+                "search_query": "",
+                "user_id": None,
+                "session_key": "",
+                "timestamp": clicked_at,
+            }
+        )
+        self.buffer.flush()
+
+        self.assertEqual(HeurekaClick.objects.get().timestamp, clicked_at)
+
+    def test_full_buffer_pushes_back(self):
+        """Plný buffer vrací 503 místo blokování requestu"""
+        self.buffer = HeurekaClickBuffer(max_size=1, put_timeout=0, autostart=False)
+        payload = {"component_type": "graphics_card", "component_id": self.gpu.id}
+
+        self.assertEqual(self._track(payload).status_code, 200)
+        response = self._track(payload)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+
+class ClickAnalyticsServiceTest(TestCase):
+    """Testy pro hodinové souhrny kliků a retenci"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="analyst", password="pass123")
+        self.hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+
+    def _click(self, component_id=1, user=None, query="AMD", minutes_ago=70, pk=None):
+        return HeurekaClick.objects.create(
+            id=pk,
+            component_type="processor",
+            component_id=component_id,
+            component_name=f"CPU {component_id}",
+            search_query=query,
+            user=user,
+            timestamp=self.hour - timedelta(minutes=minutes_ago),
+        )
+
+    def _rollup(self):
+        """Rollup až po SETTLE_DELAY od běhu, který viděl aktuální kliky"""
+        ClickAnalyticsService.rollup()
+        RollupCheckpoint.objects.filter(name__endswith=":horizon").update(
+            date_updated=timezone.now() - timedelta(minutes=5)
+        )
+        return ClickAnalyticsService.rollup()
+
+    def test_rollup_is_incremental(self):
+        """Opakovaný rollup připočítá jen nové kliky"""
+        self._click()
+        self._click(user=self.user)
+        self._rollup()
+
+        self._click()
+        self._click(component_id=2, query="Intel")
+        self._rollup()
+        self._rollup()
+
+        anonymous = HeurekaClickHourly.objects.get(
+            component_id=1, user_type="anonymous"
+        )
+        registered = HeurekaClickHourly.objects.get(
+            component_id=1, user_type="registered"
+        )
+        self.assertEqual(anonymous.clicks, 2)
+        self.assertEqual(registered.clicks, 1)
+        self.assertEqual(anonymous.hour, self.hour - timedelta(hours=2))
+        self.assertEqual(HeurekaQueryHourly.objects.get(search_query="AMD").clicks, 3)
+
+    def test_late_committed_lower_ids_are_not_skipped(self):
+        """Klik s nižším ID commitnutý až po běhu rollupu se nepřeskočí"""
+        self._click(pk=100)
+        self.assertEqual(ClickAnalyticsService.rollup()["clicks"], 0)
+
+        # Nižší ID transakce, která byla během běhu ještě otevřená
+        self._click(pk=50)
+        RollupCheckpoint.objects.filter(name__endswith=":horizon").update(
+            date_updated=timezone.now() - timedelta(minutes=5)
+        )
+
+        self.assertEqual(ClickAnalyticsService.rollup()["clicks"], 2)
+
+    def test_prune_keeps_recent_and_unprocessed_clicks(self):
+        """Retence maže jen staré kliky, které už jsou v souhrnech"""
+        old = self._click(minutes_ago=60 * 24 * 100)
+        self._rollup()
+        recent = self._click()
+        unprocessed = self._click(minutes_ago=60 * 24 * 100)
+
+        archive = io.StringIO()
+        deleted = ClickAnalyticsService.prune_raw_clicks(
+            days=90, batch_size=1, archive=archive
+        )
+
+        self.assertEqual(deleted, 1)
+        self.assertFalse(HeurekaClick.objects.filter(pk=old.pk).exists())
+        self.assertEqual(
+            set(HeurekaClick.objects.values_list("pk", flat=True)),
+            {recent.pk, unprocessed.pk},
+        )
+        self.assertEqual(json.loads(archive.getvalue())["id"], old.pk)
+
+    def test_admin_dashboard_reads_rollups(self):
+        """Admin přehled se vykreslí ze souhrnů"""
+        self._click(user=self.user)
+        self._rollup()
+        HeurekaClick.objects.all().delete()
+
+        admin_user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="pass123"
+        )
+        self.client.force_login(admin_user)
+        response = self.client.get(
+            "/admin/viewer/heurekaclickhourly/dashboard/?days=7"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["dashboard"]["total_clicks"], 1)
+        self.assertContains(response, "CPU 1")
+
+
+class PriceChangeServiceTest(TestCase):
+    """Testy pro detekci změn cen a upozornění sledujících"""
+
+    def setUp(self):
+        self.gpu = GraphicsCards.objects.create(
+            name="Watched GPU", manufacturer="NVIDIA", price=20000
+        )
+        self.watchers = [
+            User.objects.create_user(username=f"watcher{i}", password="pass123")
+            for i in range(5)
+        ]
+        for i, user in enumerate(self.watchers):
+            UserFavorites.objects.create(
+                user=user,
+                component_type="graphics_card",
+                graphics_card=self.gpu,
+                watch_price_changes=i > 0,
+            )
+        # První průchod jen zapamatuje výchozí ceny
+        PriceChangeService.detect()
+
+    def _snapshot(self, price):
+        PriceSnapshot.objects.create(
+            component_type="graphics_card",
+            component_id=self.gpu.id,
+            min_price=price,
+            avg_price=price,
+            max_price=price,
+            shop_count=3,
+        )
+
+    def test_snapshot_change_notifies_watchers_in_chunks(self):
+        """Nová cena ze snímku vytvoří aktivity jen pro sledující"""
+        self._snapshot(18000)
+
+        stats = PriceChangeService.detect(chunk_size=2)
+
+        self.assertEqual(stats["changes"], 1)
+        self.assertEqual(stats["activities"], 4)
+        activity = FavoriteActivity.objects.filter(activity_type="price_change").first()
+        self.assertEqual(activity.old_value, "20 000 Kč")
+        self.assertEqual(activity.new_value, "18 000 Kč")
+        self.assertIn("klesla", activity.title)
+
+        # Stejný snímek se podruhé nezpracuje
+        self.assertEqual(PriceChangeService.detect()["activities"], 0)
+
+    def test_admin_price_edit_is_detected(self):
+        """Úprava ceny v katalogu se bere jako nová cena"""
+        GraphicsCards.objects.filter(pk=self.gpu.pk).update(price=23000)
+
+        stats = PriceChangeService.detect()
+
+        self.assertEqual(stats["activities"], 4)
+        self.assertIn("vzrostla", FavoriteActivity.objects.first().title)
+
+    def test_threshold_suppresses_noise(self):
+        """Změny pod prahem komponenty se neoznamují, ale sčítají"""
+        ComponentPriceState.objects.filter(component_id=self.gpu.id).update(
+            threshold_percent=5
+        )
+
+        self._snapshot(19500)
+        stats = PriceChangeService.detect()
+        self.assertEqual(stats["suppressed"], 1)
+        self.assertFalse(FavoriteActivity.objects.exists())
+
+        self._snapshot(18900)
+        self.assertEqual(PriceChangeService.detect()["activities"], 4)
+        self.assertEqual(
+            ComponentPriceState.objects.get(component_id=self.gpu.id).last_price,
+            18900,
+        )
+
+
+class FavoriteActivityFanoutTest(TestCase):
+    """Testy pro rozesílání aktivit nových recenzí sledujícím"""
+
+    def setUp(self):
+        cache.clear()
+        self.queue = get_review_fanout_queue()
+        self.queue.flush()
+        self.gpu = GraphicsCards.objects.create(
+            name="Fan GPU", manufacturer="AMD", price=14000
+        )
+        self.author = User.objects.create_user(username="writer", password="pass123")
+        self.watchers = [
+            User.objects.create_user(username=f"fan{i}", password="pass123")
+            for i in range(4)
+        ]
+        for i, user in enumerate(self.watchers + [self.author]):
+            UserFavorites.objects.create(
+                user=user,
+                component_type="graphics_card",
+                graphics_card=self.gpu,
+                watch_reviews=i != 0,
+            )
+
+    def _publish(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_review(
+                self.author, self.gpu, title="Nová recenze", rating=5, **kwargs
+            )
+
+    @override_settings(REVIEW_FANOUT={"chunk_size": 2})
+    def test_publish_fans_out_in_background(self):
+        """Publikace jen zařadí recenzi do fronty, aktivity zapíše flush"""
+        review = self._publish()
+
+        self.assertEqual(self.queue.pending(), 1)
+        self.assertFalse(FavoriteActivity.objects.exists())
+
+        # Jeden dotaz na sledující, zápis po dávkách
+        self.assertEqual(self.queue.flush(), 3)
+        activities = FavoriteActivity.objects.filter(related_review=review)
+        self.assertEqual(
+            {a.favorite.user for a in activities}, set(self.watchers[1:])
+        )
+        self.assertEqual(activities[0].title, "Nová recenze: Fan GPU")
+
+        # Opakované rozeslání nic nezdvojí
+        self.assertEqual(FavoriteActivityService.fan_out(review.pk), 0)
+
+    def test_duplicate_review_activity_is_rejected(self):
+        """Databáze nedovolí druhou aktivitu stejné recenze pro oblíbenou"""
+        review = self._publish()
+        self.queue.flush()
+        activity = FavoriteActivity.objects.filter(related_review=review).first()
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            FavoriteActivity.objects.create(
+                favorite=activity.favorite,
+                activity_type="new_review",
+                related_review=review,
+                title="Znovu",
+            )
+        # Aktivity bez recenze (změny cen) se opakovat mohou
+        for _ in range(2):
+            FavoriteActivity.objects.create(
+                favorite=activity.favorite, activity_type="price_change", title="Cena"
+            )
+
+    def test_only_publishing_queues_review(self):
+        """Nepublikovaná recenze se rozešle až při publikaci"""
+        review = self._publish(is_published=False)
+        self.assertEqual(self.queue.pending(), 0)
+
+        review = Reviews.objects.get(pk=review.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            review.helpful_votes = 1
+            review.save(update_fields=["helpful_votes"])
+        self.assertEqual(self.queue.pending(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review.is_published = True
+            review.save()
+        self.assertEqual(self.queue.flush(), 3)
+
+    @override_settings(REVIEW_FANOUT={"popular_threshold": 2})
+    def test_popular_component_fans_out_on_read(self):
+        """U populární komponenty se aktivity nezapisují, doplní se při čtení"""
+        review = self._publish()
+
+        self.assertEqual(self.queue.flush(), 0)
+        self.assertFalse(FavoriteActivity.objects.exists())
+
+        activities = FavoriteActivityService.get_recent_activities(self.watchers[1])
+        self.assertEqual(len(activities), 1)
+        self.assertEqual(activities[0].related_review, review)
+        self.assertEqual(activities[0].title, "Nová recenze: Fan GPU")
+
+        # Autor ani uživatel bez sledování recenzí aktivitu nedostane
+        self.assertEqual(FavoriteActivityService.get_recent_activities(self.author), [])
+        self.assertEqual(
+            FavoriteActivityService.get_recent_activities(self.watchers[0]), []
+        )
+
+    @override_settings(REVIEW_FANOUT={"popular_threshold": 2})
+    def test_activities_built_on_read_can_be_marked_read(self):
+        """Aktivity skládané při čtení zmizí z nepřečtených po označení všech"""
+        self._publish()
+        watcher = self.watchers[1]
+        self.assertFalse(
+            FavoriteActivityService.get_recent_activities(watcher)[0].is_read
+        )
+
+        FavoriteActivityService.mark_read(watcher.pk)
+
+        self.assertTrue(
+            FavoriteActivityService.get_recent_activities(watcher)[0].is_read
+        )
+        self.client.force_login(watcher)
+        response = self.client.get("/favorites/")
+        self.assertEqual(response.context["recent_activities_count"], 0)
+
+        # Novější recenze je opět nepřečtená
+        self._publish()
+        self.assertEqual(
+            [a.is_read for a in FavoriteActivityService.get_recent_activities(watcher)],
+            [False, True],
+        )
+
+
+class UnreadActivityCounterTest(TestCase):
+    """Testy pro počítadlo nepřečtených aktivit v navigaci"""
+
+    def setUp(self):
+        cache.clear()
+        get_review_fanout_queue().flush()
+        self.user = User.objects.create_user(username="reader", password="pass123")
+        self.author = User.objects.create_user(username="writer", password="pass123")
+        self.gpus = [
+            GraphicsCards.objects.create(name=f"GPU {i}", manufacturer="AMD", price=1)
+            for i in range(3)
+        ]
+        self.favorites = [
+            UserFavorites.objects.create(
+                user=self.user, component_type="graphics_card", graphics_card=gpu
+            )
+            for gpu in self.gpus
+        ]
+
+    def _publish(self, gpu):
+        review = create_review(self.author, gpu)
+        with self.captureOnCommitCallbacks(execute=True):
+            FavoriteActivityService.fan_out(review.pk)
+
+    def test_counter_follows_fan_out_and_mark_read(self):
+        """Rozeslání počítadlo zvýší, přečtení a odebrání oblíbené sníží"""
+        self._publish(self.gpus[0])
+        self.assertEqual(FavoriteActivityService.get_unread_count(self.user.pk), 1)
+
+        for gpu in self.gpus:
+            self._publish(gpu)
+        with self.assertNumQueries(0):
+            self.assertEqual(FavoriteActivityService.get_unread_count(self.user.pk), 4)
+        self.assertEqual(self.user.unread_activity_counter.unread_count, 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.favorites[2].delete()
+        self.assertEqual(FavoriteActivityService.get_unread_count(self.user.pk), 3)
+
+        first = FavoriteActivity.objects.filter(favorite=self.favorites[0]).first()
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/favorites/activities/read/", {"activity_id": first.pk})
+        self.assertEqual(FavoriteActivityService.get_unread_count(self.user.pk), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/favorites/activities/read/", HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+            )
+        self.assertEqual(response.json()["marked"], 2)
+        self.assertEqual(FavoriteActivityService.get_unread_count(self.user.pk), 0)
+        self.user.unread_activity_counter.refresh_from_db()
+        self.assertEqual(self.user.unread_activity_counter.unread_count, 0)
+        self.assertFalse(FavoriteActivity.objects.filter(is_read=False).exists())
+
+    def test_deleted_review_is_discounted(self):
+        """Smazání recenze odečte její nepřečtené aktivity i z cache"""
+        self._publish(self.gpus[0])
+        self._publish(self.gpus[1])
+        self.assertEqual(FavoriteActivityService.get_unread_count(self.user.pk), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Reviews.objects.filter(graphics_card=self.gpus[0]).get().delete()
+        self.assertEqual(FavoriteActivityService.get_unread_count(self.user.pk), 1)
+        self.user.unread_activity_counter.refresh_from_db()
+        self.assertEqual(self.user.unread_activity_counter.unread_count, 1)
+
+    def test_first_read_seeds_counter_without_losing_increments(self):
+        """Počítadlo vznikne před spočítáním, pozdější přírůstky se připočtou"""
+        self._publish(self.gpus[0])
+        UnreadActivityCounter.objects.filter(user=self.user).delete()
+        cache.clear()
+
+        self.assertEqual(FavoriteActivityService.get_unread_count(self.user.pk), 1)
+        self._publish(self.gpus[1])
+        cache.clear()
+        self.assertEqual(FavoriteActivityService.get_unread_count(self.user.pk), 2)
+
+    def test_write_during_cache_fill_is_not_lost(self):
+        """Přírůstek zapsaný mezi čtením sloupce a uložením do cache se neztratí"""
+        self._publish(self.gpus[0])
+        FavoriteActivityService.get_unread_count(self.user.pk)
+        cache.clear()
+        stored = FavoriteActivityService._stored_unread
+        reads = []
+
+        def read_then_write(user_id):
+            reads.append(user_id)
+            count = stored(user_id)
+            if len(reads) == 1:
+                # Souběžné rozeslání commitne, cache ještě nic nemá
+                self._publish(self.gpus[1])
+            return count
+
+        with mock.patch.object(
+            FavoriteActivityService, "_stored_unread", side_effect=read_then_write
+        ):
+            self.assertEqual(FavoriteActivityService.get_unread_count(self.user.pk), 1)
+        self.assertEqual(FavoriteActivityService.get_unread_count(self.user.pk), 2)
+
+    def test_recount_repairs_counter(self):
+        """Přepočet srovná počítadlo s aktivitami a zahodí starou cache"""
+        self._publish(self.gpus[0])
+        FavoriteActivityService.get_unread_count(self.user.pk)
+        UnreadActivityCounter.objects.filter(user=self.user).update(unread_count=7)
+
+        call_command("recount_unread_activities", stdout=io.StringIO())
+        self.assertEqual(FavoriteActivityService.get_unread_count(self.user.pk), 1)
+
+    def test_badge_from_cache(self):
+        """Odznak v navigaci nečte databázi, když je počet v cache"""
+        self._publish(self.gpus[0])
+        self.client.force_login(self.user)
+        self.client.get("/compare/")
+
+        with mock.patch.object(
+            UnreadActivityCounter.objects, "filter", side_effect=AssertionError
+        ):
+            response = self.client.get("/compare/")
+        self.assertEqual(response.context["unread_activities"], 1)
+        self.assertContains(response, "Aktivity oblíbených komponent")
+
+
+def create_review(author, component=None, **kwargs):
+    """Recenze komponenty (bez ní nové grafické karty), kwargs přepíší pole"""
+    if component is None:
+        component = GraphicsCards.objects.create(
+            name="Voted GPU", manufacturer="AMD", price=1
+        )
+    component_type = next(
+        component_type
+        for component_type, model in COMPONENT_TYPE_MODELS.items()
+        if isinstance(component, model)
+    )
+    fields = {
+        "title": "Recenze",
+        "reviewer_name": "Autor",
+        "content": "Obsah",
+        "summary": "Shrnutí",
+        "rating": 4,
+        **kwargs,
+    }
+    return Reviews.objects.create(
+        author=author,
+        component_type=component_type,
+        **{component_type: component},
+        **fields,
+    )
+
+
+@override_settings(ACTIVITY_DIGEST={"batch_size": 2, "chunk_size": 3, "max_items": 3})
+class ActivityDigestTest(TestCase):
+    """Testy pro denní e-mailový souhrn aktivit"""
+
+    def setUp(self):
+        self.gpu = GraphicsCards.objects.create(name="RX 7800", manufacturer="AMD")
+        self.users = [
+            User.objects.create_user(
+                username=f"fan{i}", email=f"fan{i}@example.com", password="pass123"
+            )
+            for i in range(3)
+        ]
+        self.favorites = [
+            UserFavorites.objects.create(
+                user=user, component_type="graphics_card", graphics_card=self.gpu
+            )
+            for user in self.users
+        ]
+
+    def _add_activities(self, favorite, count):
+        FavoriteActivity.objects.bulk_create(
+            FavoriteActivity(
+                favorite=favorite, activity_type="price_change", title=f"Změna ceny {i}"
+            )
+            for i in range(count)
+        )
+
+    def test_one_email_per_user_and_no_resend(self):
+        """Každý uživatel dostane jeden e-mail a odeslané aktivity se neopakují"""
+        self._add_activities(self.favorites[0], 5)
+        self._add_activities(self.favorites[1], 1)
+        self._add_activities(self.favorites[2], 2)
+        FavoriteActivity.objects.filter(favorite=self.favorites[2]).update(is_read=True)
+
+        stats = ActivityDigestService.send_digests()
+
+        self.assertEqual(stats["emails"], 2)
+        self.assertEqual(stats["activities"], 6)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ["fan0@example.com", "fan1@example.com"],
+        )
+        digest = next(m for m in mail.outbox if m.to == ["fan0@example.com"])
+        self.assertIn("(5)", digest.subject)
+        self.assertIn("a 2 dalších", digest.body)
+        self.assertIn("/favorites/", digest.body)
+
+        mail.outbox.clear()
+        self.assertEqual(ActivityDigestService.send_digests()["emails"], 0)
+
+        self._add_activities(self.favorites[1], 1)
+        ActivityDigestService.send_digests()
+        self.assertEqual([m.to for m in mail.outbox], [["fan1@example.com"]])
+        self.assertIn("(1)", mail.outbox[0].subject)
+
+    def test_failed_batch_is_retried(self):
+        """Neodeslaná dávka se pošle při dalším spuštění"""
+        self._add_activities(self.favorites[0], 1)
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=OSError,
+        ):
+            stats = ActivityDigestService.send_digests()
+        self.assertEqual((stats["emails"], stats["failed"]), (0, 1))
+        self.assertFalse(ActivityDigest.objects.exists())
+
+        self.assertEqual(ActivityDigestService.send_digests()["emails"], 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class VoteServiceTest(TestCase):
+    """Testy pro hlasování o užitečnosti recenzí"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", password="pass123")
+        self.voter = User.objects.create_user(username="voter", password="pass123")
+        self.review = create_review(self.author)
+
+    def _vote(self, is_helpful):
+        self.client.force_login(self.voter)
+        return self.client.post(
+            "/reviews/vote/",
+            data=json.dumps({"review_id": self.review.id, "is_helpful": is_helpful}),
+            content_type="application/json",
+        ).json()
+
+    def test_add_change_and_remove_vote(self):
+        """Přidání, změna a zrušení hlasu upraví počítadla"""
+        data = self._vote(True)
+        self.assertEqual((data["helpful_votes"], data["total_votes"]), (1, 1))
+        self.assertEqual(data["message"], "Děkujeme za váš hlas!")
+
+        data = self._vote(False)
+        self.assertEqual((data["helpful_votes"], data["unhelpful_votes"]), (0, 1))
+        self.assertFalse(data["user_vote"])
+
+        data = self._vote(False)
+        self.assertEqual(data["total_votes"], 0)
+        self.assertIsNone(data["user_vote"])
+        self.assertFalse(ReviewVotes.objects.exists())
+
+    def test_user_vote_map_matches_database(self):
+        """Mapa hlasů uživatele v cache odpovídá hlasům v databázi"""
+        reviews = [self.review] + [create_review(self.author) for _ in range(6)]
+        ids = [review.pk for review in reviews]
+        VoteService.cast_vote(reviews[1], self.voter, False)
+        VoteService.get_user_votes(self.voter.pk, ids)
+
+        rng = random.Random(7)
+        for _ in range(40):
+            with self.captureOnCommitCallbacks(execute=True):
+                VoteService.cast_vote(
+                    rng.choice(reviews), self.voter, rng.random() < 0.5
+                )
+
+            with self.assertNumQueries(0):
+                cached = VoteService.get_user_votes(self.voter.pk, ids + [999999])
+            self.assertEqual(
+                cached,
+                dict(
+                    ReviewVotes.objects.filter(user=self.voter).values_list(
+                        "review_id", "is_helpful"
+                    )
+                ),
+            )
+
+        self.client.force_login(self.voter)
+        response = self.client.get(
+            "/get-user-votes/", {"review_ids": ",".join(map(str, ids))}
+        )
+        self.assertEqual(
+            response.json()["votes"], {str(k): v for k, v in cached.items()}
+        )
+
+    def test_concurrent_vote_map_update_drops_map(self):
+        """Souběžná úprava mapy ji zneplatní, další čtení ji načte z DB"""
+        VoteService.get_user_votes(self.voter.pk, [self.review.pk])
+        cache.add(VoteService.VOTE_MAP_LOCK_KEY.format(user_id=self.voter.pk), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            VoteService.cast_vote(self.review, self.voter, True)
+
+        with self.assertNumQueries(1):
+            votes = VoteService.get_user_votes(self.voter.pk, [self.review.pk])
+        self.assertEqual(votes, {self.review.pk: True})
+
+    def test_vote_during_map_load_is_not_lost(self):
+        """Mapa načtená z DB před commitem hlasu se neuloží jako platná"""
+        query_vote_map = VoteService._query_vote_map
+
+        def load_then_vote(user_id):
+            packed = query_vote_map(user_id)
+            # Hlas se commitne mezi dotazem čtenáře a uložením mapy do cache
+            with self.captureOnCommitCallbacks(execute=True):
+                VoteService.cast_vote(self.review, self.voter, True)
+            return packed
+
+        with mock.patch.object(
+            VoteService, "_query_vote_map", side_effect=load_then_vote
+        ):
+            stale = VoteService.get_user_votes(self.voter.pk, [self.review.pk])
+
+        self.assertEqual(stale, {})
+        self.assertEqual(
+            VoteService.get_user_votes(self.voter.pk, [self.review.pk]),
+            {self.review.pk: True},
+        )
+
+    def test_vote_updates_helpfulness_score(self):
+        """Hlas přepočítá Wilsonovo skóre ve stejné transakci"""
+        VoteService.cast_vote(self.review, self.voter, True)
+
+        self.review.refresh_from_db()
+        self.assertAlmostEqual(
+            self.review.helpfulness_score, wilson_lower_bound(1, 1)
+        )
+        self.assertLess(wilson_lower_bound(1, 1), wilson_lower_bound(90, 100))
+        self.assertEqual(wilson_lower_bound(0, 0), 0)
+
+    def test_vote_does_not_rewrite_review(self):
+        """Hlas mění jen počítadla, ne datum úpravy recenze"""
+        date_updated = self.review.date_updated
+
+        VoteService.cast_vote(self.review, self.voter, True)
+
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_votes, 1)
+        self.assertEqual(self.review.date_updated, date_updated)
+
+    @override_settings(RATE_LIMITS={"vote": {"rate": "3/m"}})
+    def test_votes_are_rate_limited_without_queries(self):
+        """Hlasování (i přepínání hlasu) je omezené limitem v cache"""
+        for is_helpful in (True, False, True):
+            self.assertTrue(self._vote(is_helpful)["success"])
+
+        # Session + uživatel pro login_required, limit sám dotazy nepřidává
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                "/reviews/vote/",
+                data=json.dumps({"review_id": self.review.id, "is_helpful": True}),
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(response.json()["success"])
+        self.assertIn("Retry-After", response)
+
+
+@override_settings(REVIEW_VOTE_COUNTERS={"mode": "buffered"})
+class BufferedVoteCountersTest(TestCase):
+    """Testy pro dávkový zápis počítadel hlasů"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", password="pass123")
+        self.voters = [
+            User.objects.create_user(username=f"voter{i}", password="pass123")
+            for i in range(4)
+        ]
+        self.review = create_review(self.author)
+        self.buffer = VoteCounterBuffer(autostart=False)
+        patcher = mock.patch(
+            "viewer.buffers.get_vote_counter_buffer", return_value=self.buffer
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _vote(self, user, is_helpful):
+        with self.captureOnCommitCallbacks(execute=True):
+            return VoteService.cast_vote(self.review, user, is_helpful)
+
+    def test_votes_are_flushed_in_batch(self):
+        """Hlasy se zapíšou do recenze až při flush, dávkově pro všechny recenze"""
+        for voter in self.voters[:3]:
+            self._vote(voter, True)
+        result = self._vote(self.voters[3], False)
+
+        # Odpověď už hlas obsahuje, řádek recenze zatím ne
+        self.assertEqual((result["helpful_votes"], result["total_votes"]), (3, 4))
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.total_votes, 0)
+        self.assertEqual(ReviewVotes.objects.count(), 4)
+
+        other = create_review(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            VoteService.cast_vote(other, self.voters[0], True)
+
+        # Převzetí delt, UPDATE počítadel, nové hodnoty, UPDATE skóre,
+        # smazání delt (+ savepoint)
+        with self.assertNumQueries(7):
+            self.assertEqual(self.buffer.flush(), 2)
+
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.helpful_votes, self.review.total_votes), (3, 4))
+        self.assertAlmostEqual(
+            self.review.helpfulness_score, wilson_lower_bound(3, 4)
+        )
+        self.assertEqual(VoteCounterBuffer.get_pending([self.review.pk]), {})
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_any_process_flushes_each_delta_once(self):
+        """Delty jsou v databázi - zapíše je i jiný proces, a to jen jednou"""
+        self._vote(self.voters[0], True)
+        self._vote(self.voters[1], True)
+
+        # Jiný proces (po restartu) bez vlastní evidence recenzí
+        other_process = VoteCounterBuffer(batch_size=1, autostart=False)
+        self.assertEqual(other_process.flush(), 2)
+        self.assertEqual(self.buffer.flush(), 0)
+
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.helpful_votes, self.review.total_votes), (2, 2))
+
+    def test_reads_merge_pending_deltas(self):
+        """Stránka recenzí ukazuje i hlasy čekající na zápis"""
+        self._vote(self.voters[0], True)
+        self._vote(self.voters[0], False)
+
+        response = self.client.get("/reviews/")
+
+        review = response.context["reviews"][0]
+        self.assertEqual((review.helpful_votes, review.total_votes), (0, 1))
+
+
+class TrendingServiceTest(TestCase):
+    """Testy pro trendové skóre komponent s časovým útlumem"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="trender", password="pass123")
+        socket = Sockets.objects.create(type="AM5")
+        self.cpu_old = Processors.objects.create(
+            name="Old CPU", manufacturer="AMD", socket=socket
+        )
+        self.cpu_new = Processors.objects.create(
+            name="New CPU", manufacturer="AMD", socket=socket
+        )
+        self.gpu = GraphicsCards.objects.create(name="Trendy GPU", manufacturer="NVIDIA")
+
+    def _click(self, component, component_type="processor", hours_ago=1, pk=None):
+        return HeurekaClick.objects.create(
+            pk=pk,
+            component_type=component_type,
+            component_id=component.id,
+            component_name=component.name,
+            search_query=component.name,
+            timestamp=timezone.now() - timedelta(hours=hours_ago),
+        )
+
+    def _favorite(self, component, hours_ago):
+        favorite = UserFavorites.objects.create(
+            user=self.user, component_type="processor", processor=component
+        )
+        UserFavorites.objects.filter(pk=favorite.pk).update(
+            date_added=timezone.now() - timedelta(hours=hours_ago)
+        )
+
+    def _names(self, entries):
+        return [entry["name"] for entry in entries]
+
+    def _update(self):
+        """Dva běhy po SETTLE_DELAY - první uvidí nové události, druhý je započítá"""
+        stats = {"events": 0, "batches": 0}
+        for _ in range(2):
+            RollupCheckpoint.objects.filter(name__endswith=":horizon").update(
+                date_updated=timezone.now() - timedelta(minutes=5)
+            )
+            for key, value in TrendingService.update().items():
+                stats[key] += value
+        return stats
+
+    def test_recent_events_outrank_old_ones(self):
+        """Čerstvé kliky předběhnou starou oblíbenou (útlum po poločasech)"""
+        # Oblíbená (váha 5) před 10 dny = 5 poločasů -> 5 / 32
+        self._favorite(self.cpu_old, hours_ago=240)
+        self._click(self.cpu_new)
+
+        self._update()
+
+        self.assertEqual(
+            self._names(TrendingService.get_trending("processor")),
+            ["New CPU", "Old CPU"],
+        )
+
+    def test_update_is_incremental(self):
+        """Opakovaný update započítá jen nové události"""
+        self._click(self.cpu_new)
+        self.assertEqual(self._update()["events"], 1)
+        score = TrendingScore.objects.get(component_id=self.cpu_new.id).score
+
+        self.assertEqual(self._update()["events"], 0)
+        self._click(self.cpu_new)
+        self.assertEqual(self._update()["events"], 1)
+
+        self.assertAlmostEqual(
+            TrendingScore.objects.get(component_id=self.cpu_new.id).score,
+            2 * score,
+            places=6,
+        )
+
+    def test_unsettled_events_wait_for_next_update(self):
+        """Události se započítají až během o SETTLE_DELAY později"""
+        self._click(self.cpu_new, hours_ago=0)
+        self.assertEqual(TrendingService.update()["events"], 0)
+        self.assertEqual(TrendingService.update()["events"], 0)
+        self.assertEqual(TrendingService.get_trending(), [])
+
+    def test_late_committed_lower_ids_are_counted(self):
+        """Klik s nižším id zapsaný po běhu (dávkový zápis) se nepřeskočí"""
+        first = self._click(self.cpu_new)
+        self._update()
+        self._click(self.cpu_old, pk=first.pk + 2)
+        RollupCheckpoint.objects.filter(name__endswith=":horizon").update(
+            date_updated=timezone.now() - timedelta(minutes=5)
+        )
+        TrendingService.update()
+        # Dávka, která si id rezervovala dřív, commitne až po běhu
+        self._click(self.gpu, component_type="graphics_card", pk=first.pk + 1)
+
+        self.assertEqual(self._update()["events"], 2)
+        self.assertEqual(TrendingScore.objects.count(), 3)
+
+    def test_later_published_review_is_counted(self):
+        """Recenze publikovaná až po vytvoření se do trendů započítá"""
+        review = create_review(self.user, self.gpu, is_published=False)
+        self._update()
+        self.assertEqual(TrendingService.get_trending(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review.is_published = True
+            review.save()
+        TrendingService.refresh_top()
+        self.assertEqual(self._names(TrendingService.get_trending()), ["Trendy GPU"])
+
+        TrendingService.rebuild()
+        self.assertEqual(self._names(TrendingService.get_trending()), ["Trendy GPU"])
+
+    def test_events_without_backfilled_ref_are_counted(self):
+        """Oblíbené a hlasy bez component_id (před backfillem) se započítají"""
+        self._favorite(self.cpu_old, hours_ago=1)
+        review = create_review(self.user, component=self.gpu)
+        ReviewVotes.objects.create(review=review, user=self.user, is_helpful=True)
+        UserFavorites.objects.update(component_id=None)
+        Reviews.objects.update(component_id=None)
+
+        self.assertEqual(self._update()["events"], 2)
+        self.assertEqual(
+            self._names(TrendingService.get_trending()), ["Old CPU", "Trendy GPU"]
+        )
+
+    def test_concurrent_run_is_skipped(self):
+        """Souběžný běh nic nezapočítá dvakrát - druhý se přeskočí"""
+        self._click(self.cpu_new)
+        with TrendingService._run_lock() as acquired:
+            self.assertTrue(acquired)
+            self.assertEqual(self._update()["events"], 0)
+        self.assertEqual(self._update()["events"], 1)
+
+    def test_rebuild_matches_incremental_update(self):
+        """Přepočet od nuly dá stejné pořadí jako průběžné započítávání"""
+        self._click(self.cpu_new)
+        self._click(self.gpu, component_type="graphics_card", hours_ago=2)
+        self._update()
+        incremental = self._names(TrendingService.get_trending())
+
+        stats = TrendingService.rebuild(batch_size=1)
+
+        self.assertEqual(stats["events"], 2)
+        self.assertEqual(self._names(TrendingService.get_trending()), incremental)
+
+    def test_overall_and_per_type_lists(self):
+        """Celkový žebříček kombinuje typy, filtr typu vrací jen daný typ"""
+        self._click(self.cpu_new)
+        self._click(self.gpu, component_type="graphics_card")
+        self._click(self.gpu, component_type="graphics_card")
+        self._update()
+
+        self.assertEqual(
+            self._names(TrendingService.get_trending()), ["Trendy GPU", "New CPU"]
+        )
+        self.assertEqual(
+            self._names(TrendingService.get_trending("graphics_card")), ["Trendy GPU"]
+        )
+        self.assertEqual(TrendingService.get_trending(limit=1)[0]["type"], "graphics_card")
+
+    def test_api_limit_is_clamped(self):
+        """Záporný nebo příliš velký limit API se omezí na 1 až 50"""
+        self._click(self.cpu_new)
+        self._click(self.gpu, component_type="graphics_card")
+        self._update()
+
+        for limit, expected in (("-1", 1), ("0", 1), ("1000", 2)):
+            response = self.client.get("/components/trending/", {"limit": limit})
+            self.assertEqual(len(response.json()["components"]), expected)
+
+    def test_cached_top_needs_no_queries(self):
+        """Čtení žebříčku je jen čtení z cache"""
+        self._click(self.cpu_new)
+        self._update()
+
+        with self.assertNumQueries(0):
+            TrendingService.get_trending()
+            TrendingService.get_trending("processor")
+
+    def test_rebase_keeps_order(self):
+        """Posun základního času přepočítá skóre bez změny pořadí"""
+        self._click(self.cpu_new)
+        self._click(self.gpu, component_type="graphics_card", hours_ago=3)
+        self._update()
+        before = self._names(TrendingService.get_trending())
+
+        # Stejné skóre vůči základu o 70 poločasů staršímu
+        TrendingService._set_base(TrendingService._base() - 70 * 48 * 3600)
+        for score in TrendingScore.objects.all():
+            score.score *= 2**70
+            score.save()
+        self._update()
+
+        self.assertGreater(TrendingService._base(), timezone.now().timestamp() - 60)
+        self.assertEqual(self._names(TrendingService.refresh_top()["overall"]), before)
+
+
+class RecommendationServiceTest(TestCase):
+    """Testy pro doporučení podle společných oblíbených"""
+
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(username=f"fan{i}", password="pass123")
+            for i in range(4)
+        ]
+        socket = Sockets.objects.create(type="AM4")
+        self.cpu_a, self.cpu_b, self.cpu_c = (
+            Processors.objects.create(name=f"CPU {name}", manufacturer="AMD", socket=socket)
+            for name in "ABC"
+        )
+        self.gpu = GraphicsCards.objects.create(name="GPU", manufacturer="AMD")
+
+    def _favorite(self, user, component):
+        if isinstance(component, GraphicsCards):
+            return UserFavorites.objects.create(
+                user=user, component_type="graphics_card", graphics_card=component
+            )
+        return UserFavorites.objects.create(
+            user=user, component_type="processor", processor=component
+        )
+
+    def _names(self, component, component_type="processor"):
+        return [
+            neighbour["name"]
+            for neighbour in RecommendationService.get_recommendations(
+                component_type, component.id
+            )
+        ]
+
+    @override_settings(RECOMMENDATIONS={"min_common": 1})
+    def test_neighbours_ordered_by_cosine_similarity(self):
+        """Sousedé jsou seřazení podle kosinové podobnosti, i napříč typy"""
+        fan1, fan2, fan3, fan4 = self.users
+        for user in (fan1, fan2):
+            self._favorite(user, self.cpu_a)
+            self._favorite(user, self.gpu)
+        for component in (self.cpu_a, self.cpu_b, self.cpu_c):
+            self._favorite(fan3, component)
+        self._favorite(fan4, self.cpu_c)
+
+        RecommendationService.update(full=True)
+
+        # GPU 2/sqrt(3*2), CPU B 1/sqrt(3*1), CPU C 1/sqrt(3*2)
+        self.assertEqual(self._names(self.cpu_a), ["GPU", "CPU B", "CPU C"])
+        neighbour = RecommendationService.get_recommendations(
+            "processor", self.cpu_a.id
+        )[0]
+        self.assertEqual(neighbour["type"], "graphics_card")
+        self.assertAlmostEqual(neighbour["score"], 0.8165, places=4)
+        self.assertEqual(self._names(self.gpu, "graphics_card"), ["CPU A"])
+
+    def test_min_common_filters_single_coincidences(self):
+        """Jediný společný uživatel na doporučení nestačí"""
+        fan1, fan2, fan3, _ = self.users
+        for user in (fan1, fan2):
+            self._favorite(user, self.cpu_a)
+            self._favorite(user, self.gpu)
+        self._favorite(fan3, self.cpu_a)
+        self._favorite(fan3, self.cpu_b)
+
+        RecommendationService.update(full=True)
+
+        self.assertEqual(self._names(self.cpu_a), ["GPU"])
+        self.assertEqual(self._names(self.cpu_b), [])
+
+    def test_favorites_without_backfilled_ref_are_counted(self):
+        """Oblíbené bez doplněného component_id (před backfillem) se počítají"""
+        fan1, fan2, _, _ = self.users
+        for user in (fan1, fan2):
+            self._favorite(user, self.cpu_a)
+            self._favorite(user, self.gpu)
+        UserFavorites.objects.update(component_id=None)
+
+        RecommendationService.update(full=True)
+
+        self.assertEqual(self._names(self.cpu_a), ["GPU"])
+        self.assertEqual(self._names(self.gpu, "graphics_card"), ["CPU A"])
+
+    @override_settings(RECOMMENDATIONS={"min_common": 1, "chunk_size": 1})
+    def test_incremental_update_recomputes_changed_components(self):
+        """Průběžný přepočet zpracuje jen komponenty se změněnými oblíbenými"""
+        fan1, fan2, _, _ = self.users
+        self._favorite(fan1, self.cpu_a)
+        self._favorite(fan1, self.cpu_b)
+        stats = RecommendationService.update(full=True)
+        self.assertEqual((stats["components"], stats["chunks"]), (2, 2))
+
+        self.assertEqual(RecommendationService.update()["components"], 0)
+
+        favorite = self._favorite(fan2, self.gpu)
+        self._favorite(fan2, self.cpu_a)
+        # GPU a CPU A + CPU B, jehož podobnost s CPU A se změnila
+        self.assertEqual(RecommendationService.update()["components"], 3)
+        self.assertEqual(self._names(self.cpu_a), ["CPU B", "GPU"])
+
+        # Odebraná oblíbená zmizí i z doporučení druhé komponenty
+        favorite.delete()
+        self.assertEqual(RecommendationService.update()["components"], 2)
+        self.assertEqual(self._names(self.cpu_a), ["CPU B"])
+        self.assertEqual(self._names(self.gpu, "graphics_card"), [])
+
+    @override_settings(RECOMMENDATIONS={"min_common": 1, "max_basket": 2})
+    def test_large_baskets_are_skipped(self):
+        """Uživatelé s mnoha oblíbenými se do podobnosti nepočítají"""
+        fan1, fan2, _, _ = self.users
+        for component in (self.cpu_a, self.cpu_b, self.cpu_c):
+            self._favorite(fan1, component)
+        self._favorite(fan2, self.cpu_a)
+        self._favorite(fan2, self.gpu)
+
+        RecommendationService.update(full=True)
+
+        self.assertEqual(self._names(self.cpu_a), ["GPU"])
+
+    def test_recommendations_read_with_one_query(self):
+        """Detail čte doporučení jedním dotazem"""
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                RecommendationService.get_recommendations("processor", self.cpu_a.id),
+                [],
+            )
+
+
+# Souběžné testy běží jen proti PostgreSQL (SQLite je přeskočí):
+#   python manage.py test viewer --settings=HWPortal.test_settings_postgres
+# Každé vlákno drží vlastní spojení - počet drž pod max_connections serveru.
+CONCURRENCY_THREADS = int(os.environ.get("CONCURRENCY_TEST_THREADS", 20))
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class VoteServiceConcurrencyTest(TransactionTestCase):
+    """Souběžné hlasování (vyžaduje databázi se zamykáním řádků, např. PostgreSQL)"""
+
+    VOTERS = CONCURRENCY_THREADS
+
+    def test_concurrent_votes_keep_counters_correct(self):
+        author = User.objects.create_user(username="author", password="pass123")
+        review = create_review(author)
+        voters = [
+            User.objects.create_user(username=f"voter{i}", password="pass123")
+            for i in range(self.VOTERS)
+        ]
+        barrier = threading.Barrier(self.VOTERS)
+        errors = []
+
+        def vote(user, is_helpful):
+            try:
+                barrier.wait()
+                VoteService.cast_vote(review, user, is_helpful)
+                # Half of the voters change their mind right away
+                if user.pk % 2:
+                    VoteService.cast_vote(review, user, not is_helpful)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=vote, args=(user, i % 3 == 0))
+            for i, user in enumerate(voters)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        review.refresh_from_db()
+        self.assertEqual(review.total_votes, ReviewVotes.objects.count())
+        self.assertEqual(
+            review.helpful_votes, ReviewVotes.objects.filter(is_helpful=True).count()
+        )
+        self.assertEqual(review.total_votes, self.VOTERS)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class FavoriteServiceConcurrencyTest(TransactionTestCase):
+    """
+    Souběžné přidání stejné oblíbené komponenty (dvojklik, více záložek).
+    Vyžaduje databázi se souběžným zápisem, např. PostgreSQL.
+    """
+
+    THREADS = min(CONCURRENCY_THREADS, 8)
+
+    def test_concurrent_set_creates_one_favorite(self):
+        user = User.objects.create_user(username="fan", password="pass123")
+        gpu = GraphicsCards.objects.create(name="RX 7800", manufacturer="AMD")
+        barrier = threading.Barrier(self.THREADS)
+        results, errors = [], []
+
+        def add():
+            try:
+                barrier.wait()
+                results.append(
+                    FavoriteService.set_favorite(user.pk, "graphics_card", gpu.pk)
+                )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=add) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(UserFavorites.objects.count(), 1)
+        gpu.refresh_from_db()
+        self.assertEqual(gpu.favorites_count, 1)
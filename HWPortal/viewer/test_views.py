@@ -0,0 +1,634 @@
+import io
+import re
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.middleware.csrf import _unmask_cipher_token
+from django.test import Client, TestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .admin import make_published, make_unpublished
+from .models import (FavoriteActivity, GraphicsCards, Processors, Reviews,
+                     Sockets, UserFavorites)
+from .services import FavoriteService, HomeSnapshotService, ReviewService
+from .test_services import create_review
+
+
+class ReviewsViewTest(TestCase):
+    """Testy pro stránku recenzí"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reviewer", password="pass123")
+        socket = Sockets.objects.create(type="AM5")
+        self.cpu = Processors.objects.create(
+            name="Review CPU", manufacturer="AMD", socket=socket, price=8000
+        )
+        self.gpu = GraphicsCards.objects.create(
+            name="Review GPU", manufacturer="AMD", price=14000
+        )
+        for i in range(12):
+            self._review(rating=4 if i % 2 else 2)
+
+    def _review(self, rating=5, component_type="processor", is_published=True):
+        component = {"processor": self.cpu, "graphics_card": self.gpu}[component_type]
+        return create_review(
+            self.user,
+            component,
+            reviewer_name="Tester",
+            rating=rating,
+            is_published=is_published,
+            pros="Rychlý\nTichý",
+        )
+
+    def test_statistics_in_single_query(self):
+        """Statistiky se spočítají jedním GROUP BY dotazem"""
+        self._review(rating=5, component_type="graphics_card")
+        self._review(rating=1, is_published=False)
+
+        with self.assertNumQueries(1):
+            stats = ReviewService.get_site_statistics()
+
+        self.assertEqual(stats["total_reviews"], 13)
+        self.assertAlmostEqual(stats["avg_rating"], 41 / 13)
+        self.assertEqual(stats["categories_count"]["processor"], 12)
+        self.assertEqual(stats["categories_count"]["graphics_card"], 1)
+        self.assertEqual(stats["categories_count"]["ram"], 0)
+
+    def test_reviews_page_query_count(self):
+        """Stránka recenzí má konstantní počet dotazů"""
+        response = self.client.get("/reviews/?category=processor")
+        cursor = response.context["reviews"].next_cursor
+
+        # Dotaz na stránku a komponenty nevykreslených karet (jeden na typ) -
+        # statistiky jsou v cache, keyset nepočítá řádky
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                f"/reviews/?category=processor&cursor={cursor}"
+            )
+
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("OFFSET", queries[0]["sql"].upper())
+        self.assertNotIn("JOIN", queries[1]["sql"].upper())
+
+        # Karty jsou v cache - zbývá jen dotaz na stránku
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f"/reviews/?category=processor&cursor={cursor}")
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["reviews"]), 2)
+        self.assertEqual(response.context["stats"]["total_reviews"], 12)
+
+    def test_keyset_pages_match_full_ordering(self):
+        """Průchod po stránkách dopředu i zpět vrátí recenze ve správném pořadí"""
+        expected = list(
+            Reviews.objects.filter(is_published=True)
+            .order_by("-rating", "-helpfulness_score", "-id")
+            .values_list("id", flat=True)
+        )
+
+        seen, pages, cursor = [], [], None
+        while True:
+            data = self.client.get(
+                "/reviews/json/", {"sort": "best", "limit": 5, "cursor": cursor or ""}
+            ).json()
+            pages.append([row["id"] for row in data["results"]])
+            seen += pages[-1]
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(seen, expected)
+
+        # Zpět z poslední stránky na předposlední
+        data = self.client.get(
+            "/reviews/json/",
+            {"sort": "best", "limit": 5, "cursor": data["previous_cursor"]},
+        ).json()
+        self.assertEqual([row["id"] for row in data["results"]], pages[-2])
+
+    def test_pagination_benchmark_first_and_deep_page(self):
+        """Benchmark stránkování zvládne první i hlubokou stránku"""
+        for page in ("1", "2"):
+            out = io.StringIO()
+            call_command(
+                "benchmark_review_pagination",
+                *("--reviews", "0", "--page", page, "--per-page", "5"),
+                *("--repeat", "1"),
+                stdout=out,
+            )
+            self.assertIn(f"keyset  stránka {page:>5}", out.getvalue())
+
+    def test_helpful_sort_uses_wilson_score(self):
+        """Nejužitečnější recenze řadí podle skóre, ne podle počtu hlasů"""
+        many = self._review(component_type="graphics_card")
+        few = self._review(component_type="graphics_card")
+        Reviews.objects.filter(pk=many.pk).update(helpful_votes=90, total_votes=100)
+        Reviews.objects.filter(pk=few.pk).update(helpful_votes=1, total_votes=1)
+        call_command("recompute_helpfulness_scores", stdout=io.StringIO())
+
+        data = self.client.get(
+            "/reviews/json/", {"sort": "helpful", "category": "graphics_card"}
+        ).json()
+
+        self.assertEqual([r["id"] for r in data["results"]], [many.pk, few.pk])
+
+    def test_invalid_cursor_shows_first_page(self):
+        """Neplatný kurzor vrátí první stránku"""
+        response = self.client.get("/reviews/?cursor=nesmysl")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context["reviews"].has_previous)
+
+    def test_review_cards_are_cached(self):
+        """Karty recenzí se vykreslí jednou a obnoví se po změně recenze"""
+        review = Reviews.objects.filter(component_type="processor").first()
+        self.assertEqual(review.pros_items, ["Rychlý", "Tichý"])
+
+        ReviewService.render_cards([review])
+        Reviews.objects.filter(pk=review.pk).update(title="Změna mimo save")
+        review.refresh_from_db()
+        self.assertNotIn("Změna mimo save", ReviewService.render_cards([review])[0])
+
+        # Nový hlas mění klíč karty
+        Reviews.objects.filter(pk=review.pk).update(helpful_votes=1, total_votes=1)
+        review.refresh_from_db()
+        card = ReviewService.render_cards([review])[0]
+        self.assertIn("Změna mimo save", card)
+        self.assertIn("Užitečné (1)", card)
+
+        review.cons = "Hlučný\n\nDrahý"
+        review.save(update_fields=["cons"])
+        review.refresh_from_db()
+        self.assertEqual(review.cons_items, ["Hlučný", "Drahý"])
+        self.assertIn("Drahý", ReviewService.render_cards([review])[0])
+
+        # Název komponenty je na kartě - přejmenování kartu obnoví
+        self.cpu.name = "Přejmenované CPU"
+        self.cpu.save()
+        review = Reviews.objects.get(pk=review.pk)
+        self.assertIn("Přejmenované CPU", ReviewService.render_cards([review])[0])
+
+    def test_statistics_invalidated_on_changes(self):
+        """Vytvoření, (od)publikování a smazání recenze obnoví statistiky"""
+        ReviewService.get_site_statistics()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review = self._review(component_type="graphics_card")
+        self.assertEqual(ReviewService.get_site_statistics()["total_reviews"], 13)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review.is_published = False
+            review.save(update_fields=["is_published"])
+        self.assertEqual(ReviewService.get_site_statistics()["total_reviews"], 12)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Reviews.objects.filter(component_type="processor").first().delete()
+        self.assertEqual(ReviewService.get_site_statistics()["total_reviews"], 11)
+
+        # Uložení jiných polí statistiky nezahodí
+        review.helpful_votes = 3
+        review.save(update_fields=["helpful_votes"])
+        with self.assertNumQueries(0):
+            ReviewService.get_site_statistics()
+
+
+class RateLimitTest(TestCase):
+    """Testy pro rate limiting zapisovacích endpointů"""
+
+    def setUp(self):
+        cache.clear()
+
+    @modify_settings(MIDDLEWARE={"append": "viewer.ratelimit.RateLimitMiddleware"})
+    @override_settings(
+        RATE_LIMITS={
+            "login": {"rate": "2/m", "key": "ip", "paths": ["/login/"]},
+        }
+    )
+    def test_login_limited_by_middleware(self):
+        """Opakované pokusy o přihlášení z jedné IP se zastaví"""
+        credentials = {"username": "nobody", "password": "wrong"}
+        for _ in range(2):
+            self.assertEqual(self.client.post("/login/", credentials).status_code, 200)
+
+        response = self.client.post("/login/", credentials)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+        # GET formuláře se nepočítá, jiná IP má vlastní limit
+        self.assertEqual(self.client.get("/login/").status_code, 200)
+        response = self.client.post("/login/", credentials, REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(response.status_code, 200)
+
+    @modify_settings(MIDDLEWARE={"append": "viewer.ratelimit.RateLimitMiddleware"})
+    @override_settings(
+        RATE_LIMITS={"login": {"rate": "1/m", "key": "ip", "paths": ["/login/"]}},
+        RATE_LIMIT_CLIENT_IP_HEADER="HTTP_X_FORWARDED_FOR",
+    )
+    def test_clients_behind_proxy_have_own_limits(self):
+        """Za proxy se počítá IP klienta z hlavičky, ne adresa proxy"""
+        credentials = {"username": "nobody", "password": "wrong"}
+        for client_ip in ("203.0.113.1", "203.0.113.2"):
+            response = self.client.post(
+                "/login/", credentials, HTTP_X_FORWARDED_FOR=f"10.0.0.9, {client_ip}"
+            )
+            self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(
+            "/login/", credentials, HTTP_X_FORWARDED_FOR="203.0.113.1"
+        )
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(RATE_LIMITS={"comparison": {"rate": "1/m"}})
+    def test_comparison_limited_by_decorator(self):
+        """Dekorátor vrací pro AJAX JSON odpověď 429"""
+        url = "/compare/add/"
+        self.client.post(url, data="{}", content_type="application/json")
+
+        response = self.client.post(url, data="{}", content_type="application/json")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(response.json()["success"])
+
+
+class ReviewFeedTest(TestCase):
+    """Testy pro feedy nejnovějších recenzí"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="feeder", password="pass123")
+        self.gpu = GraphicsCards.objects.create(
+            name="Feed GPU", manufacturer="AMD", price=14000
+        )
+        self.other_gpu = GraphicsCards.objects.create(
+            name="Other GPU", manufacturer="NVIDIA", price=16000
+        )
+        self.review = self._review("První recenze", self.gpu)
+
+    def _review(self, title, gpu, is_published=True):
+        return create_review(self.user, gpu, title=title, is_published=is_published)
+
+    def test_atom_feed_is_cached_and_conditional(self):
+        """Opakovaný dotaz jde z cache, shodné ETag vrací 304"""
+        self._review("Skrytá recenze", self.gpu, is_published=False)
+
+        response = self.client.get("/reviews/feed/atom/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/atom+xml; charset=utf-8")
+        self.assertContains(response, "První recenze")
+        self.assertNotContains(response, "Skrytá recenze")
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(
+                "/reviews/feed/atom/", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b"")
+
+        not_modified = self.client.get(
+            "/reviews/feed/atom/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_unpublish_changes_last_modified(self):
+        """Po skrytí recenze If-Modified-Since nevrátí starý feed (304)"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._review("Druhá recenze", self.gpu)
+        response = self.client.get("/reviews/feed/json/")
+        hidden = Reviews.objects.get(title="Druhá recenze")
+
+        # Skrytí o sekundy později - zbylé položky jsou starší než předchozí feed
+        with mock.patch(
+            "viewer.services.time.time_ns", return_value=time.time_ns() + 5 * 10**9
+        ), self.captureOnCommitCallbacks(execute=True):
+            hidden.is_published = False
+            hidden.save()
+
+        response = self.client.get(
+            "/reviews/feed/json/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item["title"] for item in response.json()["items"]], ["První recenze"]
+        )
+
+    def test_publish_invalidates_feed(self):
+        """Nová recenze změní ETag, hlasování feed nezneplatní"""
+        etag = self.client.get("/reviews/feed/json/")["ETag"]
+
+        self.review.helpful_votes = 3
+        self.review.save(update_fields=["helpful_votes"])
+        self.assertEqual(self.client.get("/reviews/feed/json/")["ETag"], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._review("Druhá recenze", self.gpu)
+        response = self.client.get("/reviews/feed/json/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item["title"] for item in response.json()["items"]],
+            ["Druhá recenze", "První recenze"],
+        )
+
+    def test_component_feed(self):
+        """Feed komponenty obsahuje jen její recenze"""
+        self._review("Recenze jiné karty", self.other_gpu)
+
+        response = self.client.get(
+            f"/components/graphics_card/{self.gpu.pk}/reviews/feed/json/"
+        )
+        data = response.json()
+        self.assertEqual([item["title"] for item in data["items"]], ["První recenze"])
+        self.assertIn("Feed GPU", data["title"])
+        self.assertTrue(data["items"][0]["url"].startswith("http://testserver/"))
+
+        type_feed = self.client.get("/reviews/feed/graphics_card/json/").json()
+        self.assertEqual(len(type_feed["items"]), 2)
+
+        self.assertEqual(
+            self.client.get("/components/graphics_card/999999/reviews/feed/json/").status_code,
+            404,
+        )
+        self.assertEqual(self.client.get("/reviews/feed/rss/").status_code, 404)
+        self.assertEqual(self.client.get("/reviews/feed/unknown/json/").status_code, 404)
+
+
+class FavoritesPageTest(TestCase):
+    """Testy pro stránku oblíbených komponent"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="fan", password="pass123")
+        self.socket = Sockets.objects.create(type="AM5")
+        self.client.force_login(self.user)
+
+    def _add_favorites(self, count):
+        for i in range(count):
+            cpu = Processors.objects.create(
+                name=f"CPU {i}", manufacturer="AMD", socket=self.socket, price=8000
+            )
+            gpu = GraphicsCards.objects.create(
+                name=f"GPU {i}", manufacturer="AMD", price=14000
+            )
+            UserFavorites.objects.create(
+                user=self.user, component_type="processor", processor=cpu
+            )
+            UserFavorites.objects.create(
+                user=self.user, component_type="graphics_card", graphics_card=gpu
+            )
+            create_review(self.user, cpu)
+
+    def _page_queries(self):
+        # První načtení naplní cache (počítadlo nepřečtených, populární komponenty)
+        self.client.get("/favorites/")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/favorites/")
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_favorites(self):
+        """Počet dotazů nezávisí na počtu oblíbených komponent"""
+        self._add_favorites(2)
+        _, few = self._page_queries()
+
+        self._add_favorites(20)
+        response, many = self._page_queries()
+
+        self.assertEqual(few, many)
+        favorites = response.context["favorites_by_type"]["processor"]
+        self.assertEqual(len(favorites), 22)
+        self.assertTrue(all(f.recent_reviews_count == 1 for f in favorites))
+        self.assertTrue(
+            all(
+                f.recent_reviews_count == 0
+                for f in response.context["favorites_by_type"]["graphics_card"]
+            )
+        )
+
+    def test_toggle_updates_leaderboard(self):
+        """Přidání přes AJAX posune komponentu v žebříčku i v řazení podle oblíbenosti"""
+        cpus = [
+            Processors.objects.create(
+                name=f"CPU {i}", manufacturer="AMD", socket=self.socket, rating=5 - i
+            )
+            for i in range(2)
+        ]
+        self.client.post(
+            "/favorites/toggle/",
+            {"component_type": "processor", "component_id": cpus[1].pk},
+            content_type="application/json",
+        )
+        cpus[1].refresh_from_db()
+        self.assertEqual(cpus[1].favorites_count, 1)
+
+        response = self.client.get("/")
+        top_cpu = response.context["top_components"][0]
+        self.assertEqual((top_cpu["id"], top_cpu["favorites_count"]), (cpus[1].pk, 1))
+
+        response = self.client.get("/components/?category=cpu&sort=popularity")
+        names = [c["name"] for c in response.context["components"]]
+        self.assertEqual(names, ["CPU 1", "CPU 0"])
+
+        self.client.post(
+            "/favorites/toggle/",
+            {"component_type": "processor", "component_id": cpus[1].pk},
+            content_type="application/json",
+        )
+        cpus[1].refresh_from_db()
+        self.assertEqual(cpus[1].favorites_count, 0)
+
+
+class FavoriteApiTest(TestCase):
+    """Testy pro idempotentní PUT / DELETE oblíbené komponenty"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="fan", password="pass123")
+        self.gpu = GraphicsCards.objects.create(name="RX 7800", manufacturer="AMD")
+        self.url = f"/favorites/graphics_card/{self.gpu.pk}/"
+        self.client.force_login(self.user)
+
+    def test_put_and_delete_are_idempotent(self):
+        """Opakovaný PUT / DELETE nemění stav ani počítadlo"""
+        first = self.client.put(self.url).json()
+        second = self.client.put(self.url).json()
+        self.assertEqual((first["is_favorite"], first["changed"]), (True, True))
+        self.assertEqual((second["is_favorite"], second["changed"]), (True, False))
+
+        favorite = UserFavorites.objects.get(user=self.user)
+        self.assertEqual(favorite.component_id, self.gpu.pk)
+        self.assertEqual(favorite.graphics_card_id, self.gpu.pk)
+        self.gpu.refresh_from_db()
+        self.assertEqual(self.gpu.favorites_count, 1)
+
+        FavoriteActivity.objects.create(
+            favorite=favorite, activity_type="price_change", title="Změna ceny"
+        )
+        self.assertTrue(self.client.delete(self.url).json()["changed"])
+        self.assertFalse(self.client.delete(self.url).json()["changed"])
+        self.assertFalse(UserFavorites.objects.exists())
+        self.assertFalse(FavoriteActivity.objects.exists())
+        self.gpu.refresh_from_db()
+        self.assertEqual(self.gpu.favorites_count, 0)
+
+    def test_single_statement_without_loading_component(self):
+        """Zápis je jeden dotaz, komponenta se nenačítá"""
+        with self.assertNumQueries(2):
+            # INSERT ... ON CONFLICT + favorites_count
+            FavoriteService.set_favorite(self.user.pk, "graphics_card", self.gpu.pk)
+        with self.assertNumQueries(2):
+            # INSERT bez vloženého řádku + ověření, že komponenta existuje
+            FavoriteService.set_favorite(self.user.pk, "graphics_card", self.gpu.pk)
+
+    def test_invalid_requests(self):
+        """Neplatný typ a jiné metody než PUT / DELETE"""
+        self.assertEqual(self.client.put("/favorites/gpu/1/").status_code, 400)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    def test_missing_component_is_404(self):
+        """Neexistující komponenta vrátí 404 hned, ne až chybou při commitu"""
+        response = self.client.put(f"/favorites/graphics_card/{self.gpu.pk + 1}/")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(UserFavorites.objects.exists())
+        with self.assertRaises(GraphicsCards.DoesNotExist):
+            FavoriteService.set_favorite(
+                self.user.pk, "graphics_card", self.gpu.pk + 1
+            )
+
+
+class HomeSnapshotTest(TestCase):
+    """Testy pro předpočítaná data domovské stránky"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="author", password="pass123")
+        self.gpu = GraphicsCards.objects.create(
+            name="RX 7800", manufacturer="AMD", rating=4
+        )
+
+    def _publish(self, title):
+        return create_review(self.user, self.gpu, title=title, summary=title)
+
+    def test_home_is_single_cache_read(self):
+        """Domovská stránka z cache bez dotazů do databáze"""
+        self._publish("První")
+        self.client.get("/")
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/")
+        self.assertEqual(response.context["stats"]["gpus_count"], 1)
+        self.assertEqual(response.context["top_components"][0]["name"], "RX 7800")
+        self.assertEqual(
+            [r["component_name"] for r in response.context["latest_reviews"]],
+            ["RX 7800"],
+        )
+
+    def test_publish_refreshes_snapshot(self):
+        """Nová recenze se na domovské stránce objeví hned"""
+        self.client.get("/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self._publish("Nová recenze")
+
+        response = self.client.get("/")
+        self.assertEqual(response.context["stats"]["total_reviews"], 1)
+        self.assertContains(response, "Nová recenze")
+
+    def test_background_refresh_respects_interval(self):
+        """Obnova na pozadí proběhne jednou za interval, vynucená vždy"""
+        HomeSnapshotService.refresh(force=False)
+        self.assertIsNone(HomeSnapshotService.refresh(force=False))
+        self.assertIsNotNone(HomeSnapshotService.refresh())
+
+
+@modify_settings(MIDDLEWARE={"append": "viewer.pagecache.PageCacheMiddleware"})
+class PageCacheTest(TestCase):
+    """Testy pro cache celých stránek pro nepřihlášené"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="author", password="pass123")
+        self.gpu = GraphicsCards.objects.create(name="RX 7800", manufacturer="AMD")
+        self.detail_url = f"/components/graphics_card/{self.gpu.pk}/"
+
+    def _review(self, title):
+        return create_review(self.user, self.gpu, title=title, summary=title)
+
+    def test_anonymous_hit_with_normalized_query(self):
+        """Druhý požadavek se stejnými parametry v jiném pořadí jde z cache"""
+        self._review("První")
+        response = self.client.get("/reviews/?sort=newest&category=&utm_source=x")
+        self.assertEqual(response["X-Page-Cache"], "MISS")
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/reviews/?category=&sort=newest")
+        self.assertEqual(response["X-Page-Cache"], "HIT")
+        self.assertContains(response, "První")
+
+        self.assertEqual(
+            self.client.get("/reviews/?sort=best")["X-Page-Cache"], "MISS"
+        )
+
+    def test_write_invalidates_tagged_pages(self):
+        """Nová recenze zneplatní seznam recenzí i detail komponenty"""
+        self.client.get("/reviews/")
+        self.client.get(self.detail_url)
+        self.client.get("/components/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._review("Nová recenze")
+
+        self.assertContains(self.client.get("/reviews/"), "Nová recenze")
+        self.assertEqual(self.client.get(self.detail_url)["X-Page-Cache"], "MISS")
+        self.assertEqual(self.client.get("/components/")["X-Page-Cache"], "HIT")
+
+    def test_admin_actions_invalidate_pages(self):
+        """Hromadné (od)publikování v administraci zneplatní stránky i domovskou"""
+        review = self._review("Skrytá recenze")
+        self.client.get("/")
+        self.client.get(self.detail_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_unpublished(None, None, Reviews.objects.filter(pk=review.pk))
+        self.assertEqual(self.client.get(self.detail_url)["X-Page-Cache"], "MISS")
+        self.assertNotContains(self.client.get("/"), "Skrytá recenze")
+
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_published(None, None, Reviews.objects.filter(pk=review.pk))
+        self.assertEqual(self.client.get(self.detail_url)["X-Page-Cache"], "MISS")
+        self.assertContains(self.client.get("/"), "Skrytá recenze")
+
+    def test_home_follows_snapshot_refresh(self):
+        """Domovská stránka v cache platí jen do další obnovy snímku"""
+        self.client.get("/")
+        self.assertEqual(self.client.get("/")["X-Page-Cache"], "HIT")
+
+        # Obnova na pozadí (HomeSnapshotRefresher) uloží nový snímek
+        self._review("Nová recenze")
+        HomeSnapshotService.refresh()
+        response = self.client.get("/")
+        self.assertEqual(response["X-Page-Cache"], "MISS")
+        self.assertContains(response, "Nová recenze")
+
+    def test_fresh_csrf_token_per_visitor(self):
+        """Token CSRF se do stránky z cache doplní pro každého návštěvníka"""
+        self.client.get(self.detail_url)
+
+        response = Client().get(self.detail_url)
+        self.assertEqual(response["X-Page-Cache"], "HIT")
+        self.assertNotContains(response, "__page_cache_csrf_token__")
+        self.assertIn("csrftoken", response.cookies)
+        token = re.search(
+            r'name="csrfmiddlewaretoken" value="([A-Za-z0-9]+)"',
+            response.content.decode(),
+        ).group(1)
+        self.assertEqual(_unmask_cipher_token(token), response.cookies["csrftoken"].value)
+
+    def test_logged_in_users_bypass_cache(self):
+        """Přihlášení uživatelé cache nepoužívají"""
+        self.client.get("/reviews/")
+        self.client.force_login(self.user)
+
+        response = self.client.get("/reviews/")
+        self.assertNotIn("X-Page-Cache", response)
@@ -7,12 +7,18 @@ urlpatterns = [
     path("search/", views.search, name="search"),
     # Components
     path("components/", views.components_view, name="components"),
+    path("components/trending/", views.trending_json, name="trending_json"),
     path(
         "components/<str:component_type>/<int:component_id>/",
         views.component_detail_view,
         name="component_detail",
     ),
     # Heureka API
+    path(
+        "heureka-data/summaries/",
+        views.get_heureka_summaries,
+        name="get_heureka_summaries",
+    ),
     path(
         "heureka-data/<str:component_type>/<int:component_id>/",
         views.get_heureka_data,
@@ -26,7 +32,19 @@ urlpatterns = [
     path("track-heureka-click/", views.track_heureka_click, name="track_heureka_click"),
     # Reviews
     path("reviews/", views.reviews_view, name="reviews"),
+    path("reviews/json/", views.reviews_json, name="reviews_json"),
     path("reviews/vote/", views.vote_review_ajax, name="vote_review_ajax"),
+    path("reviews/feed/<str:fmt>/", views.reviews_feed, name="reviews_feed"),
+    path(
+        "reviews/feed/<str:component_type>/<str:fmt>/",
+        views.reviews_feed,
+        name="reviews_type_feed",
+    ),
+    path(
+        "components/<str:component_type>/<int:component_id>/reviews/feed/<str:fmt>/",
+        views.reviews_feed,
+        name="component_reviews_feed",
+    ),
     path("review/create/", views.create_review_view, name="create_review"),
     path(
         "review/create/<str:component_type>/<int:component_id>/",
@@ -47,6 +65,11 @@ urlpatterns = [
     # Favorites
     path("favorites/", views.my_favorites_view, name="my_favorites"),
     path("favorites/toggle/", views.toggle_favorite_ajax, name="toggle_favorite_ajax"),
+    path(
+        "favorites/<str:component_type>/<int:component_id>/",
+        views.favorite_view,
+        name="favorite",
+    ),
     path(
         "favorites/check/<str:component_type>/<int:component_id>/",
         views.check_favorite_status,
@@ -58,6 +81,11 @@ urlpatterns = [
         name="remove_favorite",
     ),
     path("get-user-favorites/", views.get_user_favorites, name="get_user_favorites"),
+    path(
+        "favorites/activities/read/",
+        views.mark_activities_read,
+        name="mark_activities_read",
+    ),
     # Comparison URLs
     path("compare/", views.component_selector_view, name="component_selector"),
     path("compare/view/", views.component_comparison_view, name="component_comparison"),
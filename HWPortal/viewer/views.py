@@ -1,28 +1,39 @@
 import json
 import logging
 import random
-import time
 from datetime import timedelta
 
-from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import SESSION_KEY, authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.paginator import Paginator
-from django.db.models import Avg, Count, Sum
-from django.http import JsonResponse
+from django.db import IntegrityError
+from django.db.models import Avg, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import (require_http_methods, require_POST,
+                                          require_safe)
 
+from .buffers import get_click_buffer
 from .forms import CustomLoginForm, CustomUserCreationForm, ReviewForm
 from .models import (COMPONENT_TYPES, GraphicsCards, Motherboards,
-                     PowerSupplyUnits, Processors, Ram, Reviews, ReviewVotes,
-                     Storage, UserFavorites)
-from .services import (BreadcrumbService, ComponentService, ReviewService,
-                       SearchService)
+                     PowerSupplyUnits, PriceSnapshot, Processors, Ram, Reviews,
+                     ReviewVotes, Storage, UserFavorites)
+from .pagecache import page_cache
+from .pagination import KeysetPaginator
+from .ratelimit import ratelimit
+from .services import (BreadcrumbService, ComponentService,
+                       FavoriteActivityService, FavoriteService, HeurekaService,
+                       HomeSnapshotService, OfferCacheService, ReviewFeedService,
+                       RecommendationService, ReviewService, SearchService,
+                       TrendingService, VoteService)
 
 # ============================================================================
 # CORE VIEWS
@@ -34,118 +45,25 @@ def home(request):
     return render(request, "viewer/home.html")
 
 
+@page_cache("home")
 def home_view(request):
     """Enhanced home view with stats and recommendations"""
-    latest_reviews = (
-        Reviews.objects.filter(is_published=True)
-        .select_related("author")
-        .order_by("-date_created")[:3]
-    )
-
-    top_components = []
-
-    # Helper function to get top component
-    def get_top_component(model_class, component_type, icon, icon_class, fallback_order=None):
-        # Top component by favorites
-        top_component = (
-            model_class.objects.annotate(favorites_count=Count("userfavorites"))
-            .filter(favorites_count__gt=0)
-            .order_by("-favorites_count", "-rating")
-            .first()
-        )
+    # Precomputed in the background (HomeSnapshotService), which drops the
+    # "home" pages whenever it stores a new snapshot
+    return render(request, "viewer/home.html", HomeSnapshotService.get())
 
-        # Fallback to best component by rating or custom order
-        if not top_component:
-            if fallback_order:
-                top_component = (
-                    model_class.objects.filter(rating__gt=0)
-                    .order_by(*fallback_order)
-                    .first()
-                )
-            else:
-                top_component = (
-                    model_class.objects.filter(rating__gt=0)
-                    .order_by("-rating")
-                    .first()
-                )
 
-        if top_component:
-            favorites_count = getattr(top_component, "favorites_count", 0)
-            return {
-                "name": top_component.name,
-                "manufacturer": top_component.manufacturer,
-                "price": top_component.price,
-                "type": component_type,
-                "id": top_component.id,
-                "icon_class": icon_class,
-                "icon": icon,
-                "favorites_count": favorites_count,
-            }
-        return None
-
-    # Top processor by favorites
-    processor_component = get_top_component(
-        Processors,
-        "processor",
-        "cpu",
-        "bg-blue-100 text-blue-600",
-        ["-rating", "-benchresult"]
-    )
-    if processor_component:
-        top_components.append(processor_component)
-
-    # Top graphics card by favorites
-    gpu_component = get_top_component(
-        GraphicsCards,
-        "graphics_card",
-        "monitor",
-        "bg-green-100 text-green-600",
-        ["-rating", "-benchresult"]
-    )
-    if gpu_component:
-        top_components.append(gpu_component)
-
-    # Top motherboard by favorites
-    motherboard_component = get_top_component(
-        Motherboards,
-        "motherboard",
-        "circuit-board",
-        "bg-purple-100 text-purple-600"
-    )
-    if motherboard_component:
-        top_components.append(motherboard_component)
-
-    # Top RAM by favorites
-    ram_component = get_top_component(
-        Ram,
-        "ram",
-        "memory-stick",
-        "bg-orange-100 text-orange-600",
-        ["-rating", "-frequency"]
+@require_safe
+def trending_json(request):
+    """Top trending components overall or of one type (?type=processor)."""
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 10)), 50))
+    except ValueError:
+        limit = 10
+    components = TrendingService.get_trending(
+        request.GET.get("type") or None, limit=limit
     )
-    if ram_component:
-        top_components.append(ram_component)
-
-    stats = {
-        "total_components": sum(
-            model.objects.count()
-            for model in ComponentService.COMPONENT_MODELS.values()
-        ),
-        "total_reviews": Reviews.objects.filter(is_published=True).count(),
-        "processors_count": Processors.objects.count(),
-        "gpus_count": GraphicsCards.objects.count(),
-        "motherboards_count": Motherboards.objects.count(),
-        "ram_count": Ram.objects.count(),
-        "total_favorites": UserFavorites.objects.count(),
-    }
-
-    context = {
-        "latest_reviews": latest_reviews,
-        "top_components": top_components,
-        "stats": stats,
-    }
-
-    return render(request, "viewer/home.html", context)
+    return JsonResponse({"components": components})
 
 
 # ============================================================================
@@ -153,6 +71,7 @@ def home_view(request):
 # ============================================================================
 
 
+@page_cache("catalog")
 def components_view(request):
     """
     Components listing view using ComponentService.
@@ -188,6 +107,15 @@ def components_view(request):
     return render(request, "viewer/components.html", context)
 
 
+def _record_component_view(request, component_type, component_id):
+    OfferCacheService.record_page_view(component_type, component_id)
+
+
+@page_cache(
+    "catalog",
+    "component:{component_type}:{component_id}",
+    on_hit=_record_component_view,
+)
 def component_detail_view(request, component_type, component_id):
     """
     Component detail view using ComponentService and ReviewService.
@@ -205,8 +133,12 @@ def component_detail_view(request, component_type, component_id):
     ):
         return render(request, "404.html")
 
+    # Recent views prioritise the component in the offer refresh job
+    OfferCacheService.record_page_view(component_type, component.id)
+
     # Use ReviewService to get reviews and statistics
     reviews = ReviewService.get_component_reviews(component, component_type, limit=10)
+    VoteService.merge_pending_counters(reviews)
     review_stats = ReviewService.get_review_statistics(component, component_type)
 
     # Update component rating based on reviews
@@ -224,6 +156,11 @@ def component_detail_view(request, component_type, component_id):
     else:
         similar_components = []
 
+    # Precomputed co-favorites (RecommendationService, update_recommendations)
+    also_favorited = RecommendationService.get_recommendations(
+        component_type, component.id, limit=4
+    )
+
     # Use ComponentService to get specs
     specs = ComponentService.get_component_specs(component, component_type)
 
@@ -241,6 +178,7 @@ def component_detail_view(request, component_type, component_id):
         "review_stats": review_stats,
         "rating_distribution": review_stats.get("rating_distribution", {}),
         "similar_components": similar_components,
+        "also_favorited": also_favorited,
         "breadcrumbs": breadcrumbs,
     }
 
@@ -252,6 +190,7 @@ def component_detail_view(request, component_type, component_id):
 # ============================================================================
 
 
+@page_cache("catalog", "reviews")
 def search(request):
     """
     Refactored search view using SearchService.
@@ -328,119 +267,122 @@ def get_component_by_type_and_id(component_type, component_id):
         return None
 
 
-def generate_fake_products(component):
-    """Generate fake products for Heureka"""
-    base_price = (
-        float(component.price) if component.price > 0 else random.randint(1000, 50000)
-    )
-
-    fake_shops = [
-        "Alza.cz",
-        "CZC.cz",
-        "Mall.cz",
-        "Electroworld.cz",
-        "Datart.cz",
-        "TSBohemia.cz",
-        "Smarty.cz",
-        "GIGACOMPUTER.cz",
-        "Počítače.cz",
-        "Mironet.cz",
-    ]
-
-    products = []
-    num_products = random.randint(3, 8)
-
-    for i in range(num_products):
-        price_variation = random.uniform(0.7, 1.3)
-        price = int(base_price * price_variation)
-
-        product_names = [
-            component.name,
-            f"{component.name} - BOX",
-            f"{component.name} (OEM)",
-            f"{component.manufacturer} {component.name}",
-            f"{component.name} + doprava zdarma",
-        ]
-
-        shop = random.choice(fake_shops)
-        product_name = random.choice(product_names)
-
-        availability_options = [
-            {"status": "skladem", "text": "Skladem", "delivery_days": 0},
-            {"status": "skladem", "text": "Skladem", "delivery_days": 1},
-            {"status": "dostupny", "text": "Do 2 dnů", "delivery_days": 2},
-            {"status": "dostupny", "text": "Do týdne", "delivery_days": 7},
-        ]
+def get_heureka_data(request, component_type, component_id):
+    """
+    Heureka offers served from the offer cache.
+    Offers are fetched only by the refresh_offers job; a miss queues the component.
+    """
+    if component_type not in ComponentService.TYPE_DISPLAY_NAMES:
+        return JsonResponse({"error": "Komponenta nenalezena"}, status=404)
 
-        availability = random.choice(availability_options)
-        shop_rating = round(random.uniform(4.0, 4.9), 1)
-        shop_reviews = random.randint(500, 15000)
-        delivery_price = random.choice([0, 99, 149, 199])
+    entry = OfferCacheService.get_offers(component_type, component_id)
 
-        products.append(
+    if entry is None:
+        # Only existing components may enter the refresh queue
+        if not ComponentService.filter_existing([(component_type, component_id)]):
+            return JsonResponse({"error": "Komponenta nenalezena"}, status=404)
+        OfferCacheService.request_refresh([(component_type, component_id)])
+        return JsonResponse(
             {
-                "id": f"fake_{i}_{component.id}",
-                "name": product_name,
-                "price": price,
-                "price_formatted": f"{price:,} Kč".replace(",", " "),
-                "currency": "CZK",
-                "shop_name": shop,
-                "shop_url": f"https://www.{shop.lower().replace('.cz', '')}.cz",
-                "product_url": f"https://www.{shop.lower().replace('.cz', '')}.cz/product/{component.id}",
-                "availability": availability,
-                "shop_rating": shop_rating,
-                "shop_reviews_count": shop_reviews,
-                "delivery_price": delivery_price,
-                "delivery_price_formatted": (
-                    f"{delivery_price} Kč" if delivery_price > 0 else "Zdarma"
-                ),
-                "is_marketplace": random.choice([True, False]),
-                "last_update": timezone.now().strftime("%Y-%m-%d"),
+                "success": True,
+                "pending": True,
+                "products": [],
+                "total_found": 0,
+                "api_status": HeurekaService.api_status(),
             }
         )
 
-    products.sort(key=lambda x: x["price"])
-    return products
-
+    return JsonResponse(
+        {
+            "success": True,
+            "products": entry["products"],
+            "search_query": entry["search_query"],
+            "total_found": len(entry["products"]),
+            "api_status": entry["api_status"],
+            "fetched_at": entry["fetched_at"].isoformat(),
+        }
+    )
 
-def get_heureka_data(request, component_type, component_id):
-    """Main function for getting Heureka data"""
-    try:
-        component = get_component_by_type_and_id(component_type, component_id)
-        if not component:
-            return JsonResponse({"error": "Komponenta nenalezena"}, status=404)
 
-        # Simulate API delay
-        if getattr(settings, "FAKE_API_SETTINGS", {}).get("simulate_delays", True):
-            time.sleep(random.uniform(0.1, 0.5))
+def get_heureka_summaries(request):
+    """
+    Lowest cached offer for many components at once (listing and comparison pages).
+    Expects ?items=processor:1,graphics_card:5; misses are queued for refresh.
+    """
+    items = []
+    for raw_item in request.GET.get("items", "").split(","):
+        component_type, _, component_id = raw_item.strip().partition(":")
+        if (
+            component_type in ComponentService.TYPE_DISPLAY_NAMES
+            and component_id.isdigit()
+        ):
+            items.append((component_type, int(component_id)))
 
-        fake_products = generate_fake_products(component)
+    items = list(dict.fromkeys(items))
 
+    if len(items) > OfferCacheService.MAX_SUMMARY_ITEMS:
         return JsonResponse(
-            {
-                "success": True,
-                "products": fake_products,
-                "search_query": f"{component.manufacturer} {component.name}",
-                "total_found": len(fake_products),
-                "api_status": "fake",
-            }
+            {"error": "Příliš mnoho komponent v jednom požadavku"}, status=400
         )
 
-    except Exception as e:
-        return JsonResponse({"error": f"API Error: {str(e)}"}, status=500)
+    summaries = OfferCacheService.get_summaries(items)
+    missing = [item for item in items if item not in summaries]
+    OfferCacheService.request_refresh(ComponentService.filter_existing(missing))
+
+    return JsonResponse(
+        {
+            "success": True,
+            "results": {f"{t}:{i}": summary for (t, i), summary in summaries.items()},
+            "pending": [f"{t}:{i}" for t, i in missing],
+        }
+    )
 
 
 def get_fake_price_history(request, component_type, component_id):
-    """Fake price history"""
+    """Price history from stored snapshots, fake history until there are any"""
     component = get_component_by_type_and_id(component_type, component_id)
     if not component:
         return JsonResponse({"error": "Komponenta nenalezena"}, status=404)
 
+    daily_snapshots = (
+        PriceSnapshot.objects.filter(
+            component_type=component_type,
+            component_id=component_id,
+            date_recorded__gte=timezone.now() - timedelta(days=30),
+        )
+        .annotate(day=TruncDate("date_recorded"))
+        .values("day")
+        .annotate(
+            min_price=Min("min_price"),
+            avg_price=Avg("avg_price"),
+            max_price=Max("max_price"),
+        )
+        .order_by("day")
+    )
+
+    price_history = [
+        {
+            "date": row["day"].strftime("%Y-%m-%d"),
+            "min_price": int(row["min_price"]),
+            "avg_price": int(row["avg_price"]),
+            "max_price": int(row["max_price"]),
+        }
+        for row in daily_snapshots
+    ]
+
+    if price_history:
+        return JsonResponse(
+            {
+                "success": True,
+                "price_history": price_history,
+                "component_name": component.name,
+            }
+        )
+
     base_price = (
         float(component.price) if component.price > 0 else random.randint(1000, 50000)
     )
 
-    price_history = []
     current_date = timezone.now() - timedelta(days=30)
     current_price = base_price
 
@@ -467,37 +409,55 @@ def get_fake_price_history(request, component_type, component_id):
 
 
 @csrf_exempt
+@ratelimit("heureka_click")
 def track_heureka_click(request):
-    """Tracking Heureka clicks"""
-    if request.method == "POST":
-        try:
-            data = json.loads(request.body)
-            component_type = data.get("component_type")
-            component_id = data.get("component_id")
-            search_query = data.get("search_query")
-
-            component = get_component_by_type_and_id(component_type, component_id)
-            if not component:
-                return JsonResponse({"error": "Component not found"}, status=404)
-
-            # Imports here to avoid circular import
-            from .models import HeurekaClick
-
-            HeurekaClick.objects.create(
-                component_type=component_type,
-                component_id=component_id,
-                component_name=component.name,
-                search_query=search_query,
-                user=request.user if request.user.is_authenticated else None,
-                session_key=request.session.session_key or "",
-            )
+    """
+    Tracking Heureka clicks.
+    Only cheap validation here - clicks are written in batches by HeurekaClickBuffer.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    if not isinstance(data, dict):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    component_type = data.get("component_type")
+    component_id = data.get("component_id")
+    search_query = data.get("search_query") or ""
+
+    if (
+        component_type not in ComponentService.TYPE_DISPLAY_NAMES
+        or not isinstance(component_id, int)
+        or component_id <= 0
+        or not isinstance(search_query, str)
+    ):
+        return JsonResponse({"error": "Invalid click data"}, status=400)
 
-            return JsonResponse({"success": True})
+    # User id straight from the session, without loading the user
+    user_id = request.session.get(SESSION_KEY)
 
-        except Exception as e:
-            return JsonResponse({"error": "Tracking failed"}, status=500)
+    accepted = get_click_buffer().add(
+        {
+            "component_type": component_type,
+            "component_id": component_id,
+            "search_query": search_query[:500],
+            "user_id": int(user_id) if user_id else None,
+            "session_key": request.session.session_key or "",
+            "timestamp": timezone.now(),
+        }
+    )
 
-    return JsonResponse({"error": "Method not allowed"}, status=405)
+    if not accepted:
+        response = JsonResponse({"error": "Tracking overloaded"}, status=503)
+        response["Retry-After"] = "1"
+        return response
+
+    return JsonResponse({"success": True})
 
 
 # ============================================================================
@@ -505,98 +465,26 @@ def track_heureka_click(request):
 # ============================================================================
 
 
+@page_cache("reviews")
 def reviews_view(request):
-    """
-    Reviews listing view - keeping most original logic due to complexity.
-    Could be further refactored into ReviewService if needed.
-    """
+    """Reviews listing view with keyset (cursor) pagination."""
     category_filter = request.GET.get("category", "")
     sort_by = request.GET.get("sort", "newest")
 
-    # Standard query
-    reviews = Reviews.objects.filter(is_published=True).select_related(
-        "author",
-        "processor",
-        "motherboard",
-        "storage",
-        "ram",
-        "graphics_card",
-        "power_supply",
-    )
-
-    if category_filter:
-        reviews = reviews.filter(component_type=category_filter)
-
-    if sort_by == "newest":
-        reviews = reviews.order_by("-date_created")
-    elif sort_by == "oldest":
-        reviews = reviews.order_by("date_created")
-    elif sort_by == "best":
-        reviews = reviews.order_by("-rating", "-helpful_votes")
-    elif sort_by == "worst":
-        reviews = reviews.order_by("-helpful_votes", "-rating")
-    elif sort_by == "helpful":
-        reviews = reviews.order_by("helpful_votes", "-rating")
-    else:
-        reviews = reviews.order_by("-date_created")
-
-    # Pagination
-    paginator = Paginator(reviews, 10)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    reviews, ordering = ReviewService.get_listing(category_filter, sort_by)
 
-    # Statistics
-    stats = {
-        "total_reviews": Reviews.objects.filter(is_published=True).count(),
-        "avg_rating": Reviews.objects.filter(is_published=True).aggregate(
-            Avg("rating")
-        )["rating__avg"]
-        or 0,
-        "categories_count": {
-            "processor": Reviews.objects.filter(
-                is_published=True, component_type="processor"
-            ).count(),
-            "graphics_card": Reviews.objects.filter(
-                is_published=True, component_type="graphics_card"
-            ).count(),
-            "ram": Reviews.objects.filter(
-                is_published=True, component_type="ram"
-            ).count(),
-            "storage": Reviews.objects.filter(
-                is_published=True, component_type="storage"
-            ).count(),
-            "motherboard": Reviews.objects.filter(
-                is_published=True, component_type="motherboard"
-            ).count(),
-            "power_supply": Reviews.objects.filter(
-                is_published=True, component_type="power_supply"
-            ).count(),
-        },
-    }
-
-    # Use ComponentService for icon classes and display names
-    for review in page_obj:
-        review.icon_class = ComponentService.TYPE_CSS_CLASSES.get(
-            review.component_type, "bg-gray-100 text-gray-800"
-        )
-        review.type_display = ComponentService.TYPE_DISPLAY_NAMES.get(
-            review.component_type, review.component_type
-        )
+    # Keyset pagination - deep pages cost the same as the first one
+    page_obj = KeysetPaginator(reviews, ordering, per_page=10).page(
+        request.GET.get("cursor")
+    )
 
-        # Parse pros and cons to list
-        review.pros_list = (
-            [p.strip() for p in review.pros.split("\n") if p.strip()]
-            if review.pros
-            else []
-        )
-        review.cons_list = (
-            [c.strip() for c in review.cons.split("\n") if c.strip()]
-            if review.cons
-            else []
-        )
+    stats = ReviewService.get_site_statistics()
+    VoteService.merge_pending_counters(page_obj)
 
     context = {
         "reviews": page_obj,
+        # Cached HTML cards, rendered only for new or changed reviews
+        "review_cards": ReviewService.render_cards(page_obj),
         "stats": stats,
         "selected_category": category_filter,
         "selected_sort": sort_by,
@@ -621,12 +509,88 @@ def reviews_view(request):
     return render(request, "viewer/reviews.html", context)
 
 
+def reviews_json(request):
+    """JSON variant of the reviews listing, paginated by cursor."""
+    try:
+        per_page = min(max(int(request.GET.get("limit", 20)), 1), 50)
+    except ValueError:
+        per_page = 20
+
+    reviews, ordering = ReviewService.get_listing(
+        request.GET.get("category", ""), request.GET.get("sort", "newest")
+    )
+    page_obj = KeysetPaginator(reviews, ordering, per_page=per_page).page(
+        request.GET.get("cursor")
+    )
+    VoteService.merge_pending_counters(page_obj)
+    ComponentService.load_components(page_obj)
+
+    return JsonResponse(
+        {
+            "results": [
+                {
+                    "id": review.id,
+                    "title": review.title,
+                    "summary": review.summary,
+                    "rating": review.rating,
+                    "reviewer_name": review.reviewer_name,
+                    "component_type": review.component_type,
+                    "component_name": review.component_name,
+                    "helpful_votes": review.helpful_votes,
+                    "total_votes": review.total_votes,
+                    "date_created": review.date_created.isoformat(),
+                }
+                for review in page_obj
+            ],
+            "next_cursor": page_obj.next_cursor,
+            "previous_cursor": page_obj.previous_cursor,
+        }
+    )
+
+
+@require_safe
+def reviews_feed(request, fmt, component_type="", component_id=None):
+    """
+    Atom / JSON feed of the latest published reviews.
+    Served from the cache and answered with 304 when the client already
+    has the current version (ETag / Last-Modified).
+    """
+    feed = ReviewFeedService.get_feed(
+        fmt,
+        request.build_absolute_uri("/").rstrip("/"),
+        component_type,
+        component_id,
+    )
+    if feed is None:
+        raise Http404
+
+    last_modified = int(feed["last_modified"].timestamp())
+    etag = quote_etag(feed["etag"])
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = HttpResponse(feed["body"], content_type=feed["content_type"])
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=ReviewFeedService.MAX_AGE)
+    return response
+
+
+VOTE_MESSAGES = {
+    "added": "Děkujeme za váš hlas!",
+    "changed": "Váš hlas byl změněn",
+    "removed": "Váš hlas byl odstraněn",
+}
+
+
 @login_required(login_url="/login/")
 @require_POST
+@ratelimit("vote")
 def vote_review_ajax(request):
     """
     AJAX endpoint for voting on reviews.
-    Keeping original implementation due to complex business logic.
+    Counters are updated atomically by VoteService.
     """
     try:
         data = json.loads(request.body)
@@ -639,87 +603,19 @@ def vote_review_ajax(request):
         review = get_object_or_404(Reviews, id=review_id, is_published=True)
 
         # Check if user is voting on own review
-        if review.author == request.user:
+        if review.author_id == request.user.id:
             return JsonResponse(
                 {"error": "Nemůžete hlasovat o vlastní recenzi", "success": False},
                 status=403,
             )
 
-        # Check if already voted
-        existing_vote = ReviewVotes.objects.filter(
-            review=review,
-            user=request.user,
-        ).first()
-
-        if existing_vote:
-            # Better logic for changing/removing vote
-            if existing_vote.is_helpful == is_helpful:
-                # Same vote - remove it (toggle off)
-                existing_vote.delete()
-                review.total_votes = max(0, review.total_votes - 1)
-                if is_helpful:
-                    review.helpful_votes = max(0, review.helpful_votes - 1)
-                review.save()
-                message = "Váš hlas byl odstraněn"
-                user_vote = None
-            else:
-                # Different vote - change it
-                old_helpful = existing_vote.is_helpful
-                existing_vote.is_helpful = is_helpful
-                existing_vote.save()
-
-                # Update counters
-                if old_helpful and not is_helpful:
-                    # From helpful to unhelpful
-                    review.helpful_votes = max(0, review.helpful_votes - 1)
-                elif not old_helpful and is_helpful:
-                    # From unhelpful to helpful
-                    review.helpful_votes += 1
-
-                review.save()
-                message = "Váš hlas byl změněn"
-                user_vote = is_helpful
-        else:
-            # Rate limiting check (max 10 votes per hour)
-            recent_votes = ReviewVotes.objects.filter(
-                user=request.user, date_voted__gte=timezone.now() - timedelta(hours=1)
-            ).count()
-
-            if recent_votes >= 10:
-                return JsonResponse(
-                    {
-                        "error": "Příliš mnoho hlasů za krátký čas. Zkuste to později.",
-                        "success": False,
-                    },
-                    status=429,
-                )
-
-            # New vote
-            ReviewVotes.objects.create(
-                review=review,
-                user=request.user,
-                is_helpful=is_helpful,
-            )
-
-            # Update counters
-            review.total_votes += 1
-            if is_helpful:
-                review.helpful_votes += 1
-            review.save()
-            message = "Děkujeme za váš hlas!"
-            user_vote = is_helpful
-
-        # Calculate unhelpful votes
-        unhelpful_votes = review.total_votes - review.helpful_votes
+        result = VoteService.cast_vote(review, request.user, is_helpful)
 
         return JsonResponse(
             {
                 "success": True,
-                "message": message,
-                "helpful_votes": review.helpful_votes,
-                "unhelpful_votes": unhelpful_votes,
-                "total_votes": review.total_votes,
-                "user_vote": user_vote,
+                "message": VOTE_MESSAGES[result.pop("action")],
+                **result,
             }
         )
 
@@ -746,11 +642,7 @@ def get_user_votes(request):
     except ValueError:
         return JsonResponse({"error": "Neplatná ID recenzí"}, status=400)
 
-    votes = ReviewVotes.objects.filter(
-        user=request.user, review_id__in=review_ids
-    ).values("review_id", "is_helpful")
-
-    user_votes = {vote["review_id"]: vote["is_helpful"] for vote in votes}
+    user_votes = VoteService.get_user_votes(request.user.id, review_ids)
 
     return JsonResponse({"votes": user_votes})
 
@@ -1099,10 +991,12 @@ def profile_view(request):
         or 0,
     }
 
-    recent_reviews = user_reviews.order_by("-date_created")[:5]
-    top_reviews = user_reviews.filter(helpful_votes__gt=0).order_by("-helpful_votes")[
-        :5
-    ]
+    recent_reviews = ComponentService.load_components(
+        user_reviews.order_by("-date_created")[:5]
+    )
+    top_reviews = ComponentService.load_components(
+        user_reviews.filter(helpful_votes__gt=0).order_by("-helpful_votes")[:5]
+    )
 
     context = {
         "user_stats": stats,
@@ -1166,6 +1060,15 @@ def change_password_view(request):
     return render(request, "viewer/change_password.html")
 
 
+MY_REVIEWS_SORTS = {
+    "newest": ["-date_created", "-id"],
+    "oldest": ["date_created", "id"],
+    "helpful": ["-helpfulness_score", "-date_created", "-id"],
+    "rating_high": ["-rating", "-date_created", "-id"],
+    "rating_low": ["rating", "-date_created", "-id"],
+}
+
+
 @login_required(login_url="/login/")
 def my_reviews_view(request):
     """User's reviews management view"""
@@ -1176,9 +1079,7 @@ def my_reviews_view(request):
     )  # newest, oldest, helpful, rating_high, rating_low
 
     # Base query - only current user's reviews
-    user_reviews = Reviews.objects.filter(author=request.user).select_related(
-        "processor", "motherboard", "storage", "ram", "graphics_card", "power_supply"
-    )
+    user_reviews = Reviews.objects.filter(author=request.user)
 
     # Apply publication status filter
     if status_filter == "published":
@@ -1187,19 +1088,8 @@ def my_reviews_view(request):
         user_reviews = user_reviews.filter(is_published=False)
     # For "all" no filtering needed
 
-    # Apply sorting
-    if sort_by == "newest":
-        user_reviews = user_reviews.order_by("-date_created")
-    elif sort_by == "oldest":
-        user_reviews = user_reviews.order_by("date_created")
-    elif sort_by == "helpful":
-        user_reviews = user_reviews.order_by("-helpful_votes", "-date_created")
-    elif sort_by == "rating_high":
-        user_reviews = user_reviews.order_by("-rating", "-date_created")
-    elif sort_by == "rating_low":
-        user_reviews = user_reviews.order_by("rating", "-date_created")
-    else:
-        user_reviews = user_reviews.order_by("-date_created")
+    # Sorting (keyset ordering, the id keeps it deterministic)
+    ordering = MY_REVIEWS_SORTS.get(sort_by, MY_REVIEWS_SORTS["newest"])
 
     # Statistics for header
     total_reviews = Reviews.objects.filter(author=request.user).count()
@@ -1217,9 +1107,10 @@ def my_reviews_view(request):
     )
 
     # Pagination
-    paginator = Paginator(user_reviews, 10)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(user_reviews, ordering, per_page=10).page(
+        request.GET.get("cursor")
+    )
+    ComponentService.load_components(page_obj)
 
     context = {
         "reviews": page_obj,
@@ -1245,56 +1136,68 @@ def my_reviews_view(request):
 
 @login_required
 @require_POST
+@ratelimit("favorite")
 def toggle_favorite_ajax(request):
     """AJAX endpoint for adding/removing component from favorites"""
     try:
         data = json.loads(request.body)
         component_type = data.get("component_type")
-        component_id = data.get("component_id")
-
-        if not component_type or not component_id:
-            return JsonResponse({"success": False, "error": "Chybí povinné parametry"})
+        component_id = int(data.get("component_id") or 0)
+    except (ValueError, TypeError):
+        return JsonResponse({"success": False, "error": "Chybí povinné parametry"})
 
-        # Use ComponentService to get component
-        try:
-            component, _ = ComponentService.get_component_by_type_and_id(
-                component_type, component_id
-            )
-        except (ValueError, Exception):
-            return JsonResponse({"success": False, "error": "Neplatný typ komponenty"})
-
-        # Check if already in favorites
-        field_name = component_type
-        filter_kwargs = {
-            "user": request.user,
-            field_name: component,
-            "component_type": component_type,
-        }
+    if not component_type or not component_id:
+        return JsonResponse({"success": False, "error": "Chybí povinné parametry"})
 
-        existing_favorite = UserFavorites.objects.filter(**filter_kwargs).first()
-
-        if existing_favorite:
-            # Remove from favorites
-            existing_favorite.delete()
+    try:
+        if FavoriteService.unset_favorite(request.user.id, component_type, component_id):
             is_favorite = False
-            message = f"{component.name} byl odebrán z oblíbených"
+            message = "Komponenta byla odebrána z oblíbených"
         else:
-            # Add to favorites
-            create_kwargs = {
-                "user": request.user,
-                "component_type": component_type,
-                field_name: component,
-            }
-            UserFavorites.objects.create(**create_kwargs)
+            FavoriteService.set_favorite(request.user.id, component_type, component_id)
             is_favorite = True
-            message = f"{component.name} byl přidán do oblíbených"
+            message = "Komponenta byla přidána do oblíbených"
+    except ValueError:
+        return JsonResponse({"success": False, "error": "Neplatný typ komponenty"})
+    except (ObjectDoesNotExist, IntegrityError):
+        return JsonResponse({"success": False, "error": "Komponenta nenalezena"})
 
+    return JsonResponse({"success": True, "is_favorite": is_favorite, "message": message})
+
+
+@login_required
+@require_http_methods(["PUT", "DELETE"])
+@ratelimit("favorite")
+def favorite_view(request, component_type, component_id):
+    """
+    Idempotent favorite API - PUT adds the component, DELETE removes it.
+    Repeating a request keeps the state and returns changed=False.
+    """
+    try:
+        if request.method == "PUT":
+            changed = FavoriteService.set_favorite(
+                request.user.id, component_type, component_id
+            )
+        else:
+            changed = FavoriteService.unset_favorite(
+                request.user.id, component_type, component_id
+            )
+    except ValueError:
         return JsonResponse(
-            {"success": True, "is_favorite": is_favorite, "message": message}
+            {"success": False, "error": "Neplatný typ komponenty"}, status=400
+        )
+    except (ObjectDoesNotExist, IntegrityError):
+        return JsonResponse(
+            {"success": False, "error": "Komponenta nenalezena"}, status=404
         )
 
-    except Exception as e:
-        return JsonResponse({"success": False, "error": str(e)})
+    return JsonResponse(
+        {
+            "success": True,
+            "is_favorite": request.method == "PUT",
+            "changed": changed,
+        }
+    )
 
 
 @login_required
@@ -1305,13 +1208,10 @@ def check_favorite_status(request, component_type, component_id):
             component_type, component_id
         )
 
-        filter_kwargs = {
-            "user": request.user,
-            component_type: component,
-            "component_type": component_type,
-        }
-
-        is_favorite = UserFavorites.objects.filter(**filter_kwargs).exists()
+        is_favorite = UserFavorites.objects.filter(
+            user=request.user,
+            **UserFavorites.component_filter(component_type, component.pk),
+        ).exists()
 
         return JsonResponse({"is_favorite": is_favorite})
 
@@ -1322,9 +1222,10 @@ def check_favorite_status(request, component_type, component_id):
 @login_required
 def my_favorites_view(request):
     """User's favorites view"""
-    favorites = UserFavorites.objects.filter(user=request.user).select_related(
-        "processor", "motherboard", "ram", "graphics_card", "storage", "power_supply"
+    favorites = ComponentService.load_components(
+        UserFavorites.objects.filter(user=request.user)
     )
+    ReviewService.load_recent_review_counts(favorites)
 
     # Group by component type
     favorites_by_type = {}
@@ -1336,22 +1237,51 @@ def my_favorites_view(request):
 
     # Statistics
     stats = {
-        "total_favorites": favorites.count(),
+        "total_favorites": len(favorites),
         "by_type": {
             component_type: len(favs)
             for component_type, favs in favorites_by_type.items()
         },
     }
 
+    recent_activities = FavoriteActivityService.get_recent_activities(
+        request.user, favorites=favorites
+    )
+
     context = {
         "favorites_by_type": favorites_by_type,
         "stats": stats,
+        "recent_activities": recent_activities,
+        "recent_activities_count": sum(
+            1 for activity in recent_activities if not activity.is_read
+        ),
         "component_types": COMPONENT_TYPES,
     }
 
     return render(request, "viewer/my_favorites.html", context)
 
 
+@login_required
+@require_POST
+def mark_activities_read(request):
+    """Mark activities of the user's favorites as read (all or the posted ids)."""
+    activity_ids = request.POST.getlist("activity_id") or None
+    if activity_ids is not None:
+        activity_ids = [int(aid) for aid in activity_ids if aid.isdigit()]
+
+    marked = FavoriteActivityService.mark_read(request.user.id, activity_ids)
+
+    if request.headers.get("x-requested-with") == "XMLHttpRequest":
+        return JsonResponse(
+            {
+                "success": True,
+                "marked": marked,
+                "unread": FavoriteActivityService.get_unread_count(request.user.id),
+            }
+        )
+    return redirect("my_favorites")
+
+
 @login_required
 def remove_favorite_view(request, favorite_id):
     """Remove component from favorites"""
@@ -1383,14 +1313,15 @@ def get_user_favorites(request):
         return JsonResponse({"favorites": []})
 
     # Filter favorites by type and ID
+    field = UserFavorites.component_field(component_type)
     filter_kwargs = {
         "user": request.user,
         "component_type": component_type,
-        f"{component_type}__id__in": component_ids,
+        f"{field}__in": component_ids,
     }
 
     favorites = UserFavorites.objects.filter(**filter_kwargs).values_list(
-        f"{component_type}__id", flat=True
+        field, flat=True
     )
 
     return JsonResponse({"favorites": list(favorites)})
@@ -1429,6 +1360,7 @@ def component_selector_view(request):
 
 
 @require_POST
+@ratelimit("comparison")
 def add_to_comparison(request):
     """AJAX endpoint for adding component to comparison"""
     try: